@@ -1,36 +1,72 @@
 # ai_service.py
 import os
-import google.generativeai as genai
+import json
+from typing import Dict, List
+
 from dotenv import load_dotenv
 
+from services.circuit import get_breaker
+
 load_dotenv()
 
-# Set up Gemini
-api_key = os.getenv("GOOGLE_API_KEY") or os.getenv("GEMINI_API_KEY")
-if api_key:
-    genai.configure(api_key=api_key)
-    model = genai.GenerativeModel('models/gemini-2.0-flash')
-else:
-    model = None
+breaker = get_breaker("gemini")
+
+GEMINI_MODEL_NAME = 'models/gemini-2.0-flash'
+
+_model = None
+_model_loaded = False
+
+def get_model():
+    """
+    Configure Gemini on first use. google.generativeai pulls in grpc/protobuf,
+    so importing it lazily keeps process start (and scripts that never call
+    Gemini) fast. Returns None when no API key is set.
+    """
+    global _model, _model_loaded
+    if not _model_loaded:
+        api_key = os.getenv("GOOGLE_API_KEY") or os.getenv("GEMINI_API_KEY")
+        if api_key:
+            import google.generativeai as genai
+            genai.configure(api_key=api_key)
+            _model = genai.GenerativeModel(GEMINI_MODEL_NAME)
+        _model_loaded = True
+    return _model
+
+PERSONALITY_PROMPTS = {
+    "Mama Health": "You are 'Mama Health', a caring, motherly figure powered by Gemini AI. Use phrases like 'My pikin', 'My child', 'Listen to your mama'. Your tone is warm and protective.",
+    "Dr. Sabi": "You are 'Dr. Sabi', a professional medical AI. Use 'The data shows', 'Clinical observation', 'Medical priority'. Your tone is calm, authoritative yet accessible.",
+    "Sentinel One": "You are 'Sentinel One', a high-tech health guardian. Use 'Analyzing biometrics', 'Risk mitigated', 'System status: alert'. Your tone is robotic, precise, and efficient.",
+    "Radio Naija": "You are 'Radio Naija', the ultimate health hypeman! Use 'Oyah!', 'Correct people!', 'No shaking!'. Your tone is high-energy, enthusiastic, and uses lots of Nigerian slang.",
+    "Elder Boma": "You are 'Elder Boma', a wise community elder. Use parables and proverbs. 'A stitch in time saves nine', 'The river that forgets its source...'. Your tone is slow, storytelling, and deeply respectful.",
+    "Sister Confidence": "You are 'Sister Confidence', a direct and empathetic nurse. Use 'Listen well-well', 'I dey with you', 'Your health is my joy'. Your tone is firm but very kind and community-oriented."
+}
+
+# Specs packed into one Gemini request by generate_health_scripts_batch
+GEMINI_BATCH_SIZE = int(os.getenv("GEMINI_BATCH_SIZE", "20"))
+GEMINI_BATCH_RETRIES = int(os.getenv("GEMINI_BATCH_RETRIES", "2"))
+
+def fallback_script(user_name: str, lga: str) -> str:
+    return f"Hello {user_name}, this is your health assistant. There's risk in {lga}. Abeg stay safe!"
+
+def _script_task(risks_str: str) -> str:
+    return f"""Give a short proactive health warning (under 80 words).
+    State clearly that this is an AI-assisted health check powered by Gemini.
+    MIX Nigerian Pidgin with English as is natural for your personality.
+    IMPORTANT: Provide DIFFERENT advice every time—range from diet, hygiene, environmental tips, to specific first aid.
+    INCLUDE at least two specific preventive measures related to the risks: {risks_str}.
+    If Cholera is mentioned, prioritize advice on boiling water and hand hygiene.
+    SUGGEST care or first steps if they feel symptoms.
+    Always end with a unique check-in question."""
 
 def generate_health_script(user_name: str, lga: str, risk_data: dict, personality: str = "Mama Health") -> str:
     """Generate a preventive health message in Nigerian Pidgin/English with a specific personality."""
-    if not model:
-        # Fallback if no API key
-        return f"Hello {user_name}, this is your health assistant. There's risk in {lga}. Abeg stay safe!"
+    model = get_model()
+    if not model or not breaker.allow():
+        # Fallback if no API key, or Gemini is failing
+        return fallback_script(user_name, lga)
 
     risks_str = ", ".join(risk_data.get("risks", []))
-    
-    personality_prompts = {
-        "Mama Health": "You are 'Mama Health', a caring, motherly figure powered by Gemini AI. Use phrases like 'My pikin', 'My child', 'Listen to your mama'. Your tone is warm and protective.",
-        "Dr. Sabi": "You are 'Dr. Sabi', a professional medical AI. Use 'The data shows', 'Clinical observation', 'Medical priority'. Your tone is calm, authoritative yet accessible.",
-        "Sentinel One": "You are 'Sentinel One', a high-tech health guardian. Use 'Analyzing biometrics', 'Risk mitigated', 'System status: alert'. Your tone is robotic, precise, and efficient.",
-        "Radio Naija": "You are 'Radio Naija', the ultimate health hypeman! Use 'Oyah!', 'Correct people!', 'No shaking!'. Your tone is high-energy, enthusiastic, and uses lots of Nigerian slang.",
-        "Elder Boma": "You are 'Elder Boma', a wise community elder. Use parables and proverbs. 'A stitch in time saves nine', 'The river that forgets its source...'. Your tone is slow, storytelling, and deeply respectful.",
-        "Sister Confidence": "You are 'Sister Confidence', a direct and empathetic nurse. Use 'Listen well-well', 'I dey with you', 'Your health is my joy'. Your tone is firm but very kind and community-oriented."
-    }
-    
-    selected_personality = personality_prompts.get(personality, personality_prompts["Mama Health"])
+    selected_personality = PERSONALITY_PROMPTS.get(personality, PERSONALITY_PROMPTS["Mama Health"])
     
     prompt = f"""
     {selected_personality}
@@ -38,20 +74,103 @@ def generate_health_script(user_name: str, lga: str, risk_data: dict, personalit
     User: {user_name}
     Risks: {risks_str}
     
-    TASK: Give a short proactive health warning (under 80 words).
-    State clearly that this is an AI-assisted health check powered by Gemini.
-    MIX Nigerian Pidgin with English as is natural for your personality.
-    IMPORTANT: Provide DIFFERENT advice every time—range from diet, hygiene, environmental tips, to specific first aid.
-    INCLUDE at least two specific preventive measures related to the risks: {risks_str}.
-    If Cholera is mentioned, prioritize advice on boiling water and hand hygiene.
-    SUGGEST care or first steps if they feel symptoms.
-    Always end with a unique check-in question.
+    TASK: {_script_task(risks_str)}
     """
     
     try:
         response = model.generate_content(prompt)
+        breaker.record_success()
         return response.text.strip().replace('"', '')
 
     except Exception as e:
+        breaker.record_failure()
         print(f"Gemini Error: {e}")
         return f"Nne  Nna, Sabi Health dey call you for {lga}. Risk don high for there. Abeg stay safe!"
+
+def _batch_prompt(specs: Dict[int, dict]) -> str:
+    items = []
+    for item_id, spec in specs.items():
+        personality = spec.get("personality") or "Mama Health"
+        items.append({
+            "id": item_id,
+            "persona": PERSONALITY_PROMPTS.get(personality, PERSONALITY_PROMPTS["Mama Health"]),
+            "location": spec["lga"],
+            "user": spec["user_name"],
+            "risks": ", ".join(spec.get("risk_data", {}).get("risks", []))
+        })
+    return f"""
+    You write phone call scripts for Sabi Health. Write one script per item below,
+    speaking as that item's persona to that item's user about that item's risks.
+
+    For EACH script: {_script_task("the item's risks")}
+
+    ITEMS (JSON):
+    {json.dumps(items, ensure_ascii=False)}
+
+    Respond with ONLY a JSON array, one object per item: [{{"id": <item id>, "script": "<script text>"}}]
+    """
+
+def _parse_batch(text: str, expected_ids) -> Dict[int, str]:
+    """Scripts keyed by id for every well-formed item in the model output; malformed items are left out."""
+    try:
+        data = json.loads(text.strip().removeprefix("```json").removesuffix("```"))
+    except ValueError:
+        return {}
+    if isinstance(data, dict):
+        data = data.get("scripts", [])
+    if not isinstance(data, list):
+        return {}
+
+    scripts = {}
+    for item in data:
+        if not isinstance(item, dict):
+            continue
+        item_id, script = item.get("id"), item.get("script")
+        if isinstance(item_id, str) and item_id.isdigit():
+            item_id = int(item_id)
+        if item_id in expected_ids and isinstance(script, str) and script.strip():
+            scripts[item_id] = script.strip().replace('"', '')
+    return scripts
+
+def generate_health_scripts_batch(specs: List[dict]) -> List[str]:
+    """
+    Generate many scripts with a few Gemini requests instead of one per script.
+
+    Each spec has the arguments of `generate_health_script` (user_name, lga,
+    risk_data, personality). Specs are packed GEMINI_BATCH_SIZE to a prompt and
+    the model answers with a JSON array; items missing or malformed in the
+    reply are re-requested (only those) up to GEMINI_BATCH_RETRIES times, then
+    get the fallback script. Results are returned in the order of `specs`.
+    """
+    results: Dict[int, str] = {}
+    model = get_model()
+    pending = dict(enumerate(specs))
+
+    attempt = 0
+    while pending and model and attempt <= GEMINI_BATCH_RETRIES:
+        ids = list(pending)
+        for start in range(0, len(ids), GEMINI_BATCH_SIZE):
+            chunk = {i: pending[i] for i in ids[start:start + GEMINI_BATCH_SIZE]}
+            if not breaker.allow():
+                break
+            try:
+                response = model.generate_content(
+                    _batch_prompt(chunk),
+                    generation_config={"response_mime_type": "application/json"}
+                )
+                breaker.record_success()
+            except Exception as e:
+                breaker.record_failure()
+                print(f"Gemini batch error: {e}")
+                continue
+            scripts = _parse_batch(response.text, chunk.keys())
+            results.update(scripts)
+            for item_id in scripts:
+                pending.pop(item_id)
+        attempt += 1
+        if pending:
+            print(f"Gemini batch: {len(pending)} script(s) unparsed after attempt {attempt}")
+
+    for item_id, spec in pending.items():
+        results[item_id] = fallback_script(spec["user_name"], spec["lga"])
+    return [results[i] for i in range(len(specs))]
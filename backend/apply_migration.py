@@ -2,27 +2,27 @@ import asyncio
 from sqlalchemy import text
 from data import engine
 
+async def ensure(statement: str, label: str):
+    """Run one idempotent DDL statement in its own transaction, so a failure can't abort the others."""
+    try:
+        async with engine.begin() as conn:
+            await conn.execute(text(statement))
+        print(f"Ensured {label}.")
+    except Exception as e:
+        print(f"Error ensuring {label}: {e}")
+
 async def apply_migration():
-    async with engine.begin() as conn:
-        print("Applying migration: adding diarrhea and vomiting to symptoms table...")
-        try:
-            await conn.execute(text("ALTER TABLE symptoms ADD COLUMN diarrhea INTEGER DEFAULT 0"))
-            print("Added 'diarrhea' column.")
-        except Exception as e:
-            if "already exists" in str(e).lower():
-                print("'diarrhea' column already exists.")
-            else:
-                print(f"Error adding 'diarrhea': {e}")
+    print("Applying migration: adding diarrhea, vomiting, lga and idempotency_key to symptoms table...")
+    await ensure("ALTER TABLE symptoms ADD COLUMN IF NOT EXISTS diarrhea INTEGER DEFAULT 0", "'diarrhea' column")
+    await ensure("ALTER TABLE symptoms ADD COLUMN IF NOT EXISTS vomiting INTEGER DEFAULT 0", "'vomiting' column")
+    await ensure("ALTER TABLE symptoms ADD COLUMN IF NOT EXISTS lga VARCHAR", "'lga' column")
+
+    await ensure("ALTER TABLE symptoms ADD COLUMN IF NOT EXISTS idempotency_key VARCHAR", "'idempotency_key' column")
+    await ensure(
+        "CREATE UNIQUE INDEX IF NOT EXISTS symptoms_idempotency_key_key ON symptoms (idempotency_key)",
+        "unique index on 'idempotency_key'"
+    )
 
-        try:
-            await conn.execute(text("ALTER TABLE symptoms ADD COLUMN vomiting INTEGER DEFAULT 0"))
-            print("Added 'vomiting' column.")
-        except Exception as e:
-            if "already exists" in str(e).lower():
-                print("'vomiting' column already exists.")
-            else:
-                print(f"Error adding 'vomiting': {e}")
-                
     print("Migration check complete.")
 
 if __name__ == "__main__":
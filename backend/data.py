@@ -1,30 +1,72 @@
 import os
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
 from dotenv import load_dotenv
 from models import Base
 
 load_dotenv()
 
-DATABASE_URL = (
-    os.getenv("DATABASE_URI", "")
-    .replace("postgresql://", "postgresql+asyncpg://", 1)
-    .split("?")[0]  # strip ALL query params
-)
+def _env_bool(name: str, default: str) -> bool:
+    return os.getenv(name, default).strip().lower() in ("1", "true", "yes", "on")
 
-engine = create_async_engine(
-    DATABASE_URL,
-    echo=True,
-    connect_args={"ssl": True}
-)
+def _async_url(uri: str) -> str:
+    return (
+        uri
+        .replace("postgresql://", "postgresql+asyncpg://", 1)
+        .split("?")[0]  # strip ALL query params
+    )
+
+# Engine profile, all overridable from the environment
+DB_ECHO = _env_bool("DB_ECHO", "0")  # log every statement; keep off under load
+DB_SSL = _env_bool("DB_SSL", "1")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # seconds; -1 disables
+DB_POOL_PRE_PING = _env_bool("DB_POOL_PRE_PING", "1")
+# Prepared statement cache per connection. Set to 0 behind PgBouncer in transaction mode.
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100"))
+
+DATABASE_URL = _async_url(os.getenv("DATABASE_URI", ""))
+# Optional read replica for read-only endpoints; falls back to the primary
+DATABASE_REPLICA_URL = _async_url(os.getenv("DATABASE_REPLICA_URI", ""))
+
+def make_engine(url: str, pooled: bool = True):
+    """
+    Engine for `url`. Pooled asyncpg connections belong to the event loop that
+    opened them, so code running on another loop (e.g. the scheduler thread)
+    must use its own engine with pooled=False.
+    """
+    pool_args = dict(
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+    ) if pooled else dict(poolclass=NullPool)
+    return create_async_engine(
+        f"{url}?prepared_statement_cache_size={DB_STATEMENT_CACHE_SIZE}",
+        echo=DB_ECHO,
+        connect_args={"ssl": DB_SSL, "statement_cache_size": DB_STATEMENT_CACHE_SIZE},
+        **pool_args
+    )
+
+engine = make_engine(DATABASE_URL)
+read_engine = make_engine(DATABASE_REPLICA_URL) if DATABASE_REPLICA_URL else engine
 
 AsyncSessionLocal = sessionmaker(
     engine, class_=AsyncSession, expire_on_commit=False
 )
 
+# Sessions for read-only work; may lag the primary slightly when a replica is configured
+AsyncReadSessionLocal = sessionmaker(
+    read_engine, class_=AsyncSession, expire_on_commit=False
+)
+
 async def init_db():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
 
 users_db = {}
-logs_db = []
\ No newline at end of file
+logs_db = []
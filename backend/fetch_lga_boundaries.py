@@ -0,0 +1,71 @@
+# fetch_lga_boundaries.py
+"""
+Download Nigerian LGA boundary polygons for the offline reverse geocoder.
+
+By default the geoBoundaries ADM2 (LGA) release for Nigeria is used; any other
+GeoJSON FeatureCollection with LGA names in one of geocoder.LGA_KEYS (GRID3,
+OCHA/HDX, GADM exports) can be passed as a URL or a local path instead.
+Coordinates are rounded to ~1m and unused properties dropped to keep the file
+small, and it is written to LGA_BOUNDARIES_PATH (services/lga_boundaries.geojson).
+"""
+import json
+import sys
+from pathlib import Path
+
+import httpx
+
+from services import geocoder
+
+GEOBOUNDARIES_API = "https://www.geoboundaries.org/api/current/gbOpen/NGA/ADM2/"
+COORD_DECIMALS = 5
+
+def _download(url: str):
+    with httpx.Client(timeout=120.0, follow_redirects=True) as client:
+        resp = client.get(url)
+        resp.raise_for_status()
+        return resp.json()
+
+def _source(arg: str = None) -> dict:
+    if arg and Path(arg).exists():
+        with open(arg) as f:
+            return json.load(f)
+    if arg:
+        return _download(arg)
+    release = _download(GEOBOUNDARIES_API)
+    return _download(release["gjDownloadURL"])
+
+def _round(coords):
+    if coords and isinstance(coords[0], (int, float)):
+        return [round(c, COORD_DECIMALS) for c in coords[:2]]
+    return [_round(c) for c in coords]
+
+def trim(collection: dict) -> dict:
+    features = []
+    for feature in collection.get("features", []):
+        props = feature.get("properties") or {}
+        geometry = feature.get("geometry") or {}
+        lga = geocoder._first(props, geocoder.LGA_KEYS)
+        if not lga or geometry.get("type") not in ("Polygon", "MultiPolygon"):
+            continue
+        properties = {"lga_name": lga}
+        state = geocoder._first(props, geocoder.STATE_KEYS)
+        if state:
+            properties["state_name"] = state
+        features.append({
+            "type": "Feature",
+            "properties": properties,
+            "geometry": {"type": geometry["type"], "coordinates": _round(geometry["coordinates"])}
+        })
+    return {"type": "FeatureCollection", "features": features}
+
+if __name__ == "__main__":
+    # Usage: python fetch_lga_boundaries.py [url or path of a GeoJSON FeatureCollection]
+    source = sys.argv[1] if len(sys.argv) > 1 else None
+    print(f"Fetching LGA boundaries from {source or GEOBOUNDARIES_API}...")
+    collection = trim(_source(source))
+    if not collection["features"]:
+        print("❌ No LGA polygons found – check the source's property names against geocoder.LGA_KEYS")
+        sys.exit(1)
+    with open(geocoder.LGA_BOUNDARIES_PATH, "w") as f:
+        json.dump(collection, f, separators=(",", ":"))
+    print(f"✅ Wrote {len(collection['features'])} LGA boundaries to {geocoder.LGA_BOUNDARIES_PATH}")
@@ -1,30 +1,45 @@
 # main.py
 import os
+import json
+import time
+import asyncio
 import uuid
-from datetime import datetime
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Optional
 
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException, BackgroundTasks, Form, Depends, Body, Request
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Form, Depends, Body, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from twilio.rest import Client
+from fastapi.responses import StreamingResponse, ORJSONResponse
 from twilio.twiml.voice_response import VoiceResponse
 
-from data import AsyncSessionLocal, init_db
-from models import UserCreate, User, Log, DBUser, DBLog, SymptomLog, DBSymptom, UserResponse, LogRequest, UserLogin, DBMessage, Message, MessageCreate
-from sqlalchemy import select
+from data import AsyncSessionLocal, AsyncReadSessionLocal, init_db
+from models import UserCreate, User, Log, DBUser, DBLog, SymptomLog, DBSymptom, UserResponse, LogRequest, UserLogin, DBMessage, Message, MessageCreate, DBNotifyState, DBCallEvent, CallEvent, DBBroadcast, DBMessageRead, Broadcast, BroadcastCreate, SymptomAggregate, DBAnomaly, DBHealthScore, DBLgaRisk, LoginResponse, TokenRefresh, SymptomBatch
+from sqlalchemy import select, or_, and_, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
-from services import lga_coords, weather, risk, hotspots, tts, health_centers, prediction_service, health_tips
+from services import lga_coords, weather, risk, hotspots, tts, health_centers, prediction_service, health_tips, notify_state, lga_risk, prewarm, write_behind, events, surveillance, anomaly, health_score, etag, circuit, chat_sessions, chat_cache
+from services import deadline as deadline_budget
+from services import geocoder, lga_resolver
 import ai_service
-from passlib.context import CryptContext
+from services.rate_limit import RateLimitMiddleware
+from services import auth
+from services.auth import Claims
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+@lru_cache(maxsize=1)
+def get_pwd_context():
+    # passlib/bcrypt are only needed by /register and /login
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
 
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
 
 load_dotenv()  # Load environment variables from .env file
 
@@ -34,34 +49,84 @@ TWILIO_AUTH_TOKEN = os.getenv("TWILIO_AUTH_TOKEN")
 TWILIO_PHONE_NUMBER = os.getenv("TWILIO_PHONE_NUMBER")
 DOMAIN = os.getenv("DOMAIN", "http://localhost:8000")
 
+# Fast startup: skip create_all (schema already migrated) and defer warm-up work
+# until after the replica starts serving. Meant for autoscaled replicas.
+FAST_STARTUP = os.getenv("FAST_STARTUP", "0") == "1"
+
 app = FastAPI(title="Sabi Health API")
 
 app.mount("/audio", StaticFiles(directory="audio"), name="audio")
 
+# Added before CORS so CORS stays outermost and 429/503 responses still carry its headers
+app.add_middleware(RateLimitMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "Retry-After"],
 )
 
-twilio_client = None
-if TWILIO_ACCOUNT_SID and TWILIO_AUTH_TOKEN and TWILIO_PHONE_NUMBER:
-    twilio_client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
-    print("✅ Twilio client initialized")
-else:
-    print("⚠️ Twilio credentials missing – using simulation")
+_twilio_client = None
+_twilio_loaded = False
+
+def get_twilio_client():
+    """Create the Twilio REST client on first call; None means simulation mode."""
+    global _twilio_client, _twilio_loaded
+    if not _twilio_loaded:
+        if TWILIO_ACCOUNT_SID and TWILIO_AUTH_TOKEN and TWILIO_PHONE_NUMBER:
+            from twilio.rest import Client
+            _twilio_client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
+            print("✅ Twilio client initialized")
+        else:
+            print("⚠️ Twilio credentials missing – using simulation")
+        _twilio_loaded = True
+    return _twilio_client
+
+_warm_up_task: Optional[asyncio.Task] = None
+
+def _warm_up_done(task: asyncio.Task):
+    if not task.cancelled() and task.exception() is not None:
+        print(f"❌ Warm-up failed: {task.exception()!r}")
+
+async def warm_up():
+    # Load the LGA dataset and boundaries now rather than on the request path
+    await lga_coords.preload()
+    await asyncio.to_thread(geocoder.load)
+    start_scheduler()
 
 @app.on_event("startup")
 async def startup_event():
-    await init_db()
-    print("🚀 Database initialized")
+    if not FAST_STARTUP:
+        await init_db()
+        print("🚀 Database initialized")
+    prewarm.start()
+    anomaly.start()
+    await write_behind.buffer.start()
+    if FAST_STARTUP:
+        global _warm_up_task
+        _warm_up_task = asyncio.create_task(warm_up())
+        _warm_up_task.add_done_callback(_warm_up_done)
+    else:
+        await warm_up()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await prewarm.stop()
+    await anomaly.stop()
+    await write_behind.buffer.stop()
 
 async def get_db():
     async with AsyncSessionLocal() as session:
         yield session
 
+async def get_read_db():
+    """Session for read-only endpoints; served by DATABASE_REPLICA_URI when configured."""
+    async with AsyncReadSessionLocal() as session:
+        yield session
+
 @app.post("/register", response_model=User)
 async def register_user(user: UserCreate, db: AsyncSession = Depends(get_db)):
     try:
@@ -70,11 +135,17 @@ async def register_user(user: UserCreate, db: AsyncSession = Depends(get_db)):
             raise HTTPException(status_code=400, detail="Phone number already registered")
 
         hashed_password = get_password_hash(user.password)
-        db_user = DBUser(**user.dict(exclude={"password"}), hashed_password=hashed_password)
+        # Resolve the typed LGA once here so lookups can use the canonical id. In-memory only:
+        # the dataset is loaded at startup, and an LGA it can't place is left for the backfill
+        db_user = DBUser(
+            **user.dict(exclude={"password"}),
+            lga_id=lga_resolver.canonical_id(user.lga),
+            hashed_password=hashed_password
+        )
         db.add(db_user)
         await db.commit()
         await db.refresh(db_user)
-        return User.from_orm(db_user)
+        return User.model_validate(db_user)
     except Exception as e:
         await db.rollback()
         if isinstance(e, HTTPException):
@@ -82,7 +153,7 @@ async def register_user(user: UserCreate, db: AsyncSession = Depends(get_db)):
         print(f"Registration error: {e}")
         raise HTTPException(status_code=500, detail=f"Registration failed: {str(e)}")
 
-@app.post("/login", response_model=User)
+@app.post("/login", response_model=LoginResponse)
 async def login_user(user_login: UserLogin, db: AsyncSession = Depends(get_db)):
     try:
         result = await db.execute(select(DBUser).where(DBUser.phone == user_login.phone))
@@ -95,26 +166,54 @@ async def login_user(user_login: UserLogin, db: AsyncSession = Depends(get_db)):
         if not verify_password(user_login.password, user.hashed_password):
             raise HTTPException(status_code=401, detail="Incorrect phone number or password")
         
-        return User.from_orm(user)
+        return LoginResponse(**User.model_validate(user).model_dump(), **auth.issue_tokens(user))
     except Exception as e:
         if isinstance(e, HTTPException):
             raise e
         print(f"Login error: {e}")
         raise HTTPException(status_code=500, detail="Internal server error during login")
 
+@app.post("/token/refresh")
+async def refresh_token(body: TokenRefresh, db: AsyncSession = Depends(get_db)):
+    """Swap a refresh token for a new token pair, picking up any profile changes."""
+    payload = auth.decode(body.refresh_token, token_type="refresh")
+    user = await db.get(DBUser, payload["sub"])
+    if not user:
+        raise HTTPException(status_code=401, detail="User no longer exists")
+    return auth.issue_tokens(user)
+
+async def get_user_lga(db: AsyncSession, user_id: str, claims: Optional[Claims] = None) -> Optional[str]:
+    """The user's LGA from their token when there is one, else from the database (None if no such user)."""
+    if claims is not None:
+        return claims.lga
+    result = await db.execute(select(DBUser.lga).where(DBUser.id == user_id))
+    return result.scalar_one_or_none()
+
 @app.get("/profile/{user_id}", response_model=User)
-async def get_user_profile(user_id: str, db: AsyncSession = Depends(get_db)):
+async def get_user_profile(user_id: str, db: AsyncSession = Depends(get_read_db), claims: Optional[Claims] = Depends(auth.authorize_user)):
     result = await db.execute(select(DBUser).where(DBUser.id == user_id))
     user = result.scalar_one_or_none()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    return User.from_orm(user)
+    return User.model_validate(user)
+
+# ----------------------------------------------------------------------
+# Lean read path: list endpoints select only the response columns and
+# serialize the row mappings straight to JSON bytes with orjson, skipping
+# per-row ORM objects and Pydantic validation. `response_model` stays for the
+# OpenAPI schema; returning a Response bypasses FastAPI's re-serialization.
+# ----------------------------------------------------------------------
+USER_COLUMNS = (DBUser.id, DBUser.name, DBUser.phone, DBUser.lga, DBUser.lga_id, DBUser.ai_personality)
+LOG_COLUMNS = (DBLog.id, DBLog.user_id, DBLog.timestamp, DBLog.risk_type, DBLog.script, DBLog.audio_url, DBLog.response, DBLog.fallbacks)
+MESSAGE_COLUMNS = (DBMessage.id, DBMessage.user_id, DBMessage.timestamp, DBMessage.title, DBMessage.content, DBMessage.type, DBMessage.is_read)
+
+async def fetch_rows(db: AsyncSession, stmt) -> list:
+    result = await db.execute(stmt)
+    return [dict(row) for row in result.mappings().all()]
 
 @app.get("/users", response_model=list[User])
-async def list_users(db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(DBUser))
-    users = result.scalars().all()
-    return [User.from_orm(u) for u in users]
+async def list_users(db: AsyncSession = Depends(get_read_db)):
+    return ORJSONResponse(await fetch_rows(db, select(*USER_COLUMNS)))
 
 @app.post("/log", response_model=Log)
 async def create_log(log_data: LogRequest, db: AsyncSession = Depends(get_db)):
@@ -129,33 +228,91 @@ async def create_log(log_data: LogRequest, db: AsyncSession = Depends(get_db)):
     db.add(db_log)
     await db.commit()
     await db.refresh(db_log)
-    return Log.from_orm(db_log)
+    return Log.model_validate(db_log)
 
 @app.get("/logs", response_model=list[Log])
-async def get_logs(db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(DBLog))
-    logs = result.scalars().all()
-    return [Log.from_orm(l) for l in logs]
+async def get_logs(db: AsyncSession = Depends(get_read_db)):
+    return ORJSONResponse(await fetch_rows(db, select(*LOG_COLUMNS)))
 
 @app.get("/risk-check/{user_id}")
-async def check_user_risk(user_id: str, db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(DBUser).where(DBUser.id == user_id))
-    user = result.scalar_one_or_none()
-    if not user:
+async def check_user_risk(
+    user_id: str,
+    lat: float = None,
+    lon: float = None,
+    db: AsyncSession = Depends(get_read_db),
+    claims: Optional[Claims] = Depends(auth.authorize_user)
+):
+    """Risk where the user is now when `lat`/`lon` are given, otherwise for their registered LGA."""
+    lga = await get_user_lga(db, user_id, claims)
+    if lga is None:
         raise HTTPException(status_code=404, detail="User not found")
-    coords = await lga_coords.get_coordinates(user.lga)
+    place = geocoder.reverse_geocode(lat, lon) if lat is not None and lon is not None else None
+    if place:
+        lga, coords = place.lga, (lat, lon)
+    else:
+        coords = await lga_coords.get_coordinates(lga)
     if not coords:
         return {"user_id": user_id, "error": "Coordinates not found"}
-    rainfall = await weather.get_rainfall(coords[0], coords[1])
-    risk_level = risk.check_risk_for_lga(user.lga, rainfall)
-    return {"user_id": user_id, "risk": risk_level, "rainfall_mm": rainfall}
+    reading = await weather.get_rainfall_reading(coords[0], coords[1])
+    risk_level = risk.check_risk_for_lga(lga, reading.mm or 0.0)
+    return {
+        "user_id": user_id,
+        "lga": lga,
+        "risk": risk_level,
+        "rainfall_mm": reading.mm,
+        "rainfall_stale": reading.stale,
+        "location": place_info(place)
+    }
+
+def place_info(place: Optional[geocoder.Place]) -> Optional[dict]:
+    """LGA/state for a reverse-geocoded point, plus any hotspot alert there."""
+    if place is None:
+        return None
+    return {"lga": place.lga, "state": place.state, "hotspot": hotspots.get_hotspot_info(place.lga)}
+
+@app.get("/reverse-geocode")
+async def reverse_geocode(lat: float, lon: float):
+    if not geocoder.enabled():
+        raise HTTPException(status_code=503, detail="Reverse geocoding is not configured or still loading")
+    place = geocoder.reverse_geocode(lat, lon)
+    if place is None:
+        raise HTTPException(status_code=404, detail="No LGA found at these coordinates")
+    return place_info(place)
+
+# Reference data only changes on deploy, so its ETag is computed once
+HEALTH_CENTERS_ETAG = etag.make_etag(health_centers.HEALTH_CENTERS)
+REFERENCE_CACHE_CONTROL = "public, max-age=3600"
 
 @app.get("/health-centers")
-async def list_health_centers():
+async def list_health_centers(request: Request, response: Response):
+    if etag.is_fresh(request, HEALTH_CENTERS_ETAG):
+        return etag.not_modified(HEALTH_CENTERS_ETAG, REFERENCE_CACHE_CONTROL)
+    etag.set_headers(response, HEALTH_CENTERS_ETAG, REFERENCE_CACHE_CONTROL)
     return health_centers.HEALTH_CENTERS
 
+async def me_version(db: AsyncSession, user_id: str):
+    """One round-trip version stamp for /me; None if the user doesn't exist."""
+    result = await db.execute(select(
+        select(DBUser.id).where(DBUser.id == user_id).scalar_subquery(),
+        select(func.count()).select_from(DBLog).where(DBLog.user_id == user_id).scalar_subquery(),
+        select(func.max(DBLog.timestamp)).where(DBLog.user_id == user_id).scalar_subquery(),
+        select(func.count(DBLog.response)).where(DBLog.user_id == user_id).scalar_subquery(),
+        select(func.count()).select_from(DBSymptom).where(DBSymptom.user_id == user_id).scalar_subquery(),
+        select(DBHealthScore.updated_at).where(DBHealthScore.user_id == user_id).scalar_subquery()
+    ))
+    row = result.one()
+    return None if row[0] is None else tuple(row)
+
 @app.get("/me/{user_id}")
-async def get_me(user_id: str, db: AsyncSession = Depends(get_db)):
+async def get_me(user_id: str, request: Request, response: Response, db: AsyncSession = Depends(get_read_db), claims: Optional[Claims] = Depends(auth.authorize_user)):
+    version = await me_version(db, user_id)
+    # No stored score yet means /me still has to compute it, so don't short-circuit
+    if version is not None and version[-1] is not None:
+        me_etag = etag.make_etag("me", *version)
+        if etag.is_fresh(request, me_etag):
+            return etag.not_modified(me_etag)
+        etag.set_headers(response, me_etag)
+
     user_result = await db.execute(select(DBUser).where(DBUser.id == user_id))
     user = user_result.scalar_one_or_none()
     if not user:
@@ -166,37 +323,55 @@ async def get_me(user_id: str, db: AsyncSession = Depends(get_db)):
 
     symptom_result = await db.execute(select(DBSymptom).where(DBSymptom.user_id == user_id).order_by(DBSymptom.timestamp.desc()))
     symptoms = symptom_result.scalars().all()
-    
-    base_score = 100
-    
-    coords = await lga_coords.get_coordinates(user.lga)
-    risk_level = "LOW"
-    rainfall = 0
-    if coords:
-        rainfall = await weather.get_rainfall(coords[0], coords[1])
-        risk_level = risk.check_risk_for_lga(user.lga, rainfall)
-    
-    if risk_level == "HIGH": base_score -= 30
-    elif risk_level == "MEDIUM": base_score -= 15
-    
-    recent_symptoms = symptoms[:3]
-    for s in recent_symptoms:
-        if s.fever: base_score -= 10
-        if s.cough: base_score -= 5
-        if getattr(s, 'diarrhea', 0): base_score -= 15
-        if getattr(s, 'vomiting', 0): base_score -= 10
+
+    # The score is maintained on symptom logs and LGA risk changes; only compute it here the first time
+    score = await db.get(DBHealthScore, user_id)
+    if score is None:
+        async with AsyncSessionLocal() as write_db:
+            snapshot = await lga_risk.get_snapshot(write_db, user.lga)
+            if snapshot is not None:
+                score = await health_score.refresh(write_db, user_id, user.lga)
+                await write_db.commit()
+            else:
+                coords = await lga_coords.get_coordinates(user.lga)
+                reading = await weather.get_rainfall_reading(coords[0], coords[1]) if coords else None
+                if reading is not None and reading.mm is not None:
+                    rainfall = reading.mm
+                    risk_level = risk.check_risk_for_lga(user.lga, rainfall)
+                    await lga_risk.observe(write_db, user.lga, risk_level, risk.get_risk_factors(user.lga, rainfall), rainfall)
+                    score = await health_score.refresh(write_db, user_id, user.lga, risk_level, rainfall)
+                    await write_db.commit()
+                else:
+                    # Rainfall unknown: show a provisional score but store nothing, so no LOW snapshot is invented
+                    penalty = health_score.symptom_penalty(symptoms[:health_score.RECENT_SYMPTOMS])
+                    score = DBHealthScore(user_id=user_id, risk_level="LOW", rainfall=0.0,
+                                          score=health_score.compute("LOW", penalty))
     
     return {
-        "user": User.from_orm(user),
-        "logs": [Log.from_orm(l) for l in logs],
-        "symptoms": [SymptomLog.from_orm(s) for s in symptoms],
-        "health_score": max(0, base_score),
-        "current_risk": risk_level,
-        "rainfall_mm": rainfall
+        "user": User.model_validate(user),
+        "logs": [Log.model_validate(l) for l in logs],
+        "symptoms": [SymptomLog.model_validate(s) for s in symptoms],
+        "health_score": score.score,
+        "current_risk": score.risk_level,
+        "rainfall_mm": score.rainfall
     }
 
+@app.get("/health-scores")
+async def list_health_scores(lga: str = None, max_score: int = None, limit: int = 1000, db: AsyncSession = Depends(get_read_db)):
+    rows = await health_score.population(db, lga=lga, max_score=max_score, limit=min(limit, 10000))
+    return [
+        {"user_id": r.user_id, "lga": r.lga, "score": r.score, "risk_level": r.risk_level, "updated_at": r.updated_at}
+        for r in rows
+    ]
+
 @app.post("/symptoms")
-async def log_symptoms(data: SymptomLog, db: AsyncSession = Depends(get_db)):
+async def log_symptoms(data: SymptomLog, db: AsyncSession = Depends(get_db), claims: Optional[Claims] = Depends(auth.get_claims)):
+    auth.check_subject(claims, data.user_id)
+    user_lga = await get_user_lga(db, data.user_id, claims)
+    # Where the report was made, when the device sent its position
+    place = geocoder.reverse_geocode(data.lat, data.lon) if data.lat and data.lon else None
+    report_lga = place.lga if place else user_lga
+
     db_symptom = DBSymptom(
         user_id=data.user_id,
         timestamp=datetime.utcnow().isoformat(),
@@ -206,54 +381,148 @@ async def log_symptoms(data: SymptomLog, db: AsyncSession = Depends(get_db)):
         fatigue=data.fatigue,
         diarrhea=data.diarrhea,
         vomiting=data.vomiting,
-        notes=data.notes
+        notes=data.notes,
+        lga=lga_resolver.key(report_lga) if report_lga else None
     )
     db.add(db_symptom)
+    counts = surveillance.count_reports([db_symptom])
+    await surveillance.record(db, counts)
+    await anomaly.process(db, counts)
+    if user_lga:
+        await health_score.refresh(db, data.user_id, user_lga)
     
     hospital_data = None
     if data.fever:
         if data.lat and data.lon:
             hospital_data = health_centers.get_closest_hospital(data.lat, data.lon)
-        else:
-            result = await db.execute(select(DBUser).where(DBUser.id == data.user_id))
-            user = result.scalar_one_or_none()
-            if user:
-                hospital_data = health_centers.get_nearest_health_center(user.lga)
+        elif user_lga:
+            hospital_data = health_centers.get_nearest_health_center(user_lga)
             
     await db.commit()
     await db.refresh(db_symptom)
     
     return {
-        "symptom": SymptomLog.from_orm(db_symptom),
+        "symptom": SymptomLog.model_validate(db_symptom),
         "hospital": hospital_data,
         "lat": data.lat,
-        "lon": data.lon
+        "lon": data.lon,
+        "location": place_info(place)
     }
 
 
 
-async def generate_health_message(user_name: str, lga: str, risk_level: str, rainfall: float, personality: str = "Mama Health", generate_audio: bool = True):
-    hotspot_info = hotspots.get_hotspot_info(lga)
-    risks = []
-    if hotspot_info:
-        risks.append(hotspot_info["disease"])
-    if rainfall > risk.RAINFALL_THRESHOLD:
-        risks.append("malaria (heavy rain)")
-    if rainfall > risk.CHOLERA_RAINFALL_THRESHOLD:
-        risks.append("cholera (contamination risk from flooding)")
-    
+# Largest offline queue accepted in one /symptoms/bulk request
+SYMPTOM_BATCH_MAX = int(os.getenv("SYMPTOM_BATCH_MAX", "200"))
+
+def report_timestamp(client_timestamp: Optional[str], now: datetime) -> str:
+    """The device's report time as naive UTC ISO, clamped to now; server time if missing or unparseable."""
+    if client_timestamp:
+        try:
+            parsed = datetime.fromisoformat(client_timestamp.replace("Z", "+00:00"))
+            if parsed.tzinfo is not None:
+                parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+            return min(parsed, now).isoformat()
+        except ValueError:
+            pass
+    return now.isoformat()
+
+@app.post("/symptoms/bulk")
+async def log_symptoms_bulk(batch: SymptomBatch, db: AsyncSession = Depends(get_db), claims: Optional[Claims] = Depends(auth.get_claims)):
+    """
+    Reports queued offline, sent together on reconnect. Each carries a client
+    idempotency key, so a batch retried after a dropped response is harmless:
+    known keys are skipped. Everything is written in one transaction and the
+    aggregates, anomaly detector and health score are updated once per batch.
+    """
+    auth.check_subject(claims, batch.user_id)
+    if len(batch.reports) > SYMPTOM_BATCH_MAX:
+        raise HTTPException(status_code=413, detail=f"At most {SYMPTOM_BATCH_MAX} reports per batch")
+    user_lga = await get_user_lga(db, batch.user_id, claims)
+    if user_lga is None:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    now = datetime.utcnow()
+    rows = {}
+    for report in batch.reports:
+        if report.idempotency_key in rows:
+            continue
+        place = geocoder.reverse_geocode(report.lat, report.lon) if report.lat and report.lon else None
+        report_lga = place.lga if place else user_lga
+        rows[report.idempotency_key] = {
+            "id": str(uuid.uuid4()),
+            "user_id": batch.user_id,
+            "timestamp": report_timestamp(report.timestamp, now),
+            "fever": report.fever,
+            "cough": report.cough,
+            "headache": report.headache,
+            "fatigue": report.fatigue,
+            "diarrhea": report.diarrhea,
+            "vomiting": report.vomiting,
+            "notes": report.notes,
+            "lga": lga_resolver.key(report_lga),
+            "idempotency_key": report.idempotency_key
+        }
+
+    inserted = []
+    if rows:
+        result = await db.execute(
+            pg_insert(DBSymptom)
+            .values(list(rows.values()))
+            .on_conflict_do_nothing(index_elements=[DBSymptom.idempotency_key])
+            .returning(DBSymptom.idempotency_key)
+        )
+        inserted = result.scalars().all()
+
+    if inserted:
+        # Transient objects, only to fold the new rows into counter increments
+        counts = surveillance.count_reports(DBSymptom(**rows[key]) for key in inserted)
+        await surveillance.record(db, counts)
+        await anomaly.process(db, counts)
+        await health_score.refresh(db, batch.user_id, user_lga)
+    await db.commit()
+
+    new_keys = set(inserted)
+    return {
+        "accepted": inserted,
+        "duplicates": [key for key in rows if key not in new_keys]
+    }
+
+@app.get("/surveillance/symptoms", response_model=list[SymptomAggregate])
+async def get_symptom_aggregates(
+    lga: str = None,
+    start: str = None,
+    end: str = None,
+    symptom: str = None,
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Daily symptom counts per LGA. `start`/`end` are inclusive YYYY-MM-DD days."""
+    if symptom and symptom not in surveillance.SYMPTOMS:
+        raise HTTPException(status_code=400, detail=f"Unknown symptom: {symptom}")
+    rows = await surveillance.query(db, lga=lga, start=start, end=end, symptom=symptom)
+    return [SymptomAggregate.model_validate(r) for r in rows]
+
+async def generate_health_message(user_name: str, lga: str, risk_level: str, rainfall: float, personality: str = "Mama Health", generate_audio: bool = True, deadline: deadline_budget.Deadline = None):
+    risks = risk.get_risk_factors(lga, rainfall)
     risk_data = {"risks": risks, "level": risk_level}
     
-    script = ai_service.generate_health_script(user_name, lga, risk_data, personality)
+    # Gemini's client is blocking; run it off the event loop
+    script_job = asyncio.to_thread(ai_service.generate_health_script, user_name, lga, risk_data, personality)
+    script = await deadline.run("script", script_job, "canned_script") if deadline else await script_job
+    if script is None:
+        script = ai_service.fallback_script(user_name, lga)
 
     audio_url = None
     if generate_audio:
-        # Convert to speech via YarnGPT
-        audio_url = await tts.text_to_speech(script, voice="Idera")
+        # Convert to speech via YarnGPT; None means the call uses Polly <Say>
+        audio_job = tts.text_to_speech(script, voice="Idera")
+        audio_url = await deadline.run("audio", audio_job, "say_instead_of_audio") if deadline else await audio_job
+        if audio_url is None and deadline:
+            deadline.record("say_instead_of_audio")
     return script, audio_url
 
 @app.post("/generate-message")
-async def generate_message(user_id: str, generate_audio: bool = False, db: AsyncSession = Depends(get_db)):
+async def generate_message(user_id: str, generate_audio: bool = False, db: AsyncSession = Depends(get_db), claims: Optional[Claims] = Depends(auth.get_claims)):
+    auth.check_subject(claims, user_id)
     result = await db.execute(select(DBUser).where(DBUser.id == user_id))
     user = result.scalar_one_or_none()
     if not user:
@@ -295,34 +564,78 @@ def generate_twiml(script: str, audio_url: str = None, call_id: str = None) -> s
 # ----------------------------------------------------------------------
 # Call initiation (Twilio + simulation fallback)
 # ----------------------------------------------------------------------
+async def finish_late_dial(dial: asyncio.Future, call_id: str, user_id: str, risk_level: str, risk_factors: list):
+    """Wait out a dial that overran the call deadline; mark the user notified only if it went through."""
+    try:
+        call = await dial
+    except Exception as e:
+        print(f"Late Twilio dial for {call_id} failed: {e}")
+        return
+    print(f"📞 Late Twilio dial for {call_id} placed ({call.sid})")
+    async with AsyncSessionLocal() as session:
+        await notify_state.record(session, user_id, risk_level, risk_factors, notified=True)
+        await session.commit()
+
 @app.put("/call-user/{user_id}")
-async def call_user(user_id: str, background_tasks: BackgroundTasks, force: bool = False, db: AsyncSession = Depends(get_db)):
+async def call_user(user_id: str, background_tasks: BackgroundTasks, force: bool = False, db: AsyncSession = Depends(get_db), claims: Optional[Claims] = Depends(auth.authorize_user)):
+    # One time budget for every stage below; stages that can't fit fall back
+    deadline = deadline_budget.Deadline()
     result = await db.execute(select(DBUser).where(DBUser.id == user_id))
     user = result.scalar_one_or_none()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    coords = await lga_coords.get_coordinates(user.lga)
+    coords = await deadline.run("coordinates", lga_coords.get_coordinates(user.lga), "cached_coordinates")
+    if coords is None:
+        coords = await lga_coords.get_cached_coordinates(user.lga)
     if not coords:
         return {"status": "error", "message": f"Coordinates not found for LGA: {user.lga}"}
 
     lat, lon = coords
-    rainfall = await weather.get_rainfall(lat, lon)
-    risk_level = risk.check_risk_for_lga(user.lga, rainfall)
+    reading = await deadline.run("rainfall", weather.get_rainfall_reading(lat, lon), "cached_rainfall")
+    if reading is None:
+        rainfall = weather.get_cached_rainfall(lat, lon)
+    else:
+        if reading.stale:
+            deadline.record("cached_rainfall")
+        rainfall = reading.mm
 
-    if risk_level == "LOW" and not force:
-        return {
-            "status": "ok",
-            "risk": risk_level,
-            "message": f"No significant risk detected for {user.lga} (rainfall: {rainfall:.1f}mm)."
-        }
+    if rainfall is not None:
+        risk_level = risk.check_risk_for_lga(user.lga, rainfall)
+        risk_factors = risk.get_risk_factors(user.lga, rainfall)
+        await lga_risk.observe(db, user.lga, risk_level, risk_factors, rainfall)
+    else:
+        # Unknown rainfall is not 0mm: reuse the LGA's last stored risk rather than persisting a spurious LOW
+        snapshot = await lga_risk.get_snapshot(db, user.lga)
+        if snapshot is None:
+            return {"status": "error", "message": f"Rainfall unavailable for LGA: {user.lga}"}
+        deadline.record("last_known_risk")
+        risk_level, rainfall = snapshot.risk_level, snapshot.rainfall or 0.0
+        risk_factors = snapshot.risk_factors.split("|") if snapshot.risk_factors else []
+
+    if not force:
+        state = await db.get(DBNotifyState, user_id)
+        if not notify_state.should_notify(state, risk_level, risk_factors):
+            await notify_state.record(db, user_id, risk_level, risk_factors, notified=False)
+            await db.commit()
+            if risk_level == "LOW":
+                message = f"No significant risk detected for {user.lga} (rainfall: {rainfall:.1f}mm)."
+            else:
+                message = f"Risk for {user.lga} unchanged since last call – skipping."
+            return {
+                "status": "ok",
+                "risk": risk_level,
+                "message": message
+            }
 
-    # If Twilio is available, generate audio for it (or we could use Polly exclusively)
-    # The user said "we dont have to save the audio file", so let's skip YarnGPT entirely for now
-    # and rely on Twilio Polly for real calls and Web Speech API for simulations.
-    script, audio_url = await generate_health_message(
-        user.name, user.lga, risk_level, rainfall, user.ai_personality, generate_audio=True
-    )
+    # Prefer the script/audio pre-rendered when the LGA's risk changed; render inline otherwise
+    prewarmed = await prewarm.get_prewarmed(db, user.lga, user.ai_personality or "Mama Health", risk_factors)
+    if prewarmed:
+        script, audio_url = prewarmed.script, prewarmed.audio_url
+    else:
+        script, audio_url = await generate_health_message(
+            user.name, user.lga, risk_level, rainfall, user.ai_personality, generate_audio=True, deadline=deadline
+        )
 
 
     call_id = str(uuid.uuid4())
@@ -333,34 +646,65 @@ async def call_user(user_id: str, background_tasks: BackgroundTasks, force: bool
         risk_type=risk_level,
         script=script,
         audio_url=audio_url,
-        response=None
+        response=None,
+        referral=build_referral(user.lga),
+        fallbacks=deadline.summary()
     )
     db.add(db_log)
     await db.commit()
+    events.track_call(call_id, user_id)
 
     # If Twilio is available, place real call
+    twilio_client = get_twilio_client()
     if twilio_client:
         try:
             twiml = generate_twiml(script, audio_url, call_id)
-            call = twilio_client.calls.create(
+            # The REST client is blocking; the dial gets whatever budget is left, at least the reserve.
+            # Shielded: the worker thread can't be cancelled, so a late dial may still place the call.
+            dial = asyncio.ensure_future(asyncio.to_thread(
+                twilio_client.calls.create,
                 twiml=twiml,
                 to=user.phone,
                 from_=TWILIO_PHONE_NUMBER,
                 status_callback=f"{DOMAIN}/call-status/{call_id}",
-                status_callback_event=["completed", "answered"]
-            )
+                status_callback_event=["initiated", "ringing", "answered", "completed"]
+            ))
+            call = await asyncio.wait_for(asyncio.shield(dial), max(deadline.remaining(), deadline.reserve))
+        except asyncio.TimeoutError:
+            print(f"⏱️ Twilio dial for {call_id} still pending after {deadline.elapsed_ms()}ms – outcome recorded when it returns")
+            background_tasks.add_task(finish_late_dial, dial, call_id, user_id, risk_level, risk_factors)
             return {
-                "status": "call_initiated",
+                "status": "dial_timeout",
                 "method": "twilio",
-                "call_sid": call.sid,
                 "call_id": call_id,
                 "risk": risk_level,
                 "rainfall_mm": rainfall,
-                "script": script
+                "script": script,
+                "fallbacks": deadline.fallbacks,
+                "elapsed_ms": deadline.elapsed_ms()
             }
         except Exception as e:
             print(f"Twilio call failed: {e}")
-            # Fall through to simulation
+            # Fall through to simulation; the user isn't marked notified, so the next sweep retries
+        else:
+            # Only a placed call counts as notified
+            await notify_state.record(db, user_id, risk_level, risk_factors, notified=True)
+            await db.commit()
+            return {
+                "status": "call_initiated",
+                "method": "twilio",
+                "call_sid": call.sid,
+                "call_id": call_id,
+                "risk": risk_level,
+                "rainfall_mm": rainfall,
+                "script": script,
+                "fallbacks": deadline.fallbacks,
+                "elapsed_ms": deadline.elapsed_ms()
+            }
+    else:
+        # Nothing to dial in simulation mode; the simulated call is the delivery
+        await notify_state.record(db, user_id, risk_level, risk_factors, notified=True)
+        await db.commit()
 
     # Simulation fallback
     return {
@@ -370,7 +714,9 @@ async def call_user(user_id: str, background_tasks: BackgroundTasks, force: bool
         "rainfall_mm": rainfall,
         "audio_url": audio_url,
         "script": script,
-        "call_id": call_id
+        "call_id": call_id,
+        "fallbacks": deadline.fallbacks,
+        "elapsed_ms": deadline.elapsed_ms()
     }
 
 # ----------------------------------------------------------------------
@@ -378,103 +724,136 @@ async def call_user(user_id: str, background_tasks: BackgroundTasks, force: bool
 # ----------------------------------------------------------------------
 
 
+def build_referral(lga: str) -> str:
+    """Precompute what /respond needs so the webhook never has to look up the user."""
+    hospital_data = health_centers.get_nearest_health_center(lga)
+    recommendation = hospital_data["recommendation"] if hospital_data else health_centers.get_default_recommendation()
+    return json.dumps({"hospital": hospital_data, "recommendation": recommendation})
+
+@lru_cache(maxsize=256)
+def respond_twiml(digits: str, recommendation: str) -> str:
+    """TwiML for a DTMF answer; identical inputs are rendered once."""
+    twiml_response = VoiceResponse()
+    if digits == "1":
+        twiml_response.say(f"{recommendation} Stay safe.")
+    elif digits == "2":
+        twiml_response.say("Thank you. Stay safe and follow preventive measures.")
+    else:
+        twiml_response.say("We didn't receive a valid response. Goodbye.")
+    twiml_response.hangup()
+    return str(twiml_response)
+
+_not_found_twiml = VoiceResponse()
+_not_found_twiml.say("Sorry, we couldn't find your call record.")
+_not_found_twiml.hangup()
+NOT_FOUND_TWIML = str(_not_found_twiml)
+
+DIGIT_RESPONSES = {"1": "fever", "2": "fine"}
+
+async def load_referral(db: AsyncSession, referral: str = None, user_id: str = None) -> dict:
+    if referral:
+        return json.loads(referral)
+    # Calls logged before referrals were precomputed
+    user_result = await db.execute(select(DBUser.lga).where(DBUser.id == user_id))
+    return json.loads(build_referral(user_result.scalar_one_or_none() or "unknown"))
+
 @app.post("/respond/{call_id}")
 async def record_response(
     call_id: str,
     request: Request,
     db: AsyncSession = Depends(get_db)
 ):
-    # Fetch log entry from DB
-    result = await db.execute(select(DBLog).where(DBLog.id == call_id))
-    log_entry = result.scalar_one_or_none()
-    
-    # Try to parse body as JSON first (Simulation mode)
+    # Single indexed read: everything the webhook needs was stored with the call
+    result = await db.execute(select(DBLog.user_id, DBLog.referral).where(DBLog.id == call_id))
+    log_entry = result.first()
+
+    # Parse the body once, based on content type
     payload_data = None
-    is_json = False
+    form_data = None
     if "application/json" in request.headers.get("content-type", ""):
         try:
             payload_data = await request.json()
-            is_json = True
-        except:
-            pass
+        except Exception:
+            payload_data = None
+    else:
+        form_data = await request.form()
 
     if not log_entry:
-        if is_json:
-             raise HTTPException(status_code=404, detail="Call log not found")
-        else:
-             twiml_response = VoiceResponse()
-             twiml_response.say("Sorry, we couldn't find your call record.")
-             twiml_response.hangup()
-             return str(twiml_response)
+        if payload_data is not None:
+            raise HTTPException(status_code=404, detail="Call log not found")
+        return Response(content=NOT_FOUND_TWIML, media_type="application/xml")
+
+    referral = await load_referral(db, log_entry.referral, log_entry.user_id)
 
     # Simulation mode: JSON payload
-    if is_json and payload_data:
+    if payload_data:
         response_type = payload_data.get("response")
-        log_entry.response = response_type
-        
+        write_behind.buffer.set_response(call_id, response_type)
+
+        lat, lon = payload_data.get("lat"), payload_data.get("lon")
+        place = geocoder.reverse_geocode(lat, lon) if lat and lon else None
+
         hospital_data = None
         if response_type == "fever":
-            if payload_data.get("lat") and payload_data.get("lon"):
-                hospital_data = health_centers.get_closest_hospital(payload_data["lat"], payload_data["lon"])
+            if lat and lon:
+                hospital_data = health_centers.get_closest_hospital(lat, lon)
             else:
-                user_result = await db.execute(select(DBUser).where(DBUser.id == log_entry.user_id))
-                user = user_result.scalar_one_or_none()
-                if user:
-                    hospital_data = health_centers.get_nearest_health_center(user.lga)
-        
-        await db.commit()
+                hospital_data = referral["hospital"]
+
         return {
-            "status": "ok", 
+            "status": "ok",
             "message": "Response recorded",
-            "hospital": hospital_data
+            "hospital": hospital_data,
+            "location": place_info(place)
         }
 
-    else:
-        # Twilio webhook (form-encoded)
-        form_data = await request.form()
-        Digits = form_data.get("Digits")
-        
-        twiml_response = VoiceResponse()
-        
-        # We need to fetch the user to get the LGA
-        user_result = await db.execute(select(DBUser).where(DBUser.id == log_entry.user_id))
-        user = user_result.scalar_one_or_none()
-        lga = user.lga if user else "unknown"
-        
-        hospital_data = health_centers.get_nearest_health_center(lga)
-        recommendation = hospital_data["recommendation"] if hospital_data else health_centers.get_default_recommendation()
-
-        if Digits == "1":
-            log_entry.response = "fever"
-            twiml_response.say(f"{recommendation} Stay safe.")
-        elif Digits == "2":
-            log_entry.response = "fine"
-            twiml_response.say("Thank you. Stay safe and follow preventive measures.")
-        else:
-            twiml_response.say("We didn't receive a valid response. Goodbye.")
-        
-        await db.commit()
-        twiml_response.hangup()
-        return str(twiml_response)
+    # Twilio webhook (form-encoded)
+    digits = form_data.get("Digits") if form_data else None
+    if digits in DIGIT_RESPONSES:
+        write_behind.buffer.set_response(call_id, DIGIT_RESPONSES[digits])
+    return Response(content=respond_twiml(digits or "", referral["recommendation"]), media_type="application/xml")
 
 # =====================
 
 @app.post("/call-status/{call_id}")
-async def call_status(call_id: str, CallStatus: str = None, **kwargs):
-    print(f"Call {call_id} status: {CallStatus}")
+async def call_status(call_id: str, request: Request):
+    form_data = await request.form()
+    status = form_data.get("CallStatus")
+    if status:
+        write_behind.buffer.add_call_event(
+            call_id,
+            status,
+            call_sid=form_data.get("CallSid"),
+            duration=form_data.get("CallDuration")
+        )
+        user_id = events.call_user_id(call_id)
+        if user_id:
+            events.hub.publish(events.user_channel(user_id), "call_status", {"call_id": call_id, "status": status})
     return {"status": "ok"}
 
+@app.get("/call-events/{call_id}", response_model=list[CallEvent])
+async def get_call_events(call_id: str, db: AsyncSession = Depends(get_read_db)):
+    result = await db.execute(
+        select(DBCallEvent).where(DBCallEvent.call_id == call_id).order_by(DBCallEvent.timestamp)
+    )
+    return [CallEvent.model_validate(e) for e in result.scalars().all()]
+
 # ----------------------------------------------------------------------
 # Test endpoints (unchanged)
 # ----------------------------------------------------------------------
+@app.get("/upstreams")
+async def upstream_status():
+    """Circuit breaker state per upstream service."""
+    return circuit.all_statuses()
+
 @app.get("/test-rainfall")
 async def test_rainfall(lga: str):
     coords = await lga_coords.get_coordinates(lga)
     if not coords:
         raise HTTPException(status_code=404, detail=f"LGA '{lga}' not found")
     lat, lon = coords
-    rainfall = await weather.get_rainfall(lat, lon)
-    return {"lga": lga, "rainfall_mm": rainfall}
+    reading = await weather.get_rainfall_reading(lat, lon)
+    return {"lga": lga, "rainfall_mm": reading.mm, "stale": reading.stale}
 
 @app.get("/test-coordinates")
 async def test_coordinates(lga: str):
@@ -483,6 +862,23 @@ async def test_coordinates(lga: str):
         return {"lga": lga, "coordinates": coords}
     return {"lga": lga, "error": "Coordinates not found"}
 
+@app.get("/anomalies")
+async def list_anomalies(lga: str = None, active_only: bool = True, db: AsyncSession = Depends(get_read_db)):
+    stmt = select(DBAnomaly).order_by(DBAnomaly.detected_at.desc())
+    if lga:
+        stmt = stmt.where(DBAnomaly.lga == lga_resolver.key(lga))
+    if active_only:
+        stmt = stmt.where(DBAnomaly.expires_at > datetime.utcnow().isoformat())
+    result = await db.execute(stmt)
+    return [
+        {
+            "lga": a.lga, "symptom": a.symptom, "day": a.day, "count": a.count,
+            "baseline": round(a.baseline, 2), "z_score": round(a.z_score, 2),
+            "disease": a.disease, "detected_at": a.detected_at, "expires_at": a.expires_at
+        }
+        for a in result.scalars().all()
+    ]
+
 @app.get("/test-hotspot")
 async def test_hotspot(lga: str):
     info = hotspots.get_hotspot_info(lga)
@@ -495,12 +891,13 @@ async def test_risk(lga: str):
     coords = await lga_coords.get_coordinates(lga)
     if not coords:
         return {"lga": lga, "error": "Coordinates not found"}
-    rainfall = await weather.get_rainfall(coords[0], coords[1])
-    risk_level = risk.check_risk_for_lga(lga, rainfall)
+    reading = await weather.get_rainfall_reading(coords[0], coords[1])
+    risk_level = risk.check_risk_for_lga(lga, reading.mm or 0.0)
     return {
         "lga": lga,
         "coordinates": coords,
-        "rainfall_mm": rainfall,
+        "rainfall_mm": reading.mm,
+        "rainfall_stale": reading.stale,
         "is_hotspot": hotspots.is_hotspot(lga),
         "risk": risk_level
     }
@@ -509,38 +906,204 @@ async def test_risk(lga: str):
 # Mock Rain & Messages
 # ----------------------------------------------------------------------
 
+MOCK_RAIN_REFRESH_CONCURRENCY = 8
+
+async def refresh_lga_snapshots():
+    """Re-evaluate every known LGA, so stored risk and health scores follow a rainfall change."""
+    semaphore = asyncio.Semaphore(MOCK_RAIN_REFRESH_CONCURRENCY)
+
+    async def read_rainfall(lga: str):
+        async with semaphore:
+            coords = await lga_coords.get_coordinates(lga_resolver.display_name(lga))
+            if not coords:
+                return None
+            # None when unknown, so the stored snapshot is kept instead of dropping to LOW
+            return (await weather.get_rainfall_reading(coords[0], coords[1])).mm
+
+    try:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(select(DBLgaRisk.lga))
+            lgas = result.scalars().all()
+            readings = await asyncio.gather(*(read_rainfall(lga) for lga in lgas))
+            for lga, rainfall in zip(lgas, readings):
+                if rainfall is None:
+                    continue
+                # Snapshots are keyed by canonical id; the risk rules look places up by name
+                name = lga_resolver.display_name(lga)
+                risk_level = risk.check_risk_for_lga(name, rainfall)
+                await lga_risk.observe(db, lga, risk_level, risk.get_risk_factors(name, rainfall), rainfall)
+            await db.commit()
+        print(f"🌧️ Re-evaluated risk for {len(lgas)} LGA(s)")
+    except Exception as e:
+        print(f"LGA risk refresh failed: {e}")
+
 @app.get("/mock-rain")
-async def get_mock_rain_status():
+async def get_mock_rain_status(request: Request, response: Response):
+    mock_rain_etag = etag.make_etag("mock-rain", weather.MOCK_RAIN_ENABLED)
+    if etag.is_fresh(request, mock_rain_etag):
+        return etag.not_modified(mock_rain_etag)
+    etag.set_headers(response, mock_rain_etag)
     return {"enabled": weather.MOCK_RAIN_ENABLED}
 
 @app.post("/mock-rain")
 async def toggle_mock_rain(
+    background_tasks: BackgroundTasks,
     enabled: bool = Body(embed=True), 
     user_id: str = Body(None, embed=True),
     db: AsyncSession = Depends(get_db)
 ):
     weather.MOCK_RAIN_ENABLED = enabled
+    # Re-scoring fetches rainfall for every LGA; don't hold the toggle request for it
+    background_tasks.add_task(refresh_lga_snapshots)
     
-    if user_id and enabled:
-        msg = DBMessage(
-            user_id=user_id,
+    # Mock rain is global, so the alert is one broadcast rather than a row per user.
+    # user_id is still accepted for older clients.
+    if enabled:
+        db_broadcast = DBBroadcast(
+            scope="all",
+            target=None,
             timestamp=datetime.utcnow().isoformat(),
             title="Heavy Rain Detected (Simulated)",
             content="Heavy rain is fall-ing! Abeg clean your environment and clear gutters to avoid malaria and cholera.",
             type="rain"
         )
-        db.add(msg)
+        db.add(db_broadcast)
         await db.commit()
+        events.hub.publish(events.ALL_CHANNEL, "message", message_event(db_broadcast))
         
     return {"status": "ok", "enabled": enabled}
 
+BROADCAST_SCOPES = ("lga", "state", "all")
+# Broadcasts merged into /messages: the most recent BROADCAST_LIMIT from the last BROADCAST_HISTORY_DAYS
+BROADCAST_HISTORY_DAYS = int(os.getenv("BROADCAST_HISTORY_DAYS", "30"))
+BROADCAST_LIMIT = int(os.getenv("BROADCAST_LIMIT", "100"))
+
+def message_event(msg) -> dict:
+    return {"id": msg.id, "title": msg.title, "type": msg.type, "timestamp": msg.timestamp}
+
+@app.post("/broadcasts", response_model=Broadcast, dependencies=[Depends(auth.require_service)])
+async def create_broadcast(data: BroadcastCreate, db: AsyncSession = Depends(get_db)):
+    if data.scope not in BROADCAST_SCOPES:
+        raise HTTPException(status_code=400, detail=f"scope must be one of {', '.join(BROADCAST_SCOPES)}")
+    if data.scope != "all" and not data.target:
+        raise HTTPException(status_code=400, detail=f"target is required for scope '{data.scope}'")
+
+    db_broadcast = DBBroadcast(
+        scope=data.scope,
+        target=broadcast_target(data.scope, data.target),
+        timestamp=datetime.utcnow().isoformat(),
+        title=data.title,
+        content=data.content,
+        type=data.type
+    )
+    db.add(db_broadcast)
+    await db.commit()
+    await db.refresh(db_broadcast)
+    events.hub.publish(events.broadcast_channel(db_broadcast.scope, db_broadcast.target), "message", message_event(db_broadcast))
+    return Broadcast.model_validate(db_broadcast)
+
+def broadcast_target(scope: str, target: Optional[str]) -> Optional[str]:
+    if scope == "lga":
+        return lga_resolver.key(target)
+    if scope == "state":
+        return target.strip().lower()
+    return None
+
+def broadcast_window():
+    """Only recent broadcasts are shown, so history can't grow every /messages response."""
+    return DBBroadcast.timestamp >= (datetime.utcnow() - timedelta(days=BROADCAST_HISTORY_DAYS)).isoformat()
+
+def broadcast_filter(lga: str):
+    """Broadcasts addressed to everyone, this LGA or its state."""
+    lga_key = lga_resolver.key(lga)
+    state_key = lga_coords.get_state(lga) or lga.strip().lower()
+    return or_(
+        DBBroadcast.scope == "all",
+        and_(DBBroadcast.scope == "lga", DBBroadcast.target == lga_key),
+        and_(DBBroadcast.scope == "state", DBBroadcast.target == state_key)
+    )
+
+async def get_user_broadcasts(db: AsyncSession, user_id: str, lga: str) -> list:
+    """Broadcasts addressed to everyone, the user's LGA or the user's state, with read state."""
+    result = await db.execute(
+        select(DBBroadcast)
+        .where(broadcast_filter(lga), broadcast_window())
+        .order_by(DBBroadcast.timestamp.desc())
+        .limit(BROADCAST_LIMIT)
+    )
+    broadcasts = result.scalars().all()
+    if not broadcasts:
+        return []
+
+    read_result = await db.execute(
+        select(DBMessageRead.message_id).where(
+            DBMessageRead.user_id == user_id,
+            DBMessageRead.message_id.in_([b.id for b in broadcasts])
+        )
+    )
+    read_ids = set(read_result.scalars().all())
+    return [
+        {
+            "id": b.id,
+            "user_id": user_id,
+            "timestamp": b.timestamp,
+            "title": b.title,
+            "content": b.content,
+            "type": b.type,
+            "is_read": 1 if b.id in read_ids else 0
+        }
+        for b in broadcasts
+    ]
+
+async def messages_version(db: AsyncSession, user_id: str, lga: str = None) -> tuple:
+    """Counts, latest timestamps and read counts for personal messages and matching broadcasts."""
+    columns = [
+        select(func.count()).select_from(DBMessage).where(DBMessage.user_id == user_id).scalar_subquery(),
+        select(func.max(DBMessage.timestamp)).where(DBMessage.user_id == user_id).scalar_subquery(),
+        select(func.sum(DBMessage.is_read)).where(DBMessage.user_id == user_id).scalar_subquery(),
+        select(func.count()).select_from(DBMessageRead).where(DBMessageRead.user_id == user_id).scalar_subquery()
+    ]
+    if lga:
+        condition = and_(broadcast_filter(lga), broadcast_window())
+        columns += [
+            select(func.count()).select_from(DBBroadcast).where(condition).scalar_subquery(),
+            select(func.max(DBBroadcast.timestamp)).where(condition).scalar_subquery()
+        ]
+    result = await db.execute(select(*columns))
+    return tuple(result.one())
+
 @app.get("/messages/{user_id}", response_model=list[Message])
-async def get_user_messages(user_id: str, db: AsyncSession = Depends(get_db)):
+async def get_user_messages(user_id: str, request: Request, db: AsyncSession = Depends(get_read_db), claims: Optional[Claims] = Depends(auth.authorize_user)):
+    lga = await get_user_lga(db, user_id, claims)
+
+    messages_etag = etag.make_etag("messages", user_id, lga, *(await messages_version(db, user_id, lga)))
+    if etag.is_fresh(request, messages_etag):
+        return etag.not_modified(messages_etag)
+
+    messages = await fetch_rows(
+        db, select(*MESSAGE_COLUMNS).where(DBMessage.user_id == user_id).order_by(DBMessage.timestamp.desc())
+    )
+
+    if lga:
+        messages.extend(await get_user_broadcasts(db, user_id, lga))
+        messages.sort(key=lambda m: m["timestamp"], reverse=True)
+    return etag.set_headers(ORJSONResponse(messages), messages_etag)
+
+@app.post("/messages/{user_id}/read/{message_id}")
+async def mark_message_read(user_id: str, message_id: str, db: AsyncSession = Depends(get_db), claims: Optional[Claims] = Depends(auth.authorize_user)):
     result = await db.execute(
-        select(DBMessage).where(DBMessage.user_id == user_id).order_by(DBMessage.timestamp.desc())
+        select(DBMessage).where(DBMessage.id == message_id, DBMessage.user_id == user_id)
     )
-    messages = result.scalars().all()
-    return [Message.from_orm(m) for m in messages]
+    message = result.scalar_one_or_none()
+    if message:
+        message.is_read = 1
+    elif await db.get(DBBroadcast, message_id):
+        if not await db.get(DBMessageRead, (message_id, user_id)):
+            db.add(DBMessageRead(message_id=message_id, user_id=user_id, read_at=datetime.utcnow().isoformat()))
+    else:
+        raise HTTPException(status_code=404, detail="Message not found")
+    await db.commit()
+    return {"status": "ok"}
 
 @app.post("/messages", response_model=Message)
 async def create_message(msg_data: MessageCreate, db: AsyncSession = Depends(get_db)):
@@ -554,19 +1117,19 @@ async def create_message(msg_data: MessageCreate, db: AsyncSession = Depends(get
     db.add(db_msg)
     await db.commit()
     await db.refresh(db_msg)
-    return Message.from_orm(db_msg)
+    events.hub.publish(events.user_channel(db_msg.user_id), "message", message_event(db_msg))
+    return Message.model_validate(db_msg)
 
 @app.post("/predict-weekly/{user_id}")
-async def predict_weekly(user_id: str, db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(DBUser).where(DBUser.id == user_id))
-    user = result.scalar_one_or_none()
-    if not user:
+async def predict_weekly(user_id: str, db: AsyncSession = Depends(get_db), claims: Optional[Claims] = Depends(auth.authorize_user)):
+    lga = await get_user_lga(db, user_id, claims)
+    if lga is None:
         raise HTTPException(status_code=404, detail="User not found")
         
-    coords = await lga_coords.get_coordinates(user.lga)
+    coords = await lga_coords.get_coordinates(lga)
     rainfall = await weather.get_rainfall(coords[0], coords[1]) if coords else 0.0
     
-    prediction = prediction_service.generate_weekly_prediction(user.lga, rainfall)
+    prediction = prediction_service.generate_weekly_prediction(lga, rainfall)
     
     # Save as a message
     db_msg = DBMessage(
@@ -578,48 +1141,192 @@ async def predict_weekly(user_id: str, db: AsyncSession = Depends(get_db)):
     )
     db.add(db_msg)
     await db.commit()
+    events.hub.publish(events.user_channel(user_id), "message", message_event(db_msg))
     
     return prediction
 
-@app.post("/chat")
-async def chat_with_sabi(message: str = Body(..., embed=True), user_id: str = Body(None, embed=True), db: AsyncSession = Depends(get_db)):
-    user_name = "Member"
-    personality = "Mama Health"
-    lga = "Lagos"
-    
-    if user_id:
-        result = await db.execute(select(DBUser).where(DBUser.id == user_id))
-        user = result.scalar_one_or_none()
-        if user:
-            user_name = user.name
-            personality = user.ai_personality
-            lga = user.lga
-
-    prompt = f"""
+CHAT_FALLBACK_REPLY = "Abeg, my brain small-small reset. Ask me again later, my pikin."
+
+# Recent time-to-first-token samples for /chat/stream, in milliseconds
+chat_first_token_ms = deque(maxlen=500)
+
+async def get_chat_session(db: AsyncSession, user_id: str = None, claims: Optional[Claims] = None) -> Optional[chat_sessions.ChatSession]:
+    """The user's conversation session, loading their profile once per session. None for anonymous chats."""
+    if not user_id:
+        return None
+    session = chat_sessions.store.get(user_id)
+    if session is not None:
+        return session
+    if claims is not None:
+        return chat_sessions.store.create(user_id, claims.name, claims.personality, claims.lga)
+    result = await db.execute(
+        select(DBUser.name, DBUser.ai_personality, DBUser.lga).where(DBUser.id == user_id)
+    )
+    row = result.one_or_none()
+    if row is None:
+        return None
+    return chat_sessions.store.create(user_id, row.name, row.ai_personality or "Mama Health", row.lga)
+
+def chat_cache_args(session: Optional[chat_sessions.ChatSession]) -> Optional[tuple]:
+    """
+    ((personality, lga), name) for the answer cache. The cache only serves a
+    session's first turn: once it has history, replies depend on it and this
+    returns None.
+    """
+    if session is None:
+        return (("Mama Health", lga_risk.normalize("Lagos")), "Member")
+    if session.turns or session.summary:
+        return None
+    return ((session.personality, lga_risk.normalize(session.lga)), session.name)
+
+def build_chat_prompt(session: Optional[chat_sessions.ChatSession], message: str) -> str:
+    user_name = session.name if session else "Member"
+    personality = session.personality if session else "Mama Health"
+    lga = session.lga if session else "Lagos"
+    history = session.history_prompt() if session else ""
+    return f"""
     You are {personality}, a health guardian powered by Gemini AI.
     User Name: {user_name}
     User Location (LGA): {lga}
     
+    {history}
+    
     User says: {message}
     
     TASK: Respond to the user's health query or greeting in a culturally relevant Nigerian way (mix Pidgin and English).
+    Continue the conversation naturally; don't ask for details the user already gave.
     Be helpful, preventive, and caring. Keep the response under 100 words.
     Use Nigerian proverbs or slang where appropriate for your personality.
     Always state that you are an AI assistant.
     """
+
+@app.post("/chat")
+async def chat_with_sabi(message: str = Body(..., embed=True), user_id: str = Body(None, embed=True), db: AsyncSession = Depends(get_db), claims: Optional[Claims] = Depends(auth.get_claims)):
+    auth.check_subject(claims, user_id)
+    session = await get_chat_session(db, user_id, claims)
+    cache_args = chat_cache_args(session)
+    if cache_args:
+        cached = chat_cache.cache.lookup(cache_args[0], message, cache_args[1])
+        if cached:
+            if session:
+                session.add_turn(message, cached)
+            return {"response": cached}
+    prompt = build_chat_prompt(session, message)
     
+    model = ai_service.get_model()
+    if not model or not ai_service.breaker.allow():
+        return {"response": CHAT_FALLBACK_REPLY}
     try:
-        response = ai_service.model.generate_content(prompt)
-        return {"response": response.text.strip().replace('"', '')}
+        response = await model.generate_content_async(prompt)
+        ai_service.breaker.record_success()
+        reply = response.text.strip().replace('"', '')
+        if cache_args:
+            chat_cache.cache.store(cache_args[0], message, reply, cache_args[1])
+        if session:
+            session.add_turn(message, reply)
+        return {"response": reply}
     except Exception as e:
+        ai_service.breaker.record_failure()
         print(f"Chat Error: {e}")
-        return {"response": "Abeg, my brain small-small reset. Ask me again later, my pikin."}
+        return {"response": CHAT_FALLBACK_REPLY}
+
+@app.post("/chat/stream")
+async def chat_with_sabi_stream(
+    request: Request,
+    message: str = Body(..., embed=True),
+    user_id: str = Body(None, embed=True),
+    claims: Optional[Claims] = Depends(auth.get_claims)
+):
+    """
+    Same as /chat, but relays Gemini's output as Server-Sent Events:
+    `meta` (first-token latency), then `token` chunks, then `done`.
+    Generation stops as soon as the client disconnects.
+    """
+    auth.check_subject(claims, user_id)
+    # Load the profile in a scoped session: a request-scoped one would hold a
+    # pooled connection for as long as the reply streams.
+    async with AsyncReadSessionLocal() as db:
+        session = await get_chat_session(db, user_id, claims)
+    cache_args = chat_cache_args(session)
+    cached = chat_cache.cache.lookup(cache_args[0], message, cache_args[1]) if cache_args else None
+    prompt = build_chat_prompt(session, message)
+    model = ai_service.get_model()
+
+    async def event_stream():
+        started = time.perf_counter()
+        if cached:
+            if session:
+                session.add_turn(message, cached)
+            yield events.format_sse("meta", {"first_token_ms": round((time.perf_counter() - started) * 1000), "cached": True})
+            yield events.format_sse("token", {"text": cached})
+            yield events.format_sse("done", {})
+            return
+        if not model or not ai_service.breaker.allow():
+            yield events.format_sse("token", {"text": CHAT_FALLBACK_REPLY})
+            yield events.format_sse("done", {})
+            return
+
+        first_token = True
+        completed = False
+        reply = []
+        try:
+            response = await model.generate_content_async(prompt, stream=True)
+            async for chunk in response:
+                if await request.is_disconnected():
+                    break
+                try:
+                    text = chunk.text.replace('"', '')
+                except ValueError:
+                    continue  # chunk without text parts (e.g. safety metadata)
+                if not text:
+                    continue
+                if first_token:
+                    first_token = False
+                    elapsed_ms = round((time.perf_counter() - started) * 1000)
+                    chat_first_token_ms.append(elapsed_ms)
+                    yield events.format_sse("meta", {"first_token_ms": elapsed_ms})
+                reply.append(text)
+                yield events.format_sse("token", {"text": text})
+            else:
+                completed = True
+                full_reply = "".join(reply).strip()
+                if cache_args and full_reply:
+                    chat_cache.cache.store(cache_args[0], message, full_reply, cache_args[1])
+                if session:
+                    session.add_turn(message, full_reply)
+            ai_service.breaker.record_success()
+        except Exception as e:
+            ai_service.breaker.record_failure()
+            print(f"Chat stream error: {e}")
+            if first_token:
+                yield events.format_sse("token", {"text": CHAT_FALLBACK_REPLY})
+        finally:
+            if not completed:
+                print(f"Chat stream for {user_id or 'anonymous'} ended early – generation cancelled")
+        yield events.format_sse("done", {})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/metrics/chat")
+async def chat_metrics():
+    samples = sorted(chat_first_token_ms)
+    if not samples:
+        return {"samples": 0, "sessions": len(chat_sessions.store), "cache": chat_cache.cache.stats()}
+    return {
+        "samples": len(samples),
+        "sessions": len(chat_sessions.store),
+        "cache": chat_cache.cache.stats(),
+        "first_token_ms_p50": samples[len(samples) // 2],
+        "first_token_ms_p95": samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    }
 
 @app.post("/generate-cultural-tip/{user_id}")
-async def generate_cultural_tip(user_id: str, db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(DBUser).where(DBUser.id == user_id))
-    user = result.scalar_one_or_none()
-    if not user:
+async def generate_cultural_tip(user_id: str, db: AsyncSession = Depends(get_db), claims: Optional[Claims] = Depends(auth.authorize_user)):
+    if await get_user_lga(db, user_id, claims) is None:
         raise HTTPException(status_code=404, detail="User not found")
         
     tip = health_tips.get_random_tip()
@@ -635,20 +1342,68 @@ async def generate_cultural_tip(user_id: str, db: AsyncSession = Depends(get_db)
     db.add(db_msg)
     await db.commit()
     await db.refresh(db_msg)
+    events.hub.publish(events.user_channel(user_id), "message", message_event(db_msg))
     
-    return {"status": "ok", "message": Message.from_orm(db_msg)}
+    return {"status": "ok", "message": Message.model_validate(db_msg)}
+
+# ----------------------------------------------------------------------
+# Server-push (SSE) delivery of messages, risk changes and call status
+# ----------------------------------------------------------------------
+SSE_KEEPALIVE_SECONDS = 15
+
+@lga_risk.on_change
+async def push_risk_change(db: AsyncSession, snapshot):
+    events.hub.publish(events.lga_channel(snapshot.lga), "risk", {
+        "lga": snapshot.lga,
+        "risk": snapshot.risk_level,
+        "risk_factors": snapshot.risk_factors.split("|") if snapshot.risk_factors else [],
+        "version": snapshot.version
+    })
+
+@app.get("/events/{user_id}")
+async def stream_events(user_id: str, request: Request, claims: Optional[Claims] = Depends(auth.authorize_stream_user)):
+    # A scoped session: a request-scoped one would stay checked out for the life of the stream
+    async with AsyncReadSessionLocal() as db:
+        lga = await get_user_lga(db, user_id, claims)
+    if lga is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    state = lga_coords.get_state(lga)
+
+    channels = [events.user_channel(user_id), events.lga_channel(lga), events.ALL_CHANNEL]
+    if state:
+        channels.append(events.state_channel(state))
+    queue = events.hub.subscribe(channels)
+
+    async def event_stream():
+        try:
+            yield events.format_sse("ready", {"user_id": user_id})
+            while not await request.is_disconnected():
+                try:
+                    yield await asyncio.wait_for(queue.get(), timeout=SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+        finally:
+            events.hub.unsubscribe(queue, channels)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @app.get("/")
 def root():
     return {"message": "Sabi Health API is running"}
 
 # ----------------------------------------------------------------------
-# Optional scheduler
+# Optional scheduler (started from the startup hook, not at import time)
 # ----------------------------------------------------------------------
-try:
-    import scheduler
-except ImportError:
-    print("Scheduler not found – background tasks disabled")
+def start_scheduler():
+    try:
+        import scheduler
+        scheduler.start()
+    except ImportError:
+        print("Scheduler not found – background tasks disabled")
 
 if __name__ == "__main__":
     import uvicorn
@@ -1,6 +1,52 @@
 import asyncio
 from sqlalchemy import text
 from data import engine
+from services import lga_coords, lga_resolver
+
+async def _rekeys(conn, query: str) -> list:
+    result = await conn.execute(text(query))
+    return [(old, lga_resolver.key(old)) for old, in result.fetchall() if old and lga_resolver.key(old) != old]
+
+async def rekey_lgas(conn):
+    """Merge rows stored under a typed LGA name into its key. Idempotent; run after the dataset is loaded."""
+    moved = 0
+    for old, new in await _rekeys(conn, "SELECT DISTINCT lga FROM symptoms"):
+        await conn.execute(text("UPDATE symptoms SET lga = :new WHERE lga = :old"), {"old": old, "new": new})
+        moved += 1
+    for old, new in await _rekeys(conn, "SELECT DISTINCT lga FROM health_scores"):
+        await conn.execute(text("UPDATE health_scores SET lga = :new WHERE lga = :old"), {"old": old, "new": new})
+        moved += 1
+    for old, new in await _rekeys(conn, "SELECT DISTINCT target FROM broadcasts WHERE scope = 'lga'"):
+        await conn.execute(text("UPDATE broadcasts SET target = :new WHERE scope = 'lga' AND target = :old"), {"old": old, "new": new})
+        moved += 1
+    # Counters for spellings of the same LGA add up
+    for old, new in await _rekeys(conn, "SELECT DISTINCT lga FROM symptom_daily"):
+        await conn.execute(text(
+            "INSERT INTO symptom_daily (lga, day, symptom, count) "
+            "SELECT :new, day, symptom, count FROM symptom_daily WHERE lga = :old "
+            "ON CONFLICT (lga, day, symptom) DO UPDATE SET count = symptom_daily.count + excluded.count"
+        ), {"old": old, "new": new})
+        await conn.execute(text("DELETE FROM symptom_daily WHERE lga = :old"), {"old": old})
+        moved += 1
+    # One snapshot / anomaly per key: move a row unless the key already has one, then drop the leftovers
+    for old, new in await _rekeys(conn, "SELECT lga FROM lga_risk"):
+        await conn.execute(text(
+            "UPDATE lga_risk SET lga = :new WHERE lga = :old AND NOT EXISTS (SELECT 1 FROM lga_risk WHERE lga = :new)"
+        ), {"old": old, "new": new})
+        await conn.execute(text("DELETE FROM lga_risk WHERE lga = :old"), {"old": old})
+        moved += 1
+    for old, new in await _rekeys(conn, "SELECT DISTINCT lga FROM anomalies"):
+        await conn.execute(text(
+            "UPDATE anomalies SET lga = :new WHERE lga = :old AND NOT EXISTS ("
+            "SELECT 1 FROM anomalies a WHERE a.lga = :new AND a.symptom = anomalies.symptom AND a.day = anomalies.day)"
+        ), {"old": old, "new": new})
+        await conn.execute(text("DELETE FROM anomalies WHERE lga = :old"), {"old": old})
+        moved += 1
+    # Pre-rendered audio is re-rendered on the next risk change
+    for old, _ in await _rekeys(conn, "SELECT DISTINCT lga FROM prewarmed_audio"):
+        await conn.execute(text("DELETE FROM prewarmed_audio WHERE lga = :old"), {"old": old})
+    await conn.commit()
+    print(f"Re-keyed {moved} LGA name(s) to canonical ids.")
 
 async def run_migration():
     print("Checking database schema...")
@@ -18,6 +64,76 @@ async def run_migration():
         else:
             print("'audio_url' column already exists in 'logs' table.")
 
+        # Check logs table for referral (precomputed /respond data)
+        print("Checking 'logs' table for 'referral' column...")
+        result = await conn.execute(text("SELECT column_name FROM information_schema.columns WHERE table_name='logs' AND column_name='referral'"))
+        column_exists = result.fetchone()
+
+        if not column_exists:
+            print("Adding missing 'referral' column to 'logs' table...")
+            await conn.execute(text("ALTER TABLE logs ADD COLUMN referral TEXT"))
+            await conn.commit()
+            print("Added 'referral' column to 'logs' table.")
+        else:
+            print("'referral' column already exists in 'logs' table.")
+
+        # Check logs table for fallbacks (stages that missed the call deadline)
+        print("Checking 'logs' table for 'fallbacks' column...")
+        result = await conn.execute(text("SELECT column_name FROM information_schema.columns WHERE table_name='logs' AND column_name='fallbacks'"))
+        column_exists = result.fetchone()
+
+        if not column_exists:
+            print("Adding missing 'fallbacks' column to 'logs' table...")
+            await conn.execute(text("ALTER TABLE logs ADD COLUMN fallbacks VARCHAR"))
+            await conn.commit()
+            print("Added 'fallbacks' column to 'logs' table.")
+        else:
+            print("'fallbacks' column already exists in 'logs' table.")
+
+        # Check users table for lga_id (canonical LGA resolved at registration)
+        print("Checking 'users' table for 'lga_id' column...")
+        result = await conn.execute(text("SELECT column_name FROM information_schema.columns WHERE table_name='users' AND column_name='lga_id'"))
+        column_exists = result.fetchone()
+
+        if not column_exists:
+            print("Adding missing 'lga_id' column to 'users' table...")
+            await conn.execute(text("ALTER TABLE users ADD COLUMN lga_id VARCHAR"))
+            await conn.execute(text("CREATE INDEX IF NOT EXISTS ix_users_lga_id ON users (lga_id)"))
+            await conn.commit()
+            print("Added 'lga_id' column to 'users' table.")
+        else:
+            print("'lga_id' column already exists in 'users' table.")
+
+        # One anomaly per (lga, symptom, day), however many replicas detect it
+        await conn.execute(text(
+            "CREATE UNIQUE INDEX IF NOT EXISTS anomalies_lga_symptom_day_key ON anomalies (lga, symptom, day)"
+        ))
+        await conn.commit()
+
+        # Functional index behind the pre-warm "residents of this LGA" lookup
+        await conn.execute(text("CREATE INDEX IF NOT EXISTS ix_users_lga_normalized ON users (lower(trim(lga)))"))
+        await conn.commit()
+
+        # Ids resolved from the fallback names only ("kaduna" for Kaduna North) aren't canonical; re-resolve them
+        await conn.execute(text("UPDATE users SET lga_id = NULL WHERE lga_id IS NOT NULL AND lga_id NOT LIKE '%/%'"))
+        await conn.commit()
+
+        # Backfill canonical LGA ids for users registered before lga_id existed
+        result = await conn.execute(text("SELECT id, lga FROM users WHERE lga_id IS NULL"))
+        rows = result.fetchall()
+        backfilled = 0
+        await lga_coords.preload()
+        for user_id, lga in rows:
+            lga_id = lga_resolver.canonical_id(lga)
+            if lga_id:
+                await conn.execute(text("UPDATE users SET lga_id = :lga_id WHERE id = :id"), {"lga_id": lga_id, "id": user_id})
+                backfilled += 1
+        await conn.commit()
+        print(f"Resolved lga_id for {backfilled} of {len(rows)} user(s).")
+
+        # LGA-keyed rows used the typed name; move them to lga_resolver.key (canonical id, else the name)
+        await rekey_lgas(conn)
+
         # Also check users table for ai_personality just in case
         print("Checking 'users' table for 'ai_personality' column...")
         result = await conn.execute(text("SELECT column_name FROM information_schema.columns WHERE table_name='users' AND column_name='ai_personality'"))
@@ -31,6 +147,23 @@ async def run_migration():
         else:
             print("'ai_personality' column already exists in 'users' table.")
 
+        # sweep_shards: failed-user retry list, and one row per (sweep, shard) even when publishers race
+        print("Checking 'sweep_shards' table for 'failed' column...")
+        result = await conn.execute(text("SELECT column_name FROM information_schema.columns WHERE table_name='sweep_shards' AND column_name='failed'"))
+        column_exists = result.fetchone()
+
+        if not column_exists:
+            print("Adding missing 'failed' column to 'sweep_shards' table...")
+            await conn.execute(text("ALTER TABLE sweep_shards ADD COLUMN IF NOT EXISTS failed TEXT"))
+            await conn.commit()
+            print("Added 'failed' column to 'sweep_shards' table.")
+        else:
+            print("'failed' column already exists in 'sweep_shards' table.")
+        await conn.execute(text(
+            "CREATE UNIQUE INDEX IF NOT EXISTS sweep_shards_sweep_id_shard_index_key ON sweep_shards (sweep_id, shard_index)"
+        ))
+        await conn.commit()
+
     print("\nMigration check complete.")
 
 if __name__ == "__main__":
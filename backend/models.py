@@ -1,7 +1,7 @@
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import List, Optional
 import uuid
-from sqlalchemy import Column, String, Integer, Text, BigInteger
+from sqlalchemy import Column, String, Integer, Text, BigInteger, Float, UniqueConstraint, Index, func
 from sqlalchemy.orm import declarative_base
 
 Base = declarative_base()
@@ -12,8 +12,11 @@ class DBUser(Base):
     name = Column(String, nullable=False)
     phone = Column(BigInteger, unique=True, nullable=False)
     lga = Column(String, nullable=False)
+    lga_id = Column(String, nullable=True, index=True)  # canonical "state/lga" from services/lga_resolver
     hashed_password = Column(String, nullable=False)
     ai_personality = Column(String, default="Mama Health")  # Custom field for personal guardian
+    # Users by normalized LGA name, as lga_risk keys LGAs (pre-warm looks up an LGA's residents)
+    __table_args__ = (Index("ix_users_lga_normalized", func.lower(func.trim(lga))),)
 
 class DBLog(Base):
     __tablename__ = "logs"
@@ -24,6 +27,8 @@ class DBLog(Base):
     script = Column(Text)
     audio_url = Column(String, nullable=True)
     response = Column(String)
+    referral = Column(Text, nullable=True)  # JSON {"hospital", "recommendation"} precomputed at call time
+    fallbacks = Column(String, nullable=True)  # "|"-joined stages that fell back to meet the call deadline
 
 class DBMessage(Base):
     __tablename__ = "messages"
@@ -35,6 +40,22 @@ class DBMessage(Base):
     type = Column(String) # "rain", "outbreak", "prediction", "alert"
     is_read = Column(Integer, default=0)
 
+class DBBroadcast(Base):
+    __tablename__ = "broadcasts"
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    scope = Column(String, nullable=False)  # "lga", "state", "all"
+    target = Column(String, nullable=True, index=True)  # LGA key (lga_resolver.key) or lowercase state, None for "all"
+    timestamp = Column(String, nullable=False)
+    title = Column(String, nullable=False)
+    content = Column(Text, nullable=False)
+    type = Column(String) # "rain", "outbreak", "prediction", "alert", "tip"
+
+class DBMessageRead(Base):
+    __tablename__ = "message_reads"
+    message_id = Column(String, primary_key=True)  # broadcast id
+    user_id = Column(String, primary_key=True)
+    read_at = Column(String, nullable=False)
+
 class DBSymptom(Base):
     __tablename__ = "symptoms"
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
@@ -47,6 +68,93 @@ class DBSymptom(Base):
     diarrhea = Column(Integer, default=0)
     vomiting = Column(Integer, default=0)
     notes = Column(Text, nullable=True)
+    lga = Column(String, nullable=True)  # LGA key (lga_resolver.key) of the reporter at report time
+    idempotency_key = Column(String, unique=True, nullable=True)  # client-generated, for offline-queued reports
+
+class DBSymptomDaily(Base):
+    __tablename__ = "symptom_daily"
+    lga = Column(String, primary_key=True)  # LGA key (lga_resolver.key)
+    day = Column(String, primary_key=True)  # "YYYY-MM-DD" (UTC)
+    symptom = Column(String, primary_key=True)  # "fever", "cough", ...
+    count = Column(Integer, nullable=False, default=0)
+
+class DBNotifyState(Base):
+    __tablename__ = "notify_state"
+    user_id = Column(String, primary_key=True)
+    risk_level = Column(String, nullable=False)
+    risk_factors = Column(String, default="")  # sorted, "|"-joined contributing risks
+    notified_at = Column(String, nullable=True)  # last time a call actually went out
+
+class DBLgaRisk(Base):
+    __tablename__ = "lga_risk"
+    lga = Column(String, primary_key=True)  # LGA key: canonical id, else stripped lowercase name
+    risk_level = Column(String, nullable=False)
+    risk_factors = Column(String, default="")
+    rainfall = Column(Float, default=0.0)
+    version = Column(Integer, default=1)  # bumped on every risk change
+    updated_at = Column(String, nullable=False)
+
+class DBPrewarmedAudio(Base):
+    __tablename__ = "prewarmed_audio"
+    __table_args__ = (UniqueConstraint("lga", "personality", "risk_factors"),)
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    lga = Column(String, nullable=False)
+    personality = Column(String, nullable=False)
+    risk_level = Column(String, nullable=False)
+    risk_factors = Column(String, default="")
+    script = Column(Text, nullable=False)
+    audio_url = Column(String, nullable=True)
+    created_at = Column(String, nullable=False)
+
+class DBCallEvent(Base):
+    __tablename__ = "call_events"
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    call_id = Column(String, nullable=False, index=True)
+    call_sid = Column(String, nullable=True)
+    status = Column(String, nullable=False)  # "initiated", "ringing", "answered", "completed", ...
+    duration = Column(Integer, nullable=True)  # seconds, only sent with "completed"
+    timestamp = Column(String, nullable=False)
+
+class DBAnomaly(Base):
+    __tablename__ = "anomalies"
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    lga = Column(String, nullable=False, index=True)
+    symptom = Column(String, nullable=False)
+    day = Column(String, nullable=False)
+    count = Column(Integer, nullable=False)
+    baseline = Column(Float, nullable=False)  # EWMA mean of previous days
+    z_score = Column(Float, nullable=False)
+    disease = Column(String, nullable=True)  # suspected disease written to the hotspot layer
+    detected_at = Column(String, nullable=False)
+    expires_at = Column(String, nullable=False)
+    __table_args__ = (UniqueConstraint("lga", "symptom", "day"),)
+
+class DBHealthScore(Base):
+    __tablename__ = "health_scores"
+    __table_args__ = (Index("ix_health_scores_lga_score", "lga", "score"),)
+    user_id = Column(String, primary_key=True)
+    lga = Column(String, nullable=False)  # LGA key (lga_resolver.key)
+    score = Column(Integer, nullable=False)
+    risk_level = Column(String, nullable=False)
+    rainfall = Column(Float, default=0.0)
+    symptom_penalty = Column(Integer, default=0)  # from the three most recent symptom logs
+    updated_at = Column(String, nullable=False)
+
+class DBSweepShard(Base):
+    __tablename__ = "sweep_shards"
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    sweep_id = Column(String, nullable=False, index=True)
+    shard_index = Column(Integer, nullable=False)
+    lower_bound = Column(String, nullable=False)  # inclusive user id bound
+    upper_bound = Column(String, nullable=True)  # exclusive, None = open ended
+    status = Column(String, default="pending")  # "pending", "claimed", "done"
+    worker_id = Column(String, nullable=True)
+    checkpoint = Column(String, nullable=True)  # last user id processed in this shard
+    processed = Column(Integer, default=0)
+    failed = Column(Text, nullable=True)  # JSON list of user ids whose call failed, retried before the shard is done
+    heartbeat_at = Column(String, nullable=True)
+    created_at = Column(String, nullable=False)
+    __table_args__ = (UniqueConstraint("sweep_id", "shard_index"),)
 
 class UserBase(BaseModel):
     name: str
@@ -59,10 +167,19 @@ class UserCreate(UserBase):
 
 class User(UserBase):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    lga_id: Optional[str] = None
     
     class Config:
         from_attributes = True
 
+class LoginResponse(User):
+    access_token: Optional[str] = None  # null when the server has no JWT_SECRET
+    refresh_token: Optional[str] = None
+    token_type: str = "bearer"
+
+class TokenRefresh(BaseModel):
+    refresh_token: str
+
 class UserResponse(BaseModel):
     response: str
     lat: Optional[float] = None
@@ -85,6 +202,33 @@ class SymptomLog(BaseModel):
     class Config:
         from_attributes = True
 
+class SymptomReport(BaseModel):
+    idempotency_key: str = Field(..., min_length=8, max_length=64)
+    timestamp: Optional[str] = None  # when the report was made on the device (ISO 8601)
+    fever: int = 0
+    cough: int = 0
+    headache: int = 0
+    fatigue: int = 0
+    diarrhea: int = 0
+    vomiting: int = 0
+    notes: Optional[str] = None
+    lat: Optional[float] = None
+    lon: Optional[float] = None
+
+class SymptomBatch(BaseModel):
+    user_id: str
+    reports: List[SymptomReport]
+
+class CallEvent(BaseModel):
+    call_id: str
+    call_sid: Optional[str] = None
+    status: str
+    duration: Optional[int] = None
+    timestamp: str
+
+    class Config:
+        from_attributes = True
+
 class Log(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     user_id: str
@@ -93,6 +237,7 @@ class Log(BaseModel):
     script: Optional[str] = None
     audio_url: Optional[str] = None
     response: Optional[str] = None
+    fallbacks: Optional[str] = None
 
     class Config:
         from_attributes = True
@@ -122,3 +267,26 @@ class Message(MessageBase):
 
     class Config:
         from_attributes = True
+
+class BroadcastCreate(BaseModel):
+    scope: str # "lga", "state", "all"
+    target: Optional[str] = None
+    title: str
+    content: str
+    type: str
+
+class Broadcast(BroadcastCreate):
+    id: str
+    timestamp: str
+
+    class Config:
+        from_attributes = True
+
+class SymptomAggregate(BaseModel):
+    lga: str
+    day: str
+    symptom: str
+    count: int
+
+    class Config:
+        from_attributes = True
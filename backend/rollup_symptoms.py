@@ -0,0 +1,21 @@
+# rollup_symptoms.py
+import asyncio
+import sys
+from datetime import datetime, timedelta
+
+from data import AsyncSessionLocal
+from services import surveillance
+
+async def rollup(start: str, end: str):
+    print(f"Rebuilding symptom aggregates for {start} to {end}...")
+    async with AsyncSessionLocal() as session:
+        rows = await surveillance.rebuild(session, start, end)
+        await session.commit()
+    print(f"✅ Rebuilt {rows} daily counters.")
+
+if __name__ == "__main__":
+    # Usage: python rollup_symptoms.py [start YYYY-MM-DD] [end YYYY-MM-DD]  (defaults to the last 30 days)
+    today = datetime.utcnow().date()
+    start = sys.argv[1] if len(sys.argv) > 1 else (today - timedelta(days=30)).isoformat()
+    end = sys.argv[2] if len(sys.argv) > 2 else today.isoformat()
+    asyncio.run(rollup(start, end))
@@ -3,45 +3,31 @@ from apscheduler.triggers.interval import IntervalTrigger
 import os
 import atexit
 import asyncio
-import httpx
-from data import AsyncSessionLocal
-from models import DBUser
-from sqlalchemy import select
+import sweep
 
-async def get_all_user_ids():
-    async with AsyncSessionLocal() as session:
-        result = await session.execute(select(DBUser.id))
-        return result.scalars().all()
-
-async def check_user_and_call(user_id: str):
-    domain = os.getenv("DOMAIN", "https://sabi-health.onrender.com/")
-    async with httpx.AsyncClient() as client:
-        try:
-            resp = await client.put(f"{domain}/call-user/{user_id}")
-            resp.raise_for_status()
-            print(f"Scheduled call for user {user_id}: {resp.json()}")
-        except Exception as e:
-            print(f"Failed scheduled call for user {user_id}: {e}")
+# Set SWEEP_LOCAL_WORKER=0 when dedicated `python sweep.py worker` processes drain the shards
+SWEEP_LOCAL_WORKER = os.getenv("SWEEP_LOCAL_WORKER", "1") == "1"
 
 def run_scheduled_checks():
     loop = asyncio.new_event_loop()
     asyncio.set_event_loop(loop)
     try:
-        user_ids = loop.run_until_complete(get_all_user_ids())
-        tasks = [check_user_and_call(uid) for uid in user_ids]
-        if tasks:
-            loop.run_until_complete(asyncio.gather(*tasks))
+        # Own loop, so the sweep uses its own engine rather than the API's pool
+        loop.run_until_complete(sweep.run_scheduled(local_worker=SWEEP_LOCAL_WORKER))
     finally:
         loop.close()
 
 scheduler = BackgroundScheduler()
-scheduler.start()
-scheduler.add_job(
-    func=run_scheduled_checks,
-    trigger=IntervalTrigger(hours=1),
-    id='hourly_risk_check',
-    name='Check all users every hour',
-    replace_existing=True
-)
 
-atexit.register(lambda: scheduler.shutdown())
\ No newline at end of file
+def start():
+    if scheduler.running:
+        return
+    scheduler.start()
+    scheduler.add_job(
+        func=run_scheduled_checks,
+        trigger=IntervalTrigger(hours=1),
+        id='hourly_risk_check',
+        name='Check all users every hour',
+        replace_existing=True
+    )
+    atexit.register(lambda: scheduler.shutdown())
@@ -0,0 +1,215 @@
+# services/anomaly.py
+"""
+Outbreak detection over the syndromic counters.
+
+One EWMA series per (LGA, symptom) tracks the usual daily count and its
+variance. The series are not kept in process memory: every replica only sees
+its own share of reports, so when reports arrive `process` replays the shared
+`symptom_daily` counters for the touched (LGA, symptom) pairs and checks the
+day's database-wide count. When it sits more than ANOMALY_Z_THRESHOLD standard
+deviations above the baseline (and above a minimum count) the spike is stored
+once in `anomalies` (unique per LGA, symptom and day, whichever replica sees it
+first). Every replica reloads active anomalies into the dynamic hotspot layer
+that `hotspots.is_hotspot` and `check_risk_for_lga` consult every
+ANOMALY_REFRESH_SECONDS, so a spike found on one replica reaches them all.
+"""
+import asyncio
+import math
+import os
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from data import AsyncReadSessionLocal
+from models import DBAnomaly, DBSymptomDaily
+from services import hotspots
+
+ANOMALY_EWMA_ALPHA = float(os.getenv("ANOMALY_EWMA_ALPHA", "0.3"))
+ANOMALY_Z_THRESHOLD = float(os.getenv("ANOMALY_Z_THRESHOLD", "3.0"))
+ANOMALY_MIN_COUNT = int(os.getenv("ANOMALY_MIN_COUNT", "5"))
+ANOMALY_WARMUP_DAYS = int(os.getenv("ANOMALY_WARMUP_DAYS", "3"))
+ANOMALY_HOTSPOT_DAYS = int(os.getenv("ANOMALY_HOTSPOT_DAYS", "7"))
+ANOMALY_REFRESH_SECONDS = float(os.getenv("ANOMALY_REFRESH_SECONDS", "60"))
+BASELINE_DAYS = 28  # history replayed to build a baseline
+
+# Symptom spikes that map to a suspected disease for the hotspot layer
+SUSPECTED_DISEASES = {
+    "diarrhea": "Cholera (suspected, symptom spike)",
+    "vomiting": "Cholera (suspected, symptom spike)",
+    "fever": "Malaria or Lassa fever (suspected, symptom spike)",
+}
+
+class EwmaSeries:
+    """Exponentially weighted mean/variance of daily counts plus today's running count."""
+    __slots__ = ("day", "count", "mean", "var", "days", "alerted_day")
+
+    def __init__(self):
+        self.day = None
+        self.count = 0
+        self.mean = 0.0
+        self.var = 0.0
+        self.days = 0
+        self.alerted_day = None
+
+    def _fold(self, value: float):
+        if self.days == 0:
+            self.mean = value
+        else:
+            diff = value - self.mean
+            incr = ANOMALY_EWMA_ALPHA * diff
+            self.mean += incr
+            self.var = (1 - ANOMALY_EWMA_ALPHA) * (self.var + diff * incr)
+        self.days += 1
+
+    def advance(self, day: str):
+        """Close out earlier days (missing days count as zero reports)."""
+        if self.day is None:
+            self.day = day
+            return
+        if day <= self.day:
+            return
+        gap = (date.fromisoformat(day) - date.fromisoformat(self.day)).days
+        self._fold(self.count)
+        for _ in range(min(gap - 1, BASELINE_DAYS)):
+            self._fold(0)
+        self.day = day
+        self.count = 0
+
+    def observe(self, day: str, increment: int) -> Optional[float]:
+        """Add reports for `day`; returns the z-score the first time that day turns anomalous."""
+        self.advance(day)
+        if day != self.day:
+            return None  # late report for a day already folded into the baseline
+        self.count += increment
+        if self.days < ANOMALY_WARMUP_DAYS or self.count < ANOMALY_MIN_COUNT or self.alerted_day == day:
+            return None
+        z = (self.count - self.mean) / math.sqrt(self.var + 1.0)
+        if z < ANOMALY_Z_THRESHOLD:
+            return None
+        self.alerted_day = day
+        return z
+
+def _score(history: Dict[str, int], day: str) -> Optional[Tuple[EwmaSeries, float]]:
+    """Replay daily counts up to `day`; returns the series and z-score if `day` is anomalous."""
+    series = EwmaSeries()
+    for d in sorted(history):
+        if d < day:
+            series.advance(d)
+            series.count += history[d]
+    z = series.observe(day, history.get(day, 0))
+    return (series, z) if z is not None else None
+
+def _raise_hotspot(anomaly: DBAnomaly):
+    if anomaly.disease:
+        hotspots.add_dynamic_hotspot(
+            anomaly.lga,
+            anomaly.disease,
+            "HIGH",
+            f"Sabi symptom surveillance ({anomaly.symptom} spike on {anomaly.day})",
+            anomaly.expires_at
+        )
+
+async def process(db: AsyncSession, counts: Dict[Tuple[str, str, str], int]) -> List[DBAnomaly]:
+    """
+    Check the days and symptoms touched by new counter increments (already recorded
+    in this transaction) against the shared counters; store new anomalies and raise
+    hotspots. Caller commits.
+    """
+    touched = defaultdict(set)  # (lga, symptom) -> days
+    for lga, day, symptom in counts:
+        touched[(lga, symptom)].add(day)
+    if not touched:
+        return []
+
+    lgas = {lga for lga, _ in touched}
+    since = (date.fromisoformat(min(d for days in touched.values() for d in days))
+             - timedelta(days=BASELINE_DAYS)).isoformat()
+    result = await db.execute(
+        select(DBSymptomDaily).where(
+            DBSymptomDaily.lga.in_(lgas),
+            DBSymptomDaily.symptom.in_({symptom for _, symptom in touched}),
+            DBSymptomDaily.day >= since
+        )
+    )
+    history = defaultdict(dict)
+    for row in result.scalars().all():
+        history[(row.lga, row.symptom)][row.day] = row.count
+
+    anomalies = []
+    now = datetime.utcnow()
+    for (lga, symptom), days in touched.items():
+        for day in sorted(days):
+            scored = _score(history[(lga, symptom)], day)
+            if scored is None:
+                continue
+            series, z = scored
+            anomalies.append(dict(
+                lga=lga,
+                symptom=symptom,
+                day=day,
+                count=series.count,
+                baseline=series.mean,
+                z_score=z,
+                disease=SUSPECTED_DISEASES.get(symptom),
+                detected_at=now.isoformat(),
+                expires_at=(now + timedelta(days=ANOMALY_HOTSPOT_DAYS)).isoformat()
+            ))
+    if not anomalies:
+        return []
+
+    # First detection of a (lga, symptom, day) wins; later reports that day don't re-alert
+    result = await db.execute(
+        pg_insert(DBAnomaly).values(anomalies)
+        .on_conflict_do_nothing(index_elements=[DBAnomaly.lga, DBAnomaly.symptom, DBAnomaly.day])
+        .returning(DBAnomaly)
+    )
+    created = result.scalars().all()
+    for anomaly in created:
+        _raise_hotspot(anomaly)
+        print(f"🚨 Anomaly: {anomaly.symptom} spike in {anomaly.lga} on {anomaly.day} "
+              f"({anomaly.count} reports, baseline {anomaly.baseline:.1f}, z={anomaly.z_score:.1f})")
+    return created
+
+async def refresh_hotspots(db: AsyncSession):
+    """Replace this replica's dynamic hotspot layer with the active anomalies in the database."""
+    result = await db.execute(
+        select(DBAnomaly)
+        .where(DBAnomaly.expires_at > datetime.utcnow().isoformat(), DBAnomaly.disease.isnot(None))
+        .order_by(DBAnomaly.detected_at)
+    )
+    hotspots.replace_dynamic_hotspots({
+        anomaly.lga: {
+            "disease": anomaly.disease,
+            "risk": "HIGH",
+            "source": f"Sabi symptom surveillance ({anomaly.symptom} spike on {anomaly.day})",
+            "expires_at": anomaly.expires_at
+        }
+        for anomaly in result.scalars().all()  # latest detection per LGA wins
+    })
+
+_refresh_task: Optional[asyncio.Task] = None
+
+async def _refresh_loop():
+    while True:
+        try:
+            async with AsyncReadSessionLocal() as session:
+                await refresh_hotspots(session)
+        except Exception as e:
+            print(f"Hotspot refresh failed: {e}")
+        await asyncio.sleep(ANOMALY_REFRESH_SECONDS)
+
+def start():
+    """Load active anomalies now and keep reloading them (call from startup)."""
+    global _refresh_task
+    if _refresh_task is None:
+        _refresh_task = asyncio.create_task(_refresh_loop())
+
+async def stop():
+    global _refresh_task
+    if _refresh_task:
+        _refresh_task.cancel()
+        _refresh_task = None
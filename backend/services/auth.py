@@ -0,0 +1,155 @@
+# services/auth.py
+"""
+Signed access/refresh tokens (PyJWT, HS256).
+
+Access tokens are short-lived and carry the profile claims endpoints need
+(name, LGA, personality), so they can be verified in memory instead of
+re-reading the user row. Refresh tokens only carry the user id; exchanging
+one re-reads the user so profile changes reach the next access token.
+
+While clients migrate, requests without a token are still accepted unless
+REQUIRE_AUTH is set; a token that is present must be valid and match the
+user id it is used for. Internal callers (the risk sweep) sign a short-lived
+service token with the same JWT_SECRET; it passes authentication but carries
+no user profile, so handlers read the user from the database.
+
+Every replica must share JWT_SECRET, so there is no per-process default:
+without it /login returns null tokens, and REQUIRE_AUTH refuses to start.
+"""
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import NamedTuple, Optional
+
+import jwt
+from fastapi import Depends, HTTPException, Request
+
+JWT_SECRET = os.getenv("JWT_SECRET", "")
+JWT_ALGORITHM = "HS256"
+ACCESS_TOKEN_MINUTES = int(os.getenv("ACCESS_TOKEN_MINUTES", "15"))
+REFRESH_TOKEN_DAYS = int(os.getenv("REFRESH_TOKEN_DAYS", "14"))
+REQUIRE_AUTH = os.getenv("REQUIRE_AUTH", "0").strip().lower() in ("1", "true", "yes", "on")
+SERVICE_TOKEN_MINUTES = int(os.getenv("SERVICE_TOKEN_MINUTES", "5"))
+SERVICE_ROLE = "service"
+
+if not JWT_SECRET:
+    if REQUIRE_AUTH:
+        raise RuntimeError("REQUIRE_AUTH is set but JWT_SECRET is not")
+    print("⚠️ JWT_SECRET not set – tokens are not issued and requests are unauthenticated")
+
+class Claims(NamedTuple):
+    sub: str  # user id
+    name: str
+    lga: str
+    personality: str
+
+def _encode(payload: dict, lifetime: timedelta) -> str:
+    if not JWT_SECRET:
+        raise HTTPException(status_code=503, detail="Token signing is not configured (JWT_SECRET)")
+    now = datetime.now(timezone.utc)
+    return jwt.encode({**payload, "iat": now, "exp": now + lifetime}, JWT_SECRET, algorithm=JWT_ALGORITHM)
+
+def create_access_token(user) -> str:
+    return _encode({
+        "sub": user.id,
+        "type": "access",
+        "name": user.name,
+        "lga": user.lga,
+        "personality": user.ai_personality or "Mama Health"
+    }, timedelta(minutes=ACCESS_TOKEN_MINUTES))
+
+def create_refresh_token(user_id: str) -> str:
+    return _encode({"sub": user_id, "type": "refresh", "jti": uuid.uuid4().hex}, timedelta(days=REFRESH_TOKEN_DAYS))
+
+def create_service_token(service: str) -> str:
+    """Short-lived token for an internal caller; accepted on every user route."""
+    return _encode({"sub": f"{SERVICE_ROLE}:{service}", "type": "access", "role": SERVICE_ROLE},
+                   timedelta(minutes=SERVICE_TOKEN_MINUTES))
+
+def service_headers(service: str) -> dict:
+    """Authorization header for internal requests (empty when JWT_SECRET isn't configured)."""
+    return {"Authorization": f"Bearer {create_service_token(service)}"} if JWT_SECRET else {}
+
+def issue_tokens(user) -> dict:
+    if not JWT_SECRET:
+        return {"access_token": None, "refresh_token": None, "token_type": "bearer"}
+    return {
+        "access_token": create_access_token(user),
+        "refresh_token": create_refresh_token(user.id),
+        "token_type": "bearer"
+    }
+
+def decode(token: str, token_type: str = "access") -> dict:
+    if not JWT_SECRET:
+        raise HTTPException(status_code=401, detail="Invalid token", headers={"WWW-Authenticate": "Bearer"})
+    try:
+        payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM], options={"require": ["exp", "sub"]})
+    except jwt.ExpiredSignatureError:
+        raise HTTPException(status_code=401, detail="Token expired", headers={"WWW-Authenticate": "Bearer"})
+    except jwt.InvalidTokenError:
+        raise HTTPException(status_code=401, detail="Invalid token", headers={"WWW-Authenticate": "Bearer"})
+    if payload.get("type") != token_type:
+        raise HTTPException(status_code=401, detail="Invalid token type", headers={"WWW-Authenticate": "Bearer"})
+    return payload
+
+def verify(token: str) -> Optional[dict]:
+    """Payload of a valid access token, or None (used where no exception should escape, e.g. middleware)."""
+    try:
+        return decode(token)
+    except HTTPException:
+        return None
+
+def is_service_token(token: str) -> bool:
+    """True for a valid service token."""
+    payload = verify(token)
+    return payload is not None and payload.get("role") == SERVICE_ROLE
+
+def _bearer(request: Request) -> Optional[str]:
+    header = request.headers.get("authorization", "")
+    return header[7:].strip() if header.lower().startswith("bearer ") else None
+
+def require_service(request: Request):
+    """Dependency for operator-only routes: a service token is required even when REQUIRE_AUTH is off."""
+    token = _bearer(request)
+    if not token or not is_service_token(token):
+        raise HTTPException(status_code=401, detail="Service token required", headers={"WWW-Authenticate": "Bearer"})
+
+def _claims(token: Optional[str]) -> Optional[Claims]:
+    if not token:
+        if REQUIRE_AUTH:
+            raise HTTPException(status_code=401, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"})
+        return None
+    payload = decode(token)
+    if payload.get("role") == SERVICE_ROLE:
+        return None
+    return Claims(payload["sub"], payload.get("name", ""), payload.get("lga", ""), payload.get("personality", "Mama Health"))
+
+def get_claims(request: Request) -> Optional[Claims]:
+    """
+    Verified claims from `Authorization: Bearer ...`. None when no token was
+    sent, or for a service token, which is authenticated but has no user profile.
+    """
+    return _claims(_bearer(request))
+
+def get_stream_claims(request: Request) -> Optional[Claims]:
+    """
+    As get_claims, but also accepts `?access_token=` for EventSource, which
+    can't set headers. Only for SSE routes: URLs end up in access logs and
+    browser history, so everywhere else the token must travel in the header.
+    """
+    return _claims(_bearer(request) or request.query_params.get("access_token"))
+
+def check_subject(claims: Optional[Claims], user_id: Optional[str]):
+    """Reject a token being used on someone else's data."""
+    if claims is not None and user_id and claims.sub != user_id:
+        raise HTTPException(status_code=403, detail="Token does not match user")
+
+def authorize_user(user_id: str, claims: Optional[Claims] = Depends(get_claims)) -> Optional[Claims]:
+    """Dependency for routes with a `{user_id}` path parameter."""
+    check_subject(claims, user_id)
+    return claims
+
+def authorize_stream_user(user_id: str, claims: Optional[Claims] = Depends(get_stream_claims)) -> Optional[Claims]:
+    """authorize_user for SSE routes, which may carry the token in `?access_token=`."""
+    check_subject(claims, user_id)
+    return claims
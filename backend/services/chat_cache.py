@@ -0,0 +1,173 @@
+# services/chat_cache.py
+"""
+Near-duplicate response cache for /chat.
+
+Questions are normalized, cut into character shingles and summarized with a
+MinHash signature. Signatures are bucketed with LSH banding, so a lookup
+only compares against entries sharing at least one band, and a hit needs an
+estimated Jaccard similarity of CHAT_CACHE_SIMILARITY or more. Entries are
+scoped per (personality, LGA), since answers mention local risks, clinics and
+the LGA itself; they expire after CHAT_CACHE_TTL_SECONDS and are evicted
+least-recently-used beyond CHAT_CACHE_MAX_ENTRIES. Questions whose normalized
+text matches exactly skip the MinHash step altogether. Negation words are
+never treated as noise: a near match whose set of negations differs from the
+question's ("my child get fever" / "my child no get fever") is rejected.
+
+Replies are stored with the asker's name swapped for a placeholder and filled
+back in for whoever hits the entry. Only first turns are cached: later replies
+depend on the conversation so far (see main.chat_cache_args).
+"""
+import os
+import random
+import re
+import time
+import zlib
+from collections import OrderedDict, defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+
+CHAT_CACHE_MAX_ENTRIES = int(os.getenv("CHAT_CACHE_MAX_ENTRIES", "5000"))
+CHAT_CACHE_TTL_SECONDS = float(os.getenv("CHAT_CACHE_TTL_SECONDS", str(6 * 3600)))
+CHAT_CACHE_SIMILARITY = float(os.getenv("CHAT_CACHE_SIMILARITY", "0.8"))
+
+SHINGLE_SIZE = 4
+NUM_PERM = 64
+BANDS = 16  # 4 rows per band: pairs at 0.8 similarity share a band >99.9% of the time
+ROWS = NUM_PERM // BANDS
+
+NAME_PLACEHOLDER = "{name}"
+
+_PRIME = (1 << 61) - 1
+_rng = random.Random(1337)
+_PERMS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+
+# Words that change the wording but not the question
+_FILLER = {"abeg", "please", "pls", "plz", "biko", "o", "oh", "sabi", "mama", "doctor", "sir", "ma", "the", "a", "an"}
+# Words that flip the meaning of a question; contractions ("don't", "dont") are expanded to "not" first
+_NEGATIONS = {"no", "not", "never", "neva", "nor", "none", "nothing", "without", "cannot"}
+_CONTRACTIONS = re.compile(r"\b(do|does|did|ca|wo|is|are|was|were|ai|has|have|had|should|could|would)n['’]?t\b")
+
+def normalize(text: str) -> str:
+    text = _CONTRACTIONS.sub(r"\1 not", text.lower())
+    words = re.sub(r"[^a-z0-9\s]", " ", text).split()
+    return " ".join(w for w in words if w not in _FILLER)
+
+def negations(normalized: str) -> frozenset:
+    return frozenset(w for w in normalized.split() if w in _NEGATIONS)
+
+def signature(normalized: str) -> Tuple[int, ...]:
+    if len(normalized) <= SHINGLE_SIZE:
+        shingles = {normalized}
+    else:
+        shingles = {normalized[i:i + SHINGLE_SIZE] for i in range(len(normalized) - SHINGLE_SIZE + 1)}
+    hashes = [zlib.crc32(s.encode()) for s in shingles]
+    return tuple(min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMS)
+
+def similarity(sig_a: Tuple[int, ...], sig_b: Tuple[int, ...]) -> float:
+    """Estimated Jaccard similarity of the two shingle sets."""
+    return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / NUM_PERM
+
+def _bands(sig: Tuple[int, ...]) -> List[Tuple[int, Tuple[int, ...]]]:
+    return [(i, sig[i * ROWS:(i + 1) * ROWS]) for i in range(BANDS)]
+
+def _template(reply: str, name: str) -> str:
+    if name:
+        reply = re.sub(rf"\b{re.escape(name)}\b", NAME_PLACEHOLDER, reply, flags=re.IGNORECASE)
+    return reply
+
+class _Entry:
+    __slots__ = ("scope", "normalized", "negations", "signature", "template", "created_at")
+
+    def __init__(self, scope: tuple, normalized: str, sig: Tuple[int, ...], template: str):
+        self.scope = scope
+        self.normalized = normalized
+        self.negations = negations(normalized)
+        self.signature = sig
+        self.template = template
+        self.created_at = time.monotonic()
+
+class ChatCache:
+    def __init__(self, max_entries: int = CHAT_CACHE_MAX_ENTRIES, ttl_seconds: float = CHAT_CACHE_TTL_SECONDS,
+                 threshold: float = CHAT_CACHE_SIMILARITY):
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self.threshold = threshold
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._buckets: Dict[tuple, Set[int]] = defaultdict(set)  # (scope, band, rows) -> entry ids
+        self._exact: Dict[Tuple[tuple, str], int] = {}  # (scope, normalized text) -> entry id
+        self._next_id = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _remove(self, entry_id: int):
+        entry = self._entries.pop(entry_id)
+        if self._exact.get((entry.scope, entry.normalized)) == entry_id:
+            del self._exact[(entry.scope, entry.normalized)]
+        for band in _bands(entry.signature):
+            key = (entry.scope, *band)
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket.discard(entry_id)
+                if not bucket:
+                    del self._buckets[key]
+
+    def lookup(self, scope: tuple, message: str, name: str) -> Optional[str]:
+        """A cached reply to a near-identical question in this (personality, LGA) scope, addressed to `name`."""
+        now = time.monotonic()
+        normalized = normalize(message)
+        best_id = self._exact.get((scope, normalized))
+        if best_id is not None and now - self._entries[best_id].created_at > self.ttl:
+            self._remove(best_id)
+            best_id = None
+
+        if best_id is None:
+            sig = signature(normalized)
+            negated = negations(normalized)
+            candidates = set()
+            for band in _bands(sig):
+                candidates |= self._buckets.get((scope, *band), set())
+
+            best_score = self.threshold
+            for entry_id in candidates:
+                entry = self._entries[entry_id]
+                if now - entry.created_at > self.ttl:
+                    self._remove(entry_id)
+                    continue
+                if entry.negations != negated:
+                    continue  # similar wording, opposite meaning
+                score = similarity(sig, entry.signature)
+                if score >= best_score:
+                    best_id, best_score = entry_id, score
+
+        if best_id is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(best_id)
+        template = self._entries[best_id].template
+        return template.replace(NAME_PLACEHOLDER, name or "my friend")
+
+    def store(self, scope: tuple, message: str, reply: str, name: str):
+        normalized = normalize(message)
+        sig = signature(normalized)
+        entry_id = self._next_id
+        self._next_id += 1
+        self._entries[entry_id] = _Entry(scope, normalized, sig, _template(reply, name))
+        self._exact[(scope, normalized)] = entry_id
+        for band in _bands(sig):
+            self._buckets[(scope, *band)].add(entry_id)
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else None
+        }
+
+cache = ChatCache()
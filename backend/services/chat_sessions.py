@@ -0,0 +1,103 @@
+# services/chat_sessions.py
+"""
+In-memory conversation sessions for /chat.
+
+Each signed-in user gets a session holding their cached profile (name,
+personality, LGA), the most recent turns verbatim and a rolling summary of
+older turns. Recent turns are kept within CHAT_HISTORY_TOKEN_BUDGET; when
+they overflow, the oldest turn is folded into the summary, which is itself
+capped at CHAT_SUMMARY_TOKEN_BUDGET. Sessions are evicted least-recently-used
+beyond CHAT_SESSION_MAX and dropped after CHAT_SESSION_TTL_SECONDS idle.
+"""
+import os
+import time
+from collections import OrderedDict, deque
+from typing import Deque, List, Optional, Tuple
+
+CHAT_SESSION_MAX = int(os.getenv("CHAT_SESSION_MAX", "2000"))
+CHAT_SESSION_TTL_SECONDS = float(os.getenv("CHAT_SESSION_TTL_SECONDS", "1800"))
+CHAT_HISTORY_TOKEN_BUDGET = int(os.getenv("CHAT_HISTORY_TOKEN_BUDGET", "300"))
+CHAT_SUMMARY_TOKEN_BUDGET = int(os.getenv("CHAT_SUMMARY_TOKEN_BUDGET", "120"))
+
+# Characters of each side of a turn kept when it is folded into the summary
+SUMMARY_SNIPPET_CHARS = 80
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token), good enough for budgeting."""
+    return len(text) // 4 + 1
+
+def _snippet(text: str) -> str:
+    text = " ".join(text.split())
+    if len(text) <= SUMMARY_SNIPPET_CHARS:
+        return text
+    return text[:SUMMARY_SNIPPET_CHARS].rsplit(" ", 1)[0] + "…"
+
+class ChatSession:
+    def __init__(self, user_id: str, name: str, personality: str, lga: str):
+        self.user_id = user_id
+        self.name = name
+        self.personality = personality
+        self.lga = lga
+        self.turns: Deque[Tuple[str, str]] = deque()  # (user message, reply)
+        self.summary: List[str] = []  # one compressed line per folded turn
+        self.last_seen = time.monotonic()
+
+    def _turn_tokens(self) -> int:
+        return sum(estimate_tokens(q) + estimate_tokens(a) for q, a in self.turns)
+
+    def add_turn(self, message: str, reply: str):
+        self.turns.append((message, reply))
+        while len(self.turns) > 1 and self._turn_tokens() > CHAT_HISTORY_TOKEN_BUDGET:
+            question, answer = self.turns.popleft()
+            self.summary.append(f"They asked: {_snippet(question)} You said: {_snippet(answer)}")
+        while self.summary and sum(estimate_tokens(line) for line in self.summary) > CHAT_SUMMARY_TOKEN_BUDGET:
+            self.summary.pop(0)
+
+    def history_prompt(self) -> str:
+        """Prompt section describing the conversation so far ('' for a new session)."""
+        parts = []
+        if self.summary:
+            parts.append("Earlier in this conversation:\n" + "\n".join(f"- {line}" for line in self.summary))
+        if self.turns:
+            recent = "\n".join(f"User: {q}\nYou: {a}" for q, a in self.turns)
+            parts.append(f"Most recent exchanges:\n{recent}")
+        return "\n\n".join(parts)
+
+class ChatSessionStore:
+    def __init__(self, max_sessions: int = CHAT_SESSION_MAX, ttl_seconds: float = CHAT_SESSION_TTL_SECONDS):
+        self.max_sessions = max_sessions
+        self.ttl = ttl_seconds
+        self._sessions: "OrderedDict[str, ChatSession]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def _expire(self):
+        # Oldest-first order means we can stop at the first live session
+        cutoff = time.monotonic() - self.ttl
+        while self._sessions:
+            user_id, session = next(iter(self._sessions.items()))
+            if session.last_seen >= cutoff:
+                break
+            del self._sessions[user_id]
+
+    def get(self, user_id: str) -> Optional[ChatSession]:
+        self._expire()
+        session = self._sessions.get(user_id)
+        if session is not None:
+            session.last_seen = time.monotonic()
+            self._sessions.move_to_end(user_id)
+        return session
+
+    def create(self, user_id: str, name: str, personality: str, lga: str) -> ChatSession:
+        session = ChatSession(user_id, name, personality, lga)
+        self._sessions[user_id] = session
+        self._sessions.move_to_end(user_id)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+        return session
+
+    def drop(self, user_id: str):
+        self._sessions.pop(user_id, None)
+
+store = ChatSessionStore()
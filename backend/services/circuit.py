@@ -0,0 +1,71 @@
+# services/circuit.py
+"""
+Circuit breakers for upstream services (Open-Meteo, GeoJSON host, YarnGPT, Gemini).
+
+After CIRCUIT_FAILURE_THRESHOLD consecutive failures a breaker opens and
+callers fail fast, serving a stale or fallback value instead of waiting on
+timeouts. After CIRCUIT_RESET_SECONDS one request is let through as a
+half-open probe; its outcome closes the breaker again or re-opens it.
+"""
+import os
+import time
+from typing import Dict
+
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "3"))
+CIRCUIT_RESET_SECONDS = float(os.getenv("CIRCUIT_RESET_SECONDS", "30"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+                 reset_timeout: float = CIRCUIT_RESET_SECONDS):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+
+    def allow(self) -> bool:
+        """Whether a request may go upstream now. Moving to half-open admits a single probe."""
+        if self.state == CLOSED:
+            return True
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            # Re-arm the timer so concurrent callers keep failing fast until the probe reports back
+            self.state = HALF_OPEN
+            self.opened_at = time.monotonic()
+            return True
+        return False
+
+    @property
+    def probing(self) -> bool:
+        return self.state == HALF_OPEN
+
+    def record_success(self):
+        if self.state != CLOSED:
+            print(f"✅ Circuit '{self.name}' closed")
+        self.state = CLOSED
+        self.failures = 0
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != OPEN:
+                print(f"⚠️ Circuit '{self.name}' open – failing fast for {self.reset_timeout:.0f}s")
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+
+    def status(self) -> dict:
+        return {"state": self.state, "failures": self.failures}
+
+_breakers: Dict[str, CircuitBreaker] = {}
+
+def get_breaker(name: str) -> CircuitBreaker:
+    if name not in _breakers:
+        _breakers[name] = CircuitBreaker(name)
+    return _breakers[name]
+
+def all_statuses() -> dict:
+    return {name: breaker.status() for name, breaker in _breakers.items()}
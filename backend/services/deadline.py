@@ -0,0 +1,74 @@
+# services/deadline.py
+"""
+Request-scoped time budget for the call pipeline.
+
+`call_user` creates one Deadline and passes it to every stage (coordinates,
+rainfall, script, audio, dial). A stage gets at most its own cap from
+STAGE_SECONDS and never eats into the time reserved for the dial; when the
+remaining budget is too small, or the stage overruns, the caller uses its
+fallback (cached rainfall, canned script, Polly <Say>) and the fallback is
+recorded so it can be stored on the call log.
+"""
+import asyncio
+import os
+import time
+from typing import Awaitable, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+CALL_DEADLINE_SECONDS = float(os.getenv("CALL_DEADLINE_SECONDS", "25"))
+# Kept back for placing the Twilio call, whatever the earlier stages do
+CALL_DIAL_RESERVE_SECONDS = float(os.getenv("CALL_DIAL_RESERVE_SECONDS", "5"))
+# A stage isn't started with less than this left; its fallback is used straight away
+STAGE_MIN_SECONDS = float(os.getenv("CALL_STAGE_MIN_SECONDS", "0.5"))
+
+# Upper bound per stage, in seconds
+STAGE_SECONDS = {
+    "coordinates": float(os.getenv("CALL_COORDINATES_SECONDS", "4")),
+    "rainfall": float(os.getenv("CALL_RAINFALL_SECONDS", "4")),
+    "script": float(os.getenv("CALL_SCRIPT_SECONDS", "8")),
+    "audio": float(os.getenv("CALL_AUDIO_SECONDS", "8")),
+}
+
+class Deadline:
+    def __init__(self, seconds: float = CALL_DEADLINE_SECONDS, reserve: float = CALL_DIAL_RESERVE_SECONDS):
+        self.started = time.monotonic()
+        self.expires_at = self.started + seconds
+        self.reserve = reserve
+        self.fallbacks: List[str] = []
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def elapsed_ms(self) -> int:
+        return round((time.monotonic() - self.started) * 1000)
+
+    def budget(self, stage: str) -> float:
+        """Seconds `stage` may take without touching the dial reserve."""
+        return min(STAGE_SECONDS.get(stage, self.remaining()), self.remaining() - self.reserve)
+
+    def record(self, fallback: str):
+        if fallback not in self.fallbacks:
+            self.fallbacks.append(fallback)
+
+    async def run(self, stage: str, awaitable: Awaitable[T], fallback: str) -> Optional[T]:
+        """
+        Await a stage within its budget. Returns None (after recording `fallback`)
+        if there was no time to start it or it overran.
+        """
+        budget = self.budget(stage)
+        if budget < STAGE_MIN_SECONDS:
+            if asyncio.iscoroutine(awaitable):
+                awaitable.close()  # never started; avoids the "never awaited" warning
+            self.record(fallback)
+            return None
+        try:
+            return await asyncio.wait_for(awaitable, budget)
+        except asyncio.TimeoutError:
+            print(f"⏱️ Call stage '{stage}' exceeded {budget:.1f}s – using {fallback}")
+            self.record(fallback)
+            return None
+
+    def summary(self) -> Optional[str]:
+        """Fallbacks used, '|'-joined for the call log (None when every stage ran normally)."""
+        return "|".join(self.fallbacks) or None
@@ -0,0 +1,34 @@
+# services/etag.py
+"""
+Strong ETags from cheap version stamps.
+
+Endpoints compute a small tuple that changes whenever their payload would
+(latest timestamp, row counts, snapshot version, dataset hash, ...), turn it
+into an ETag, and answer `If-None-Match` with 304 before building the body.
+"""
+import hashlib
+import json
+
+from fastapi import Request, Response
+
+def make_etag(*parts) -> str:
+    digest = hashlib.sha1(json.dumps(parts, default=str, sort_keys=True).encode()).hexdigest()
+    return f'"{digest[:24]}"'
+
+def is_fresh(request: Request, etag: str) -> bool:
+    """True if the client's If-None-Match already covers this ETag."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in header.split(",")]
+    return etag in candidates or f"W/{etag}" in candidates
+
+def not_modified(etag: str, cache_control: str = "no-cache") -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control})
+
+def set_headers(response: Response, etag: str, cache_control: str = "no-cache") -> Response:
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = cache_control
+    return response
@@ -0,0 +1,80 @@
+# services/events.py
+"""
+In-process pub/sub hub for server-push (SSE) delivery.
+
+Subscribers listen on a set of channels: their own user channel plus the
+LGA, state and "all" channels that broadcasts and risk transitions go to.
+Each subscriber gets a bounded queue; a slow client drops its oldest events
+instead of holding memory or blocking publishers.
+"""
+import asyncio
+import json
+from collections import OrderedDict
+from typing import Dict, Iterable, Set
+
+from services import lga_resolver
+
+ALL_CHANNEL = "all"
+SUBSCRIBER_QUEUE_SIZE = 100
+
+def user_channel(user_id: str) -> str:
+    return f"user:{user_id}"
+
+def lga_channel(lga: str) -> str:
+    return f"lga:{lga_resolver.key(lga)}"
+
+def state_channel(state: str) -> str:
+    return f"state:{state.strip().lower()}"
+
+def broadcast_channel(scope: str, target: str = None) -> str:
+    if scope == "lga":
+        return lga_channel(target)
+    if scope == "state":
+        return state_channel(target)
+    return ALL_CHANNEL
+
+class EventHub:
+    def __init__(self, queue_size: int = SUBSCRIBER_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+
+    def subscribe(self, channels: Iterable[str]) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        for channel in channels:
+            self._subscribers.setdefault(channel, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue, channels: Iterable[str]):
+        for channel in channels:
+            subscribers = self._subscribers.get(channel)
+            if subscribers:
+                subscribers.discard(queue)
+                if not subscribers:
+                    del self._subscribers[channel]
+
+    def publish(self, channel: str, event: str, data: dict):
+        subscribers = self._subscribers.get(channel)
+        if not subscribers:
+            return
+        message = format_sse(event, data)
+        for queue in subscribers:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(message)
+
+def format_sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+hub = EventHub()
+
+# call_id -> user_id for recent calls, so status callbacks can reach the right client
+_call_users: "OrderedDict[str, str]" = OrderedDict()
+MAX_TRACKED_CALLS = 10000
+
+def track_call(call_id: str, user_id: str):
+    _call_users[call_id] = user_id
+    if len(_call_users) > MAX_TRACKED_CALLS:
+        _call_users.popitem(last=False)
+
+def call_user_id(call_id: str):
+    return _call_users.get(call_id)
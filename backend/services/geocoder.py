@@ -0,0 +1,145 @@
+# services/geocoder.py
+"""
+Offline reverse geocoding: (lat, lon) -> LGA and state.
+
+LGA boundary polygons are read once from a local GeoJSON FeatureCollection
+(LGA_BOUNDARIES_PATH) and indexed in a uniform grid of GRID_CELL_DEGREES
+cells. A lookup only runs point-in-polygon tests against the few polygons
+whose bounding box overlaps the point's cell, so no external geocoding
+service is ever called. Without the file the geocoder is disabled and
+lookups return None, leaving callers on the registered LGA; download it with
+`python fetch_lga_boundaries.py`.
+
+Parsing takes a moment, so the app calls load() in a worker thread at
+startup. The index is built privately and published in one step; until then
+(or while the file is missing) enabled() is False and lookups return None.
+"""
+import json
+import math
+import os
+import threading
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+LGA_BOUNDARIES_PATH = Path(os.getenv(
+    "LGA_BOUNDARIES_PATH", Path(__file__).parent / "lga_boundaries.geojson"
+))
+GRID_CELL_DEGREES = float(os.getenv("GEOCODER_GRID_DEGREES", "0.1"))
+
+# Property names used for LGA/state by the common Nigerian boundary datasets (GRID3, OCHA/HDX, GADM, geoBoundaries)
+LGA_KEYS = ("lga_name", "lganame", "admin2Name", "ADM2_EN", "NAME_2", "shapeName", "lga", "name")
+STATE_KEYS = ("state_name", "statename", "admin1Name", "ADM1_EN", "NAME_1", "state")
+
+Ring = List[Tuple[float, float]]  # (lon, lat) vertices
+
+class Place(NamedTuple):
+    lga: str
+    state: Optional[str]
+
+class _Area:
+    __slots__ = ("place", "polygons", "bbox")
+
+    def __init__(self, place: Place, polygons: List[List[Ring]]):
+        self.place = place
+        self.polygons = polygons  # each polygon: outer ring, then holes
+        lons = [x for polygon in polygons for x, _ in polygon[0]]
+        lats = [y for polygon in polygons for _, y in polygon[0]]
+        self.bbox = (min(lons), min(lats), max(lons), max(lats))
+
+    def contains(self, lon: float, lat: float) -> bool:
+        min_lon, min_lat, max_lon, max_lat = self.bbox
+        if not (min_lon <= lon <= max_lon and min_lat <= lat <= max_lat):
+            return False
+        for outer, *holes in self.polygons:
+            if _in_ring(outer, lon, lat) and not any(_in_ring(hole, lon, lat) for hole in holes):
+                return True
+        return False
+
+def _in_ring(ring: Ring, x: float, y: float) -> bool:
+    """Even-odd ray casting."""
+    inside = False
+    j = len(ring) - 1
+    for i in range(len(ring)):
+        xi, yi = ring[i]
+        xj, yj = ring[j]
+        if (yi > y) != (yj > y) and x < (xj - xi) * (y - yi) / (yj - yi) + xi:
+            inside = not inside
+        j = i
+    return inside
+
+def _first(props: dict, keys) -> Optional[str]:
+    for key in keys:
+        value = props.get(key)
+        if isinstance(value, str) and value.strip():
+            return value.strip()
+    return None
+
+def _cell(lon: float, lat: float) -> Tuple[int, int]:
+    return (math.floor(lon / GRID_CELL_DEGREES), math.floor(lat / GRID_CELL_DEGREES))
+
+_grid: Dict[Tuple[int, int], List[_Area]] = {}
+_areas: List[_Area] = []
+_loaded = False
+_load_lock = threading.Lock()
+
+def load():
+    """Read and index the boundary file once. Blocking; call it off the event loop."""
+    global _grid, _areas, _loaded
+    with _load_lock:
+        if _loaded:
+            return
+        if not LGA_BOUNDARIES_PATH.exists():
+            print(f"⚠️ LGA boundary file {LGA_BOUNDARIES_PATH} not found – reverse geocoding is DISABLED "
+                  f"(/reverse-geocode returns 503). Run `python fetch_lga_boundaries.py` to download it.")
+        else:
+            areas, grid = _build_index()
+            _grid, _areas = grid, areas
+            print(f"🗺️ Loaded {len(areas)} LGA boundaries into {len(grid)} grid cells")
+        _loaded = True
+
+def _build_index() -> Tuple[List[_Area], Dict[Tuple[int, int], List[_Area]]]:
+    with open(LGA_BOUNDARIES_PATH) as f:
+        collection = json.load(f)
+
+    areas: List[_Area] = []
+    grid: Dict[Tuple[int, int], List[_Area]] = defaultdict(list)
+
+    for feature in collection.get("features", []):
+        geometry = feature.get("geometry") or {}
+        props = feature.get("properties") or {}
+        lga = _first(props, LGA_KEYS)
+        if not lga:
+            continue
+        if geometry.get("type") == "Polygon":
+            polygons = [geometry["coordinates"]]
+        elif geometry.get("type") == "MultiPolygon":
+            polygons = geometry["coordinates"]
+        else:
+            continue
+        polygons = [[[(float(x), float(y)) for x, y, *_ in ring] for ring in polygon] for polygon in polygons]
+        area = _Area(Place(lga, _first(props, STATE_KEYS)), polygons)
+        areas.append(area)
+
+        min_lon, min_lat, max_lon, max_lat = area.bbox
+        (x0, y0), (x1, y1) = _cell(min_lon, min_lat), _cell(max_lon, max_lat)
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                grid[(cx, cy)].append(area)
+    return areas, dict(grid)
+
+def enabled() -> bool:
+    if not _loaded:
+        if _load_lock.locked():
+            return False  # still loading in the startup thread; don't stall the caller
+        load()
+    return bool(_areas)
+
+def reverse_geocode(lat: float, lon: float) -> Optional[Place]:
+    """The LGA (and state) containing the point, or None if outside every boundary or disabled."""
+    if not enabled():
+        return None
+    for area in _grid.get(_cell(lon, lat), ()):
+        if area.contains(lon, lat):
+            return area.place
+    return None
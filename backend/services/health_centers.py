@@ -1,6 +1,8 @@
 # services/health_centers.py
 from typing import Dict, Optional
 
+from services import lga_resolver
+
 # Mock data for health centers in major Nigerian LGAs
 # Includes coordinates for map display
 HEALTH_CENTERS = {
@@ -89,8 +91,11 @@ def get_closest_hospital(lat: float, lon: float) -> Optional[Dict]:
     return closest_hospital
 
 def get_nearest_health_center(lga: str) -> Optional[Dict]:
-    """Return health center info for the given LGA (Legacy LGA-based lookup)."""
-    return HEALTH_CENTERS.get(lga.strip().lower())
+    """Return health center info for the given LGA, or failing that its state (Legacy LGA-based lookup)."""
+    for key in lga_resolver.lookup_keys(lga):
+        if key in HEALTH_CENTERS:
+            return HEALTH_CENTERS[key]
+    return None
 
 def get_default_recommendation() -> str:
     return "Please visit the nearest primary health center immediately for a check-up. Stay safe."
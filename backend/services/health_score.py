@@ -0,0 +1,94 @@
+# services/health_score.py
+"""
+Stored health scores.
+
+The score used to be recomputed on every /me request. It is now kept in
+`health_scores` and refreshed only when its inputs change: a new symptom log
+(symptom penalty) or a risk transition for the user's LGA (risk penalty).
+"""
+from datetime import datetime
+from typing import Iterable, Optional
+
+from sqlalchemy import select, update, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import DBHealthScore, DBLgaRisk, DBSymptom
+from services import lga_risk
+
+BASE_SCORE = 100
+RISK_PENALTIES = {"HIGH": 30, "MEDIUM": 15}
+RECENT_SYMPTOMS = 3
+
+def symptom_penalty(symptoms: Iterable[DBSymptom]) -> int:
+    penalty = 0
+    for s in symptoms:
+        if s.fever: penalty += 10
+        if s.cough: penalty += 5
+        if getattr(s, 'diarrhea', 0): penalty += 15
+        if getattr(s, 'vomiting', 0): penalty += 10
+    return penalty
+
+def compute(risk_level: str, penalty: int) -> int:
+    return max(0, BASE_SCORE - RISK_PENALTIES.get(risk_level, 0) - penalty)
+
+async def refresh(db: AsyncSession, user_id: str, lga: str, risk_level: Optional[str] = None,
+                  rainfall: Optional[float] = None) -> DBHealthScore:
+    """
+    Recompute a user's score from their latest symptoms. Risk comes from the
+    arguments, else the LGA snapshot, else the stored row. Caller commits.
+    """
+    result = await db.execute(
+        select(DBSymptom)
+        .where(DBSymptom.user_id == user_id)
+        .order_by(DBSymptom.timestamp.desc())
+        .limit(RECENT_SYMPTOMS)
+    )
+    penalty = symptom_penalty(result.scalars().all())
+
+    row = await db.get(DBHealthScore, user_id)
+    if risk_level is None:
+        snapshot = await lga_risk.get_snapshot(db, lga)
+        if snapshot:
+            risk_level, rainfall = snapshot.risk_level, snapshot.rainfall
+        elif row:
+            risk_level, rainfall = row.risk_level, row.rainfall
+        else:
+            risk_level, rainfall = "LOW", 0.0
+
+    if row is None:
+        row = DBHealthScore(user_id=user_id)
+        db.add(row)
+    row.lga = lga_risk.normalize(lga)
+    row.risk_level = risk_level
+    row.rainfall = rainfall or 0.0
+    row.symptom_penalty = penalty
+    row.score = compute(risk_level, penalty)
+    row.updated_at = datetime.utcnow().isoformat()
+    return row
+
+@lga_risk.on_change
+async def _on_lga_risk_change(db: AsyncSession, snapshot: DBLgaRisk):
+    """Re-score everyone in the LGA with a single UPDATE."""
+    risk_penalty = RISK_PENALTIES.get(snapshot.risk_level, 0)
+    await db.execute(
+        update(DBHealthScore)
+        .where(DBHealthScore.lga == snapshot.lga)
+        .values(
+            risk_level=snapshot.risk_level,
+            rainfall=snapshot.rainfall,
+            score=func.greatest(0, BASE_SCORE - risk_penalty - DBHealthScore.symptom_penalty),
+            updated_at=datetime.utcnow().isoformat()
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+async def population(db: AsyncSession, lga: Optional[str] = None, max_score: Optional[int] = None,
+                     limit: int = 1000) -> list:
+    """Users by score, e.g. everyone under 50 in Kano, served from the (lga, score) index."""
+    stmt = select(DBHealthScore)
+    if lga:
+        stmt = stmt.where(DBHealthScore.lga == lga_risk.normalize(lga))
+    if max_score is not None:
+        stmt = stmt.where(DBHealthScore.score < max_score)
+    result = await db.execute(stmt.order_by(DBHealthScore.score).limit(limit))
+    return result.scalars().all()
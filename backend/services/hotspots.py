@@ -1,6 +1,9 @@
 # services/hotspots.py
+from datetime import datetime
 from typing import Dict, Optional
 
+from services import lga_resolver
+
 # Data sourced from NCDC situation reports (February 2026)
 # Sources:
 # - Lassa fever: NCDC Situation Report Week 7, 2026
@@ -20,10 +23,37 @@ HOTSPOTS_DATA = {
     "enugu": {"disease": "Malaria", "risk": "MEDIUM", "source": "NCDC Weekly Epidemiological Report Feb 2026"},
 }
 
+# Hotspots raised at runtime by symptom anomaly detection (services/anomaly.py), reloaded
+# from the anomalies table on every replica. lga -> {"disease", "risk", "source", "expires_at"};
+# consulted after the NCDC list.
+DYNAMIC_HOTSPOTS: Dict[str, Dict] = {}
+
+def replace_dynamic_hotspots(active: Dict[str, Dict]):
+    global DYNAMIC_HOTSPOTS
+    DYNAMIC_HOTSPOTS = active
+
+def add_dynamic_hotspot(lga: str, disease: str, risk: str, source: str, expires_at: str):
+    DYNAMIC_HOTSPOTS[lga_resolver.key(lga)] = {
+        "disease": disease, "risk": risk, "source": source, "expires_at": expires_at
+    }
+
+def _dynamic_hotspot(lga_key: str) -> Optional[Dict]:
+    info = DYNAMIC_HOTSPOTS.get(lga_key)
+    if info and info["expires_at"] <= datetime.utcnow().isoformat():
+        del DYNAMIC_HOTSPOTS[lga_key]
+        return None
+    return info
+
 def is_hotspot(lga: str) -> bool:
-    """Return True if LGA is listed as a hotspot."""
-    return lga.strip().lower() in HOTSPOTS_DATA
+    """Return True if the LGA (or its state) is listed as a hotspot or flagged by anomaly detection."""
+    return get_hotspot_info(lga) is not None
 
 def get_hotspot_info(lga: str) -> Optional[Dict]:
-    """Return disease and risk info if LGA is hotspot, else None."""
-    return HOTSPOTS_DATA.get(lga.strip().lower())
\ No newline at end of file
+    """Return disease and risk info if the LGA (as typed or its canonical name) is a hotspot, else None."""
+    # No state fallback: one hotspot LGA must not make every LGA in its state HIGH
+    for key in lga_resolver.lookup_keys(lga, include_state=False):
+        info = HOTSPOTS_DATA.get(key)
+        if info:
+            return info
+    # Anomalies are keyed like the symptom counters they come from
+    return _dynamic_hotspot(lga_resolver.key(lga))
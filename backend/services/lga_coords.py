@@ -4,34 +4,99 @@ import json
 from pathlib import Path
 from typing import Optional, Tuple
 
+from services import lga_resolver
+from services.circuit import get_breaker
+
 GEOJSON_URL = "https://temikeezy.github.io/nigeria-geojson-data/data/full.json"
 _coords_cache = {}  # Simple in-memory cache
+_dataset = None  # Parsed GeoJSON, loaded once per process
+
+def _trim(data: list) -> list:
+    """Keep only what lookups use (names and one coordinate per LGA) for the local cache."""
+    return [
+        {
+            "state": state.get("state", state.get("name", "")),
+            "lgas": [
+                {
+                    "name": lga.get("name", ""),
+                    "latitude": lga.get("latitude"),
+                    "longitude": lga.get("longitude"),
+                    "wards": lga.get("wards", [])[:1]
+                }
+                for lga in state.get("lgas", [])
+            ]
+        }
+        for state in data
+    ]
+
+async def _load_dataset() -> Optional[list]:
+    """Load the states/LGAs dataset once: from the local cache file, else from GitHub (then cached)."""
+    global _dataset
+    if _dataset is not None:
+        return _dataset
+    if lga_resolver.LGA_DATASET_PATH.exists():
+        with open(lga_resolver.LGA_DATASET_PATH) as f:
+            _dataset = json.load(f)
+        lga_resolver.build(_dataset)
+        return _dataset
+
+    breaker = get_breaker("geojson")
+    if not breaker.allow():
+        return None  # callers use the local fallback file
+    try:
+        async with httpx.AsyncClient(timeout=15.0) as client:
+            resp = await client.get(GEOJSON_URL)
+            resp.raise_for_status()
+            data = resp.json()
+    except Exception as e:
+        print(f"Error fetching GeoJSON: {e}")
+        breaker.record_failure()
+        return None
+    breaker.record_success()
+
+    _dataset = _trim(data)
+    try:
+        with open(lga_resolver.LGA_DATASET_PATH, "w") as f:
+            json.dump(_dataset, f)
+    except OSError as e:
+        print(f"Could not cache LGA dataset: {e}")
+    lga_resolver.build(_dataset)
+    return _dataset
+
+async def preload():
+    """Load the dataset at startup so request paths never wait on the GitHub fetch."""
+    await _load_dataset()
+
+def get_state(lga_name: str) -> Optional[str]:
+    """
+    Return the lowercase state an LGA belongs to (a state name maps to itself).
+    Never fetches: uses whatever index is already built (dataset or fallback names).
+    """
+    match = lga_resolver.resolve(lga_name)
+    return match.state.lower() if match and match.state else None
 
 async def get_coordinates(lga_name: str) -> Optional[Tuple[float, float]]:
     """Get (lat, lon) for an LGA using dynamic data from GitHub."""
     # Normalize input
     lga_key = lga_name.strip().lower()
-    
+
     # Check cache
     if lga_key in _coords_cache:
         return _coords_cache[lga_key]
-    
+
     # Fetch GeoJSON
-    try:
-        async with httpx.AsyncClient(timeout=15.0) as client:
-            resp = await client.get(GEOJSON_URL)
-            resp.raise_for_status()
-            data = resp.json()
-    except Exception as e:
-        print(f"Error fetching GeoJSON: {e}")
+    data = await _load_dataset()
+    if data is None:
         return await _fallback_coords(lga_name)
-    
+    # The name as typed or its canonical spelling
+    names = set(lga_resolver.lookup_keys(lga_name, include_state=False))
+
     # Parse the data structure
     # Expected format: list of states, each with "lgas" array of objects with "name", "wards"
     for state in data:
         for lga in state.get("lgas", []):
             lga_name_in_data = lga.get("name", "").lower()
-            if lga_name_in_data == lga_key:
+            if lga_name_in_data in names:
                 # Get first ward's coordinates as LGA approximation
                 wards = lga.get("wards", [])
                 if wards and len(wards) > 0:
@@ -46,17 +111,26 @@ async def get_coordinates(lga_name: str) -> Optional[Tuple[float, float]]:
                 if lat and lon:
                     _coords_cache[lga_key] = (lat, lon)
                     return (lat, lon)
-    
+
     # Not found in dynamic data, try fallback
     return await _fallback_coords(lga_name)
 
+async def get_cached_coordinates(lga_name: str) -> Optional[Tuple[float, float]]:
+    """Coordinates without any network call: the in-memory cache, then the local fallback file."""
+    cached = _coords_cache.get(lga_name.strip().lower())
+    if cached:
+        return cached
+    return await _fallback_coords(lga_name)
+
 async def _fallback_coords(lga_name: str) -> Optional[Tuple[float, float]]:
     """Fallback to local static file if API fails."""
     static_file = Path(__file__).parent / "lga_coordinates_fallback.json"
     if static_file.exists():
         with open(static_file) as f:
             static_coords = json.load(f)
-        coords = static_coords.get(lga_name.strip().title())
-        if coords:
-            return tuple(coords)
-    return None
\ No newline at end of file
+        # The file is keyed by title-cased state/city names; try the LGA's state after the LGA
+        for key in lga_resolver.lookup_keys(lga_name):
+            coords = static_coords.get(key.title())
+            if coords:
+                return tuple(coords)
+    return None
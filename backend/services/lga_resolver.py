@@ -0,0 +1,214 @@
+# services/lga_resolver.py
+"""
+Canonical LGA names.
+
+Users type "kano", "Kano Municipal", "Jos" or "Abuja"; the GeoJSON dataset,
+the static fallback coordinates and the hotspot/health-center tables each
+spell places their own way. `resolve` maps any of these to one canonical
+entry (id, LGA, state) using, in order: an exact match on the normalized
+name, the alias table, then a trigram index for typos and partial names.
+
+The index is built from the states/LGAs dataset (`build`, called by
+lga_coords once it has the data, which it caches to LGA_DATASET_PATH)
+plus the fallback coordinate names, so it also works offline. Only matches
+from the dataset carry a canonical "state/lga" id (`canonical_id`); names
+known only from the fallback file resolve, but are not stored as ids.
+
+Tables and channels keyed by LGA (risk snapshots, scores, counters,
+anomalies, broadcasts, SSE) use `key`: the canonical id when there is one, so
+"Jos" and "Jos North" share a row, else the stripped lowercase name.
+"""
+import json
+import os
+import re
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Set
+
+LGA_DATASET_PATH = Path(os.getenv("LGA_DATASET_PATH", Path(__file__).parent / "lga_dataset.json"))
+FALLBACK_COORDS_PATH = Path(__file__).parent / "lga_coordinates_fallback.json"
+LGA_MATCH_THRESHOLD = float(os.getenv("LGA_MATCH_THRESHOLD", "0.45"))
+RESOLVE_CACHE_SIZE = 4096
+
+# Common names for places that aren't LGA names -> canonical LGA
+ALIASES = {
+    "abuja": "Abuja Municipal",
+    "fct": "Abuja Municipal",
+    "amac": "Abuja Municipal",
+    "jos": "Jos North",
+    "kano city": "Kano Municipal",
+    "ibadan": "Ibadan North",
+    "ph": "Port Harcourt",
+    "portharcourt": "Port Harcourt",
+    "benin": "Oredo",
+    "benin city": "Oredo",
+    "onitsha": "Onitsha North",
+    "warri": "Warri South",
+    "aba": "Aba North",
+    "ilorin": "Ilorin West",
+    "calabar": "Calabar Municipal",
+    "owerri": "Owerri Municipal",
+    "akure": "Akure South",
+    "abeokuta": "Abeokuta South",
+    "lokoja": "Lokoja",
+    "yola": "Yola North",
+    "lafia": "Lafia",
+    "makurdi": "Makurdi",
+    "vi": "Eti Osa",
+    "victoria island": "Eti Osa",
+    "lekki": "Eti Osa",
+    "ikoyi": "Eti Osa",
+    "yaba": "Lagos Mainland",
+}
+
+_SUFFIXES = re.compile(r"\b(local government area|local government|lga|l\.g\.a)\b")
+
+class LgaMatch(NamedTuple):
+    id: str  # "state/lga" slug, or "state" when only the state is known
+    lga: Optional[str]  # None for a state-level match
+    state: Optional[str]
+    score: float  # 1.0 for exact/alias matches
+
+def normalize(name: str) -> str:
+    name = _SUFFIXES.sub(" ", name.lower())
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", name).split())
+
+def slug(name: str) -> str:
+    return normalize(name).replace(" ", "-")
+
+def trigrams(text: str) -> Set[str]:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+_entries: List[LgaMatch] = []
+_grams: List[Set[str]] = []
+_exact: Dict[str, int] = {}  # normalized name -> entry index
+_index: Dict[str, Set[int]] = defaultdict(set)  # trigram -> entry indexes
+_resolved: Dict[str, Optional[LgaMatch]] = {}
+_ids: Dict[str, LgaMatch] = {}  # canonical "state/lga" id -> entry
+_built = False
+
+def _add(name: str, entry: LgaMatch):
+    key = normalize(name)
+    if not key or key in _exact:
+        return
+    idx = len(_entries)
+    _entries.append(entry)
+    grams = trigrams(key)
+    _grams.append(grams)
+    _exact[key] = idx
+    for gram in grams:
+        _index[gram].add(idx)
+
+def build(data: Optional[list]):
+    """(Re)build the index from the states/LGAs dataset (None/[] -> fallback names only)."""
+    global _built
+    _entries.clear()
+    _grams.clear()
+    _exact.clear()
+    _index.clear()
+    _resolved.clear()
+    _ids.clear()
+
+    states = [(state.get("state", state.get("name", "")).strip(), state.get("lgas", [])) for state in data or []]
+    # States first: a bare "Ekiti" or "Nasarawa" almost always means the state, not the LGA of that name
+    for state_name, _ in states:
+        if state_name:
+            _add(state_name, LgaMatch(slug(state_name), None, state_name, 1.0))
+
+    lga_ids = {}
+    for state_name, lgas in states:
+        if not state_name:
+            continue
+        for lga in lgas:
+            lga_name = lga.get("name", "").strip()
+            if lga_name:
+                match = LgaMatch(f"{slug(state_name)}/{slug(lga_name)}", lga_name, state_name, 1.0)
+                _add(lga_name, match)
+                lga_ids.setdefault(normalize(lga_name), match)
+                _ids.setdefault(match.id, match)
+
+    for alias, target in ALIASES.items():
+        match = lga_ids.get(normalize(target))
+        if match:
+            _add(alias, match)
+
+    # Places only the static fallback file knows (when the dataset never loaded)
+    if FALLBACK_COORDS_PATH.exists():
+        with open(FALLBACK_COORDS_PATH) as f:
+            for name in json.load(f):
+                _add(name, LgaMatch(slug(name), name, None, 1.0))
+    _built = True
+
+def _ensure_built():
+    if _built:
+        return
+    data = None
+    if LGA_DATASET_PATH.exists():
+        with open(LGA_DATASET_PATH) as f:
+            data = json.load(f)
+    build(data)
+
+def resolve(name: str) -> Optional[LgaMatch]:
+    """Best canonical match for a user-entered place name, or None if nothing is close enough."""
+    _ensure_built()
+    key = normalize(name or "")
+    if key in _resolved:
+        return _resolved[key]
+
+    match = None
+    if key in _exact:
+        match = _entries[_exact[key]]
+    elif key:
+        grams = trigrams(key)
+        shared = Counter(idx for gram in grams for idx in _index.get(gram, ()))
+        best_score = LGA_MATCH_THRESHOLD
+        for idx, count in shared.items():
+            score = count / (len(grams) + len(_grams[idx]) - count)  # Jaccard
+            if score > best_score:
+                match, best_score = _entries[idx]._replace(score=round(score, 3)), score
+
+    if len(_resolved) >= RESOLVE_CACHE_SIZE:
+        _resolved.clear()
+    _resolved[key] = match
+    return match
+
+def canonical_id(name: str) -> Optional[str]:
+    """
+    The "state/lga" id to store for a user-entered LGA, or None when it only
+    matches a state or a fallback-file name (stored later, once the dataset
+    is loaded and the backfill resolves it).
+    """
+    match = resolve(name)
+    return match.id if match and match.lga and match.state else None
+
+def key(name: str) -> str:
+    """
+    Key for LGA-keyed rows and channels: the canonical id, else the stripped
+    lowercase name (state-only inputs such as "Kano", or names the dataset
+    doesn't know). A key passed back in is returned unchanged.
+    """
+    name = name.strip().lower()
+    if "/" in name:
+        return name
+    return canonical_id(name) or name
+
+def display_name(lga_key: str) -> str:
+    """The LGA's name for a key, for text read to users."""
+    _ensure_built()
+    match = _ids.get(lga_key)
+    return match.lga if match else lga_key.title()
+
+def lookup_keys(name: str, include_state: bool = True) -> List[str]:
+    """
+    Lowercase keys to try, most specific first: the name as entered, the
+    canonical LGA, then (optionally) its state. For tables keyed by LGA or state.
+    """
+    keys = [name.strip().lower()]
+    match = resolve(name)
+    if match:
+        if match.lga:
+            keys.append(match.lga.lower())
+        if include_state and match.state:
+            keys.append(match.state.lower())
+    return list(dict.fromkeys(keys))
@@ -0,0 +1,94 @@
+# services/lga_risk.py
+import asyncio
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+from sqlalchemy import event, case
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from data import AsyncSessionLocal
+from models import DBLgaRisk
+from services import lga_resolver
+from services.notify_state import risk_signature
+
+# Async callbacks run as `await listener(db, snapshot)` whenever an LGA's risk changes.
+# They run after the observing transaction commits, each in its own session, so a
+# failing listener can neither abort nor be rolled back with the caller's work.
+_listeners: List[Callable[[AsyncSession, DBLgaRisk], Awaitable[None]]] = []
+_tasks: Set[asyncio.Task] = set()
+_PENDING_KEY = "lga_risk_changes"
+
+def normalize(lga: str) -> str:
+    """Snapshot key: the canonical LGA id, else the lowercase name (see lga_resolver.key)."""
+    return lga_resolver.key(lga)
+
+def on_change(listener: Callable[[AsyncSession, DBLgaRisk], Awaitable[None]]):
+    """Register a callback for LGA risk transitions."""
+    _listeners.append(listener)
+    return listener
+
+async def get_snapshot(db: AsyncSession, lga: str) -> Optional[DBLgaRisk]:
+    return await db.get(DBLgaRisk, normalize(lga))
+
+async def observe(db: AsyncSession, lga: str, risk_level: str, risk_factors: List[str], rainfall: float) -> bool:
+    """
+    Record the latest risk seen for an LGA with a single upsert. Returns True when
+    the level or contributing risks differ from the stored snapshot; listeners are
+    notified once the caller commits.
+    """
+    key = normalize(lga)
+    signature = risk_signature(risk_factors)
+    now = datetime.utcnow().isoformat()
+
+    stmt = pg_insert(DBLgaRisk).values(
+        lga=key, risk_level=risk_level, risk_factors=signature, rainfall=rainfall, version=1, updated_at=now
+    )
+    changed = (DBLgaRisk.risk_level != stmt.excluded.risk_level) | (DBLgaRisk.risk_factors != stmt.excluded.risk_factors)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[DBLgaRisk.lga],
+        set_={
+            "rainfall": stmt.excluded.rainfall,
+            "risk_level": stmt.excluded.risk_level,
+            "risk_factors": stmt.excluded.risk_factors,
+            "version": case((changed, DBLgaRisk.version + 1), else_=DBLgaRisk.version),
+            "updated_at": case((changed, stmt.excluded.updated_at), else_=DBLgaRisk.updated_at),
+        }
+    ).returning(DBLgaRisk.version, DBLgaRisk.updated_at)
+    version, updated_at = (await db.execute(stmt)).one()
+
+    # updated_at only moves to `now` on insert or on a level/factor change
+    if updated_at != now:
+        return False
+    snapshot = DBLgaRisk(lga=key, risk_level=risk_level, risk_factors=signature,
+                         rainfall=rainfall, version=version, updated_at=now)
+    db.info.setdefault(_PENDING_KEY, {})[key] = snapshot
+    return True
+
+async def _notify(snapshots: List[DBLgaRisk]):
+    for snapshot in snapshots:
+        for listener in _listeners:
+            try:
+                async with AsyncSessionLocal() as session:
+                    await listener(session, snapshot)
+                    await session.commit()
+            except Exception as e:
+                print(f"LGA risk listener failed for {snapshot.lga}: {e}")
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session: Session):
+    pending: Dict[str, DBLgaRisk] = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return
+    task = loop.create_task(_notify(list(pending.values())))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+
+@event.listens_for(Session, "after_rollback")
+def _after_rollback(session: Session):
+    session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,40 @@
+# services/notify_state.py
+import os
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import DBNotifyState
+
+# Re-call a user with an unchanged HIGH risk only after this many hours
+RENOTIFY_INTERVAL_HOURS = float(os.getenv("RENOTIFY_INTERVAL_HOURS", "24"))
+
+def risk_signature(risk_factors: List[str]) -> str:
+    """Order-independent key for the set of contributing risks."""
+    return "|".join(sorted(set(risk_factors)))
+
+def should_notify(state: Optional[DBNotifyState], risk_level: str, risk_factors: List[str]) -> bool:
+    """
+    Dispatch only when the risk level or its contributing diseases changed since the
+    last call, or when the re-notify interval has expired. LOW risk never dispatches.
+    """
+    if risk_level == "LOW":
+        return False
+    if state is None or not state.notified_at:
+        return True
+    if state.risk_level != risk_level or state.risk_factors != risk_signature(risk_factors):
+        return True
+    last = datetime.fromisoformat(state.notified_at)
+    return datetime.utcnow() - last >= timedelta(hours=RENOTIFY_INTERVAL_HOURS)
+
+async def record(db: AsyncSession, user_id: str, risk_level: str, risk_factors: List[str], notified: bool):
+    """Remember the risk last seen for a user. Caller commits."""
+    state = await db.get(DBNotifyState, user_id)
+    if state is None:
+        state = DBNotifyState(user_id=user_id)
+        db.add(state)
+    state.risk_level = risk_level
+    state.risk_factors = risk_signature(risk_factors)
+    if notified:
+        state.notified_at = datetime.utcnow().isoformat()
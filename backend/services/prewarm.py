@@ -0,0 +1,147 @@
+# services/prewarm.py
+"""
+Background pre-rendering of call scripts and YarnGPT audio.
+
+When an LGA's risk changes, one script + audio file is generated for every
+AI personality used by residents of that LGA (scripts for all queued LGAs are
+requested from Gemini together), so `call_user` only has to dial
+a ready `audio_url` instead of waiting on Gemini and TTS inline.
+"""
+import asyncio
+import uuid
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import select, delete, func, or_, and_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import ai_service
+from data import AsyncSessionLocal
+from models import DBUser, DBLgaRisk, DBPrewarmedAudio
+from services import lga_resolver, lga_risk, tts
+from services.notify_state import risk_signature
+
+# Pre-rendered audio is shared by everyone in the LGA, so it can't use a name
+AUDIENCE_NAME = "my people"
+
+_queue: Optional[asyncio.Queue] = None
+_pending = set()  # job keys already queued, so bursts of observations enqueue once
+_worker_task: Optional[asyncio.Task] = None
+
+def start():
+    """Start the pre-warm worker on the running event loop (call from startup)."""
+    global _queue, _worker_task
+    if _worker_task is None:
+        _queue = asyncio.Queue()
+        _worker_task = asyncio.create_task(_worker())
+
+async def stop():
+    global _worker_task
+    if _worker_task:
+        _worker_task.cancel()
+        _worker_task = None
+
+@lga_risk.on_change
+async def _on_lga_risk_change(db: AsyncSession, snapshot: DBLgaRisk):
+    if snapshot.risk_level == "LOW":
+        return
+    enqueue(snapshot.lga, snapshot.risk_level, snapshot.risk_factors.split("|") if snapshot.risk_factors else [])
+
+def enqueue(lga: str, risk_level: str, risk_factors: List[str]):
+    if _queue is None:
+        return
+    key = (lga_risk.normalize(lga), risk_level, risk_signature(risk_factors))
+    if key in _pending:
+        return
+    _pending.add(key)
+    _queue.put_nowait(key)
+
+async def get_prewarmed(db: AsyncSession, lga: str, personality: str, risk_factors: List[str]) -> Optional[DBPrewarmedAudio]:
+    result = await db.execute(
+        select(DBPrewarmedAudio).where(
+            DBPrewarmedAudio.lga == lga_risk.normalize(lga),
+            DBPrewarmedAudio.personality == personality,
+            DBPrewarmedAudio.risk_factors == risk_signature(risk_factors)
+        )
+    )
+    return result.scalar_one_or_none()
+
+async def _worker():
+    while True:
+        keys = [await _queue.get()]
+        # Drain whatever else is queued so a campaign's LGAs share Gemini requests
+        while not _queue.empty():
+            keys.append(_queue.get_nowait())
+        try:
+            await _prewarm_lgas(keys)
+        except Exception as e:
+            print(f"Pre-warm failed for {', '.join(key[0] for key in keys)}: {e}")
+        finally:
+            for key in keys:
+                _pending.discard(key)
+                _queue.task_done()
+
+async def _prewarm_lgas(keys: List[tuple]):
+    """Pre-render every missing (LGA, personality) script for these risk states in one batch."""
+    jobs = []  # (lga, risk_level, signature, personality)
+    async with AsyncSessionLocal() as session:
+        for lga, risk_level, signature in keys:
+            # Residents by canonical id, or by name where it never resolved (ix_users_lga_id, ix_users_lga_normalized)
+            result = await session.execute(
+                select(DBUser.ai_personality)
+                .where(or_(
+                    DBUser.lga_id == lga,
+                    and_(DBUser.lga_id.is_(None), func.lower(func.trim(DBUser.lga)) == lga)
+                ))
+                .distinct()
+            )
+            personalities = {p or "Mama Health" for p in result.scalars().all()}
+
+            # Audio for a previous risk state will never be played again
+            await session.execute(
+                delete(DBPrewarmedAudio).where(
+                    DBPrewarmedAudio.lga == lga,
+                    DBPrewarmedAudio.risk_factors != signature
+                )
+            )
+            risks = signature.split("|") if signature else []
+            for personality in personalities:
+                if not await get_prewarmed(session, lga, personality, risks):
+                    jobs.append((lga, risk_level, signature, personality))
+        await session.commit()
+
+        if not jobs:
+            return
+        specs = [
+            {
+                "user_name": AUDIENCE_NAME,
+                "lga": lga_resolver.display_name(lga),
+                "risk_data": {"risks": signature.split("|") if signature else [], "level": risk_level},
+                "personality": personality
+            }
+            for lga, risk_level, signature, personality in jobs
+        ]
+        scripts = await asyncio.to_thread(ai_service.generate_health_scripts_batch, specs)
+
+        for (lga, risk_level, signature, personality), script in zip(jobs, scripts):
+            audio_url = await tts.text_to_speech(script, voice="Idera")
+            # Another replica may have rendered the same entry meanwhile; keep whichever landed first
+            await session.execute(
+                pg_insert(DBPrewarmedAudio)
+                .values(
+                    id=str(uuid.uuid4()),
+                    lga=lga,
+                    personality=personality,
+                    risk_level=risk_level,
+                    risk_factors=signature,
+                    script=script,
+                    audio_url=audio_url,
+                    created_at=datetime.utcnow().isoformat()
+                )
+                .on_conflict_do_nothing(index_elements=[
+                    DBPrewarmedAudio.lga, DBPrewarmedAudio.personality, DBPrewarmedAudio.risk_factors
+                ])
+            )
+            await session.commit()
+        print(f"🔥 Pre-warmed {len(jobs)} script(s) for {len(keys)} LGA(s)")
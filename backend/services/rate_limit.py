@@ -0,0 +1,192 @@
+# services/rate_limit.py
+"""
+In-process rate limiting and load shedding for the expensive endpoints.
+
+Every request to a route in ROUTE_COSTS spends that many tokens from a
+bucket keyed by the user id of a verified access token, or else the client
+IP. Path and query user ids are never used: they are unverified, so a
+caller could rotate them to get a fresh bucket per request.
+The client IP is the socket peer; X-Forwarded-For is only believed when the
+peer is one of RATE_LIMIT_TRUSTED_PROXIES, and then only the right-most
+address a trusted proxy appended (the left part is client-controlled).
+Buckets hold RATE_LIMIT_BURST tokens and refill at RATE_LIMIT_PER_MINUTE;
+an empty bucket gets 429 with Retry-After.
+
+Admitted expensive requests then share RATE_LIMIT_MAX_INFLIGHT slots. Up to
+RATE_LIMIT_MAX_QUEUED more may wait RATE_LIMIT_QUEUE_TIMEOUT seconds for one;
+beyond that the request is shed with 503. Cheap routes bypass all of this.
+
+Requests signed with a service token (the risk sweep) skip the per-key
+buckets and use their own RATE_LIMIT_SERVICE_INFLIGHT slots, so a sweep
+can't crowd users out of /chat and users can't shed the sweep.
+"""
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from services import auth
+
+RATE_LIMIT_PER_MINUTE = float(os.getenv("RATE_LIMIT_PER_MINUTE", "30"))
+RATE_LIMIT_BURST = float(os.getenv("RATE_LIMIT_BURST", "30"))
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "10000"))
+RATE_LIMIT_MAX_INFLIGHT = int(os.getenv("RATE_LIMIT_MAX_INFLIGHT", "32"))
+RATE_LIMIT_MAX_QUEUED = int(os.getenv("RATE_LIMIT_MAX_QUEUED", "64"))
+RATE_LIMIT_QUEUE_TIMEOUT = float(os.getenv("RATE_LIMIT_QUEUE_TIMEOUT", "5"))
+RATE_LIMIT_TRUSTED_PROXIES = {ip.strip() for ip in os.getenv("RATE_LIMIT_TRUSTED_PROXIES", "").split(",") if ip.strip()}
+RATE_LIMIT_SERVICE_INFLIGHT = int(os.getenv("RATE_LIMIT_SERVICE_INFLIGHT", "16"))
+RATE_LIMIT_SERVICE_QUEUED = int(os.getenv("RATE_LIMIT_SERVICE_QUEUED", "256"))
+RATE_LIMIT_SERVICE_QUEUE_TIMEOUT = float(os.getenv("RATE_LIMIT_SERVICE_QUEUE_TIMEOUT", "30"))
+
+# Path prefix -> tokens per request, roughly by how much paid upstream work it fans out to
+ROUTE_COSTS = {
+    "/call-user/": 10,
+    "/generate-message": 5,
+    "/predict-weekly/": 5,
+    "/generate-cultural-tip/": 3,
+    "/chat": 2,
+}
+
+def route_cost(path: str) -> int:
+    for prefix, cost in ROUTE_COSTS.items():
+        if path.startswith(prefix):
+            return cost
+    return 0
+
+class TokenBucket:
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, capacity: float):
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+class RateLimiter:
+    def __init__(self, per_minute: float = RATE_LIMIT_PER_MINUTE, burst: float = RATE_LIMIT_BURST,
+                 max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.rate = per_minute / 60
+        self.capacity = burst
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+
+    def take(self, key: str, cost: float) -> Tuple[bool, float]:
+        """Spend `cost` tokens for `key`. Returns (allowed, seconds until it would be allowed)."""
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(self.capacity)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            bucket.tokens = min(self.capacity, bucket.tokens + (now - bucket.updated) * self.rate)
+            bucket.updated = now
+            self._buckets.move_to_end(key)
+
+        cost = min(cost, self.capacity)  # a route costlier than the burst could never pass
+        if bucket.tokens >= cost:
+            bucket.tokens -= cost
+            return True, 0.0
+        return False, (cost - bucket.tokens) / self.rate
+
+class LoadShedder:
+    def __init__(self, max_inflight: int = RATE_LIMIT_MAX_INFLIGHT, max_queued: int = RATE_LIMIT_MAX_QUEUED,
+                 queue_timeout: float = RATE_LIMIT_QUEUE_TIMEOUT):
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        self._slots = asyncio.Semaphore(max_inflight)
+        self.waiting = 0
+
+    async def acquire(self) -> bool:
+        if self._slots.locked() and self.waiting >= self.max_queued:
+            return False
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self.waiting -= 1
+
+    def release(self):
+        self._slots.release()
+
+def _client_key(scope, token: Optional[dict]) -> str:
+    if token is not None:
+        return "user:" + token["sub"]
+    return "ip:" + _client_ip(scope)
+
+def _header(scope, name: bytes) -> Optional[str]:
+    for key, value in scope.get("headers", []):
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+def _client_ip(scope) -> str:
+    client = scope.get("client")
+    peer = client[0] if client else "unknown"
+    if peer not in RATE_LIMIT_TRUSTED_PROXIES:
+        return peer
+    forwarded = _header(scope, b"x-forwarded-for")
+    if not forwarded:
+        return peer
+    # Walk back from the right past our own proxies; the first other address is the client
+    for address in reversed([part.strip() for part in forwarded.split(",") if part.strip()]):
+        if address not in RATE_LIMIT_TRUSTED_PROXIES:
+            return address
+    return peer
+
+def _verified_token(scope) -> Optional[dict]:
+    """Payload of the request's Bearer token when it verifies, else None."""
+    header = _header(scope, b"authorization") or ""
+    if not header.lower().startswith("bearer "):
+        return None
+    return auth.verify(header[7:].strip())
+
+async def _reject(send, status: int, retry_after: float, detail: str):
+    body = ('{"detail": "%s"}' % detail).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+class RateLimitMiddleware:
+    """ASGI middleware, so concurrency slots are held until streamed responses finish."""
+
+    def __init__(self, app, limiter: Optional[RateLimiter] = None, shedder: Optional[LoadShedder] = None,
+                 service_shedder: Optional[LoadShedder] = None):
+        self.app = app
+        self.limiter = limiter or RateLimiter()
+        self.shedder = shedder or LoadShedder()
+        self.service_shedder = service_shedder or LoadShedder(
+            RATE_LIMIT_SERVICE_INFLIGHT, RATE_LIMIT_SERVICE_QUEUED, RATE_LIMIT_SERVICE_QUEUE_TIMEOUT
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "OPTIONS":
+            return await self.app(scope, receive, send)
+        cost = route_cost(scope["path"])
+        if not cost:
+            return await self.app(scope, receive, send)
+
+        token = _verified_token(scope)
+        if token is not None and token.get("role") == auth.SERVICE_ROLE:
+            shedder = self.service_shedder
+        else:
+            shedder = self.shedder
+            allowed, retry_after = self.limiter.take(_client_key(scope, token), cost)
+            if not allowed:
+                return await _reject(send, 429, retry_after, "Too many requests, slow down small.")
+        if not await shedder.acquire():
+            return await _reject(send, 503, shedder.queue_timeout, "Server busy, try again shortly.")
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            shedder.release()
@@ -1,5 +1,5 @@
 # services/risk.py
-from services.hotspots import is_hotspot
+from services.hotspots import is_hotspot, get_hotspot_info
 
 RAINFALL_THRESHOLD = 15.0  # mm in last 24h
 CHOLERA_RAINFALL_THRESHOLD = 20.0 # mm in last 24h
@@ -11,4 +11,16 @@ def check_risk_for_lga(lga: str, rainfall: float) -> str:
     """
     if is_hotspot(lga) or rainfall > RAINFALL_THRESHOLD:
         return "HIGH"
-    return "LOW"
\ No newline at end of file
+    return "LOW"
+
+def get_risk_factors(lga: str, rainfall: float) -> list:
+    """Return the diseases/conditions contributing to the LGA's current risk."""
+    risks = []
+    hotspot_info = get_hotspot_info(lga)
+    if hotspot_info:
+        risks.append(hotspot_info["disease"])
+    if rainfall > RAINFALL_THRESHOLD:
+        risks.append("malaria (heavy rain)")
+    if rainfall > CHOLERA_RAINFALL_THRESHOLD:
+        risks.append("cholera (contamination risk from flooding)")
+    return risks
@@ -0,0 +1,86 @@
+# services/surveillance.py
+"""
+Incrementally maintained syndromic surveillance counters.
+
+Every symptom report bumps one counter per reported symptom in
+`symptom_daily`, keyed by (LGA key, UTC day, symptom), in the same transaction
+as the report itself. Dashboards then read O(days x LGAs) rows instead of
+scanning raw reports. `rebuild` recomputes a date range from raw reports
+for backfills.
+"""
+from collections import Counter
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import select, delete, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import DBSymptom, DBSymptomDaily, DBUser
+from services import lga_resolver
+
+SYMPTOMS = ("fever", "cough", "headache", "fatigue", "diarrhea", "vomiting")
+
+CounterKey = Tuple[str, str, str]  # (lga, day, symptom)
+
+def count_reports(reports: Iterable[DBSymptom]) -> Dict[CounterKey, int]:
+    """Fold symptom reports into per-(lga, day, symptom) increments."""
+    counts = Counter()
+    for report in reports:
+        if not report.lga:
+            continue
+        day = report.timestamp[:10]
+        for symptom in SYMPTOMS:
+            if getattr(report, symptom, 0):
+                counts[(report.lga, day, symptom)] += 1
+    return counts
+
+async def record(db: AsyncSession, counts: Dict[CounterKey, int]):
+    """Add increments to the daily counters with one upsert. Caller commits."""
+    if not counts:
+        return
+    stmt = pg_insert(DBSymptomDaily).values([
+        {"lga": lga, "day": day, "symptom": symptom, "count": n}
+        for (lga, day, symptom), n in counts.items()
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[DBSymptomDaily.lga, DBSymptomDaily.day, DBSymptomDaily.symptom],
+        set_={"count": DBSymptomDaily.count + stmt.excluded["count"]}
+    )
+    await db.execute(stmt)
+
+async def query(db: AsyncSession, lga: Optional[str] = None, start: Optional[str] = None,
+                end: Optional[str] = None, symptom: Optional[str] = None) -> list:
+    """Daily counters filtered by LGA, inclusive day range and symptom."""
+    stmt = select(DBSymptomDaily)
+    if lga:
+        stmt = stmt.where(DBSymptomDaily.lga == lga_resolver.key(lga))
+    if start:
+        stmt = stmt.where(DBSymptomDaily.day >= start)
+    if end:
+        stmt = stmt.where(DBSymptomDaily.day <= end)
+    if symptom:
+        stmt = stmt.where(DBSymptomDaily.symptom == symptom)
+    result = await db.execute(stmt.order_by(DBSymptomDaily.day, DBSymptomDaily.lga, DBSymptomDaily.symptom))
+    return result.scalars().all()
+
+async def rebuild(db: AsyncSession, start: str, end: str) -> int:
+    """Recompute counters for [start, end] (inclusive days) from raw reports. Caller commits."""
+    await db.execute(delete(DBSymptomDaily).where(DBSymptomDaily.day >= start, DBSymptomDaily.day <= end))
+
+    # Reports logged before symptoms carried an LGA fall back to the user's registered LGA
+    lga = func.coalesce(DBSymptom.lga, DBUser.lga_id, func.lower(func.trim(DBUser.lga)))
+    day = func.substr(DBSymptom.timestamp, 1, 10)
+    rows = 0
+    for symptom in SYMPTOMS:
+        column = getattr(DBSymptom, symptom)
+        result = await db.execute(
+            select(lga, day, func.count())
+            .select_from(DBSymptom)
+            .outerjoin(DBUser, DBUser.id == DBSymptom.user_id)
+            .where(column == 1, day >= start, day <= end, lga.isnot(None))
+            .group_by(lga, day)
+        )
+        counts = {(row[0], row[1], symptom): row[2] for row in result.all()}
+        await record(db, counts)
+        rows += len(counts)
+    return rows
@@ -4,12 +4,21 @@ import httpx
 import aiofiles
 import asyncio
 from pathlib import Path
+from typing import Optional
+
+from services.circuit import get_breaker
 
 YARNGPT_URL = "https://yarngpt.ai/api/v1/tts"
 AUDIO_DIR = Path("audio")  
 AUDIO_DIR.mkdir(exist_ok=True)
 
-async def text_to_speech(text: str, voice: str = "Idera") -> str:
+breaker = get_breaker("yarngpt")
+
+async def text_to_speech(text: str, voice: str = "Idera") -> Optional[str]:
+    """
+    Render `text` with YarnGPT and return its public URL. Returns None when
+    YarnGPT is unavailable (or its circuit is open) so callers fall back to <Say>.
+    """
     api_key = os.getenv("YARNGPT_API_KEY")
     domain = os.getenv("DOMAIN", "http://localhost:8000")
 
@@ -17,6 +26,10 @@ async def text_to_speech(text: str, voice: str = "Idera") -> str:
         print("⚠️ YARNGPT_API_KEY not set – using placeholder audio URL")
         return "https://example.com/audio.mp3"
 
+    if not breaker.allow():
+        return None
+    attempts = 1 if breaker.probing else 3
+
     headers = {
         "Authorization": f"Bearer {api_key}",
         "Content-Type": "application/json"
@@ -29,7 +42,7 @@ async def text_to_speech(text: str, voice: str = "Idera") -> str:
 
     async with httpx.AsyncClient(timeout=30.0) as client:
         audio_data = None
-        for attempt in range(3):
+        for attempt in range(attempts):
             try:
                 resp = await client.post(YARNGPT_URL, json=payload, headers=headers)
                 resp.raise_for_status()
@@ -37,10 +50,12 @@ async def text_to_speech(text: str, voice: str = "Idera") -> str:
                 break
             except Exception as e:
                 print(f"YarnGPT attempt {attempt + 1} failed: {e}")
-                if attempt == 2:
-                    print("⚠️ YarnGPT failed after 3 retries – returning placeholder")
-                    return "https://example.com/audio.mp3"
+                if attempt == attempts - 1:
+                    print(f"⚠️ YarnGPT failed after {attempts} attempt(s) – falling back to <Say>")
+                    breaker.record_failure()
+                    return None
                 await asyncio.sleep(1)
+    breaker.record_success()
 
     filename = f"{uuid.uuid4()}.mp3"
     file_path = AUDIO_DIR / filename
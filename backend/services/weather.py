@@ -2,18 +2,42 @@
 import httpx
 import asyncio
 from datetime import datetime, timedelta
+from typing import NamedTuple, Optional
+
+from services.circuit import get_breaker
 
 OPEN_METEO_URL = "https://api.open-meteo.com/v1/forecast"
 
 MOCK_RAIN_ENABLED = False
 
-async def get_rainfall(lat: float, lon: float) -> float:
+breaker = get_breaker("open-meteo")
+_last_good = {}  # (lat, lon) rounded to ~1km -> last successfully fetched rainfall (mm)
+
+class RainfallReading(NamedTuple):
+    mm: Optional[float]  # None when unknown (upstream down and nothing cached)
+    stale: bool  # True when served from the last known good value
+
+def _cache_key(lat: float, lon: float):
+    return (round(lat, 2), round(lon, 2))
+
+def get_cached_rainfall(lat: float, lon: float) -> Optional[float]:
+    """Last known good rainfall for these coordinates, without any network call."""
+    if MOCK_RAIN_ENABLED:
+        return 25.5
+    return _last_good.get(_cache_key(lat, lon))
+
+async def get_rainfall_reading(lat: float, lon: float) -> RainfallReading:
     """
     Fetch total rainfall (mm) in the last 24 hours for given coordinates.
-    Returns 0.0 if no data or error.
+    When Open-Meteo is failing, the circuit breaker skips the request and the
+    last known good value is returned marked stale.
     """
     if MOCK_RAIN_ENABLED:
-        return 25.5
+        return RainfallReading(25.5, False)
+    key = _cache_key(lat, lon)
+    if not breaker.allow():
+        return RainfallReading(_last_good.get(key), True)
+
     params = {
         "latitude": lat,
         "longitude": lon,
@@ -21,8 +45,11 @@ async def get_rainfall(lat: float, lon: float) -> float:
         "past_days": 1,
         "timezone": "auto"
     }
+    # A half-open probe gets a single attempt
+    attempts = 1 if breaker.probing else 3
+    data = None
     async with httpx.AsyncClient() as client:
-        for attempt in range(3):
+        for attempt in range(attempts):
             try:
                 resp = await client.get(OPEN_METEO_URL, params=params, timeout=10.0)
                 resp.raise_for_status()
@@ -30,9 +57,13 @@ async def get_rainfall(lat: float, lon: float) -> float:
                 break  # Success
             except Exception as e:
                 print(f"Open-Meteo attempt {attempt + 1} failed: {e}")
-                if attempt == 2:
-                    return 0.0
-                await asyncio.sleep(1) # Simple backoff
+                if attempt < attempts - 1:
+                    await asyncio.sleep(1) # Simple backoff
+
+    if data is None:
+        breaker.record_failure()
+        return RainfallReading(_last_good.get(key), True)
+    breaker.record_success()
 
     # Extract hourly precipitation for the last 24 hours
     hourly = data.get("hourly", {})
@@ -40,7 +71,7 @@ async def get_rainfall(lat: float, lon: float) -> float:
     precip = hourly.get("precipitation", [])
 
     if not times or not precip:
-        return 0.0
+        return RainfallReading(0.0, False)
 
     # Determine the cutoff time (24 hours ago from now)
     now = datetime.utcnow()
@@ -50,6 +81,15 @@ async def get_rainfall(lat: float, lon: float) -> float:
     for t_str, p in zip(times, precip):
         # time format: "2025-02-21T00:00"
         t = datetime.fromisoformat(t_str.replace("Z", "+00:00"))
-        if t >= cutoff:
+        if t >= cutoff and p is not None:
             total += p
-    return total
\ No newline at end of file
+    _last_good[key] = total
+    return RainfallReading(total, False)
+
+async def get_rainfall(lat: float, lon: float) -> float:
+    """
+    Rainfall (mm) in the last 24 hours. Returns the last known value when the
+    upstream is down, or 0.0 if nothing is known.
+    """
+    reading = await get_rainfall_reading(lat, lon)
+    return reading.mm if reading.mm is not None else 0.0
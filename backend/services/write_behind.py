@@ -0,0 +1,160 @@
+# services/write_behind.py
+"""
+Write-behind buffer for high-frequency webhook writes.
+
+Twilio status callbacks and DTMF answers are queued in memory and written in
+batches every WRITE_BEHIND_FLUSH_MS milliseconds or once WRITE_BEHIND_MAX_EVENTS
+writes are pending, whichever comes first. The buffer is flushed on shutdown.
+
+When a batch fails its rows are retried one at a time, so a single bad row
+(e.g. a response for a call log that no longer exists) is dropped instead of
+blocking every later flush. A row is given up on after WRITE_BEHIND_MAX_RETRIES
+failed flushes, and the buffer never holds more than WRITE_BEHIND_MAX_BUFFER
+writes; the oldest are dropped first.
+"""
+import asyncio
+import os
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import insert, update
+
+from data import AsyncSessionLocal
+from models import DBCallEvent, DBLog
+
+WRITE_BEHIND_FLUSH_MS = int(os.getenv("WRITE_BEHIND_FLUSH_MS", "500"))
+WRITE_BEHIND_MAX_EVENTS = int(os.getenv("WRITE_BEHIND_MAX_EVENTS", "200"))
+WRITE_BEHIND_MAX_RETRIES = int(os.getenv("WRITE_BEHIND_MAX_RETRIES", "3"))
+WRITE_BEHIND_MAX_BUFFER = int(os.getenv("WRITE_BEHIND_MAX_BUFFER", "10000"))
+
+class WriteBehindBuffer:
+    def __init__(self, flush_interval_ms: int = WRITE_BEHIND_FLUSH_MS, max_events: int = WRITE_BEHIND_MAX_EVENTS,
+                 max_retries: int = WRITE_BEHIND_MAX_RETRIES, max_buffer: int = WRITE_BEHIND_MAX_BUFFER):
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_events = max_events
+        self.max_retries = max_retries
+        self.max_buffer = max_buffer
+        self.dropped = 0
+        # Each write is kept with the number of flushes it has already failed
+        self._events: List[Tuple[int, dict]] = []
+        self._responses: Dict[str, Tuple[int, str]] = {}  # call_id -> response, last write wins
+        self._full = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def pending(self) -> int:
+        return len(self._events) + len(self._responses)
+
+    def add_call_event(self, call_id: str, status: str, call_sid: str = None, duration: str = None, timestamp: str = None):
+        self._events.append((0, {
+            "call_id": call_id,
+            "call_sid": call_sid,
+            "status": status,
+            "duration": int(duration) if duration and str(duration).isdigit() else None,
+            "timestamp": timestamp or datetime.utcnow().isoformat()
+        }))
+        self._maybe_wake()
+
+    def set_response(self, call_id: str, response: str):
+        self._responses.pop(call_id, None)  # re-insert so the dict stays oldest-first
+        self._responses[call_id] = (0, response)
+        self._maybe_wake()
+
+    def _maybe_wake(self):
+        self._trim()
+        if self.pending() >= self.max_events:
+            self._full.set()
+
+    def _trim(self):
+        """Drop the oldest writes once the buffer is over its cap (the database is likely down)."""
+        overflow = self.pending() - self.max_buffer
+        if overflow <= 0:
+            return
+        if self.dropped // 1000 != (self.dropped + overflow) // 1000 or self.dropped == 0:
+            print(f"⚠️ Write-behind buffer full ({self.max_buffer}) – dropping oldest writes ({self.dropped + overflow} so far)")
+        self.dropped += overflow
+        drop_events = min(overflow, len(self._events))
+        del self._events[:drop_events]
+        for call_id in list(self._responses)[:overflow - drop_events]:
+            del self._responses[call_id]
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the flusher and write out whatever is still buffered."""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._full.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._full.clear()
+            await self.flush()
+
+    async def flush(self):
+        if not self.pending():
+            return
+        events, self._events = self._events, []
+        responses, self._responses = self._responses, {}
+        try:
+            async with AsyncSessionLocal() as session:
+                if events:
+                    await session.execute(insert(DBCallEvent), [row for _, row in events])
+                if responses:
+                    # ORM bulk UPDATE by primary key: one executemany for the whole batch
+                    await session.execute(
+                        update(DBLog),
+                        [{"id": call_id, "response": response} for call_id, (_, response) in responses.items()]
+                    )
+                await session.commit()
+            return
+        except Exception as e:
+            print(f"Write-behind flush failed ({len(events)} events, {len(responses)} responses): {e} – retrying row by row")
+
+        failed_events = []
+        for attempts, row in events:
+            try:
+                async with AsyncSessionLocal() as session:
+                    await session.execute(insert(DBCallEvent).values(**row))
+                    await session.commit()
+            except Exception as e:
+                self._give_up_or_keep(failed_events, attempts, row, f"call event for {row['call_id']}", e)
+
+        failed_responses = []
+        for call_id, (attempts, response) in responses.items():
+            try:
+                async with AsyncSessionLocal() as session:
+                    result = await session.execute(
+                        update(DBLog).where(DBLog.id == call_id).values(response=response)
+                    )
+                    await session.commit()
+                if result.rowcount == 0:
+                    print(f"Write-behind: no call log {call_id} – dropping its response")
+            except Exception as e:
+                self._give_up_or_keep(failed_responses, attempts, (call_id, response), f"response for {call_id}", e)
+
+        # Requeue ahead of newer writes; newer responses win over the failed ones
+        self._events = failed_events + self._events
+        self._responses = {**{call_id: (attempts, response) for attempts, (call_id, response) in failed_responses},
+                           **self._responses}
+        self._trim()
+
+    def _give_up_or_keep(self, failed: list, attempts: int, item, label: str, error: Exception):
+        attempts += 1
+        if attempts >= self.max_retries:
+            self.dropped += 1
+            print(f"Write-behind: dropping {label} after {attempts} failed attempts: {error}")
+        else:
+            failed.append((attempts, item))
+
+buffer = WriteBehindBuffer()
@@ -0,0 +1,95 @@
+# startup_bench.py
+"""
+Startup benchmark and import-time budget check for the API process.
+
+Imports `main` in fresh interpreters (`python -X importtime`), reports the
+median wall time and the slowest modules, and fails when:
+  - the median import time exceeds IMPORT_BUDGET_MS, or
+  - a lazily-initialized integration (Twilio REST, Gemini, passlib,
+    APScheduler) was imported eagerly.
+
+Usage: python startup_bench.py [runs]
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+IMPORT_BUDGET_MS = float(os.getenv("IMPORT_BUDGET_MS", "1500"))
+
+# Must not be imported just by loading the app
+LAZY_MODULES = ["twilio.rest", "google.generativeai", "passlib", "apscheduler"]
+
+# Prefix of the child's result line, so prints made while importing main can't be mistaken for it
+RESULT_SENTINEL = "STARTUP_BENCH_RESULT "
+
+CHECK_SNIPPET = (
+    "import json, sys, main; "
+    f"print({RESULT_SENTINEL!r} + json.dumps([m for m in {LAZY_MODULES!r} if m in sys.modules]))"
+)
+
+def run_once() -> tuple:
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CHECK_SNIPPET],
+        capture_output=True,
+        text=True,
+        cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    if proc.returncode != 0:
+        print(proc.stderr[-2000:])
+        sys.exit(proc.returncode)
+    results = [line for line in proc.stdout.splitlines() if line.startswith(RESULT_SENTINEL)]
+    if not results:
+        print(f"❌ No result line from the import check:\n{proc.stdout[-2000:]}")
+        sys.exit(1)
+    eager = json.loads(results[-1][len(RESULT_SENTINEL):])
+    return elapsed_ms, eager, proc.stderr
+
+def slowest_imports(importtime_log: str, top: int = 10) -> list:
+    """Parse `-X importtime` output: 'import time: self [us] | cumulative | package'."""
+    rows = []
+    for line in importtime_log.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3:
+            continue
+        try:
+            rows.append((int(parts[1]), parts[2].strip()))
+        except ValueError:
+            continue
+    rows.sort(reverse=True)
+    return rows[:top]
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    timings = []
+    eager = []
+    log = ""
+    for _ in range(runs):
+        elapsed_ms, eager, log = run_once()
+        timings.append(elapsed_ms)
+
+    median_ms = statistics.median(timings)
+    print(f"Import of main: median {median_ms:.0f}ms over {runs} runs (min {min(timings):.0f}ms, max {max(timings):.0f}ms)")
+    print("Slowest imports (cumulative):")
+    for cumulative_us, name in slowest_imports(log):
+        print(f"  {cumulative_us / 1000:8.1f}ms  {name}")
+
+    failed = False
+    if eager:
+        print(f"❌ Eagerly imported: {', '.join(eager)}")
+        failed = True
+    if median_ms > IMPORT_BUDGET_MS:
+        print(f"❌ Over budget: {median_ms:.0f}ms > {IMPORT_BUDGET_MS:.0f}ms")
+        failed = True
+    if failed:
+        sys.exit(1)
+    print(f"✅ Within budget ({IMPORT_BUDGET_MS:.0f}ms)")
+
+if __name__ == "__main__":
+    main()
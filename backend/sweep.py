@@ -0,0 +1,285 @@
+# sweep.py
+"""
+Sharded risk sweep.
+
+The user base is split into shards by user id range (ids are uuid4 strings, so a
+prefix range behaves like a hash partition and is still a PK range scan). Each
+sweep publishes one row per shard in `sweep_shards`; any number of worker
+processes claim shards with SKIP LOCKED and checkpoint the last user id they
+processed, so a crashed worker's shard is picked up where it stopped once its
+lease expires. A heartbeat task keeps the lease alive while a batch is in
+flight, and users whose call failed are kept on the shard and retried before
+it is marked done.
+
+Usage:
+    python sweep.py publish      # publish shards for the current hour
+    python sweep.py worker       # claim and process shards until stopped
+"""
+import asyncio
+import json
+import os
+import socket
+import sys
+import uuid
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+import httpx
+from sqlalchemy import select, update, or_, and_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from data import AsyncSessionLocal, DATABASE_URL, make_engine
+from models import DBUser, DBSweepShard
+from services import auth
+
+SWEEP_SHARDS = int(os.getenv("SWEEP_SHARDS", "16"))
+SWEEP_BATCH_SIZE = int(os.getenv("SWEEP_BATCH_SIZE", "200"))
+SWEEP_CONCURRENCY = int(os.getenv("SWEEP_CONCURRENCY", "20"))
+SWEEP_LEASE_SECONDS = int(os.getenv("SWEEP_LEASE_SECONDS", "300"))
+SWEEP_POLL_SECONDS = int(os.getenv("SWEEP_POLL_SECONDS", "30"))
+# Attempts per user when the API sheds load (429/503); waits honour Retry-After up to the cap
+SWEEP_MAX_ATTEMPTS = int(os.getenv("SWEEP_MAX_ATTEMPTS", "4"))
+SWEEP_MAX_RETRY_AFTER = float(os.getenv("SWEEP_MAX_RETRY_AFTER", "60"))
+# Several heartbeats per lease, so one slow UPDATE doesn't let another worker steal the shard
+SWEEP_HEARTBEAT_SECONDS = float(os.getenv("SWEEP_HEARTBEAT_SECONDS", str(SWEEP_LEASE_SECONDS / 3)))
+
+# Session factory for all sweep queries; run_scheduled swaps in one bound to its own loop
+_sessions = AsyncSessionLocal
+
+_KEYSPACE = 16 ** 4  # ranges are cut on the first four hex digits of the id
+
+
+def shard_bounds(num_shards: int = SWEEP_SHARDS) -> List[Tuple[str, Optional[str]]]:
+    """Split the user id keyspace into `num_shards` contiguous [lower, upper) ranges."""
+    num_shards = max(1, min(num_shards, _KEYSPACE))
+    bounds = []
+    for i in range(num_shards):
+        lower = "" if i == 0 else f"{(i * _KEYSPACE) // num_shards:04x}"
+        upper = None if i == num_shards - 1 else f"{((i + 1) * _KEYSPACE) // num_shards:04x}"
+        bounds.append((lower, upper))
+    return bounds
+
+
+def current_sweep_id() -> str:
+    """One sweep per hour; publishing twice in the same hour is a no-op."""
+    return datetime.utcnow().strftime("%Y%m%d%H")
+
+
+async def publish_sweep(sweep_id: Optional[str] = None) -> str:
+    """Publish the shards of a sweep as claimable work units (idempotent across publishers)."""
+    sweep_id = sweep_id or current_sweep_id()
+    now = datetime.utcnow().isoformat()
+    stmt = pg_insert(DBSweepShard).values([
+        {
+            "id": str(uuid.uuid4()),
+            "sweep_id": sweep_id,
+            "shard_index": index,
+            "lower_bound": lower,
+            "upper_bound": upper,
+            "status": "pending",
+            "processed": 0,
+            "created_at": now
+        }
+        for index, (lower, upper) in enumerate(shard_bounds())
+    ]).on_conflict_do_nothing(index_elements=[DBSweepShard.sweep_id, DBSweepShard.shard_index])
+    async with _sessions() as session:
+        result = await session.execute(stmt)
+        await session.commit()
+    if result.rowcount:
+        print(f"📦 Published sweep {sweep_id} ({result.rowcount} shards)")
+    return sweep_id
+
+
+async def claim_shard(worker_id: str) -> Optional[DBSweepShard]:
+    """Claim a pending shard, or one whose worker stopped heartbeating."""
+    now = datetime.utcnow()
+    stale_before = (now - timedelta(seconds=SWEEP_LEASE_SECONDS)).isoformat()
+    async with _sessions() as session:
+        async with session.begin():
+            result = await session.execute(
+                select(DBSweepShard)
+                .where(or_(
+                    DBSweepShard.status == "pending",
+                    and_(DBSweepShard.status == "claimed", DBSweepShard.heartbeat_at < stale_before)
+                ))
+                .order_by(DBSweepShard.created_at, DBSweepShard.shard_index)
+                .limit(1)
+                .with_for_update(skip_locked=True)
+            )
+            shard = result.scalar_one_or_none()
+            if not shard:
+                return None
+            shard.status = "claimed"
+            shard.worker_id = worker_id
+            shard.heartbeat_at = now.isoformat()
+        return shard
+
+
+async def _checkpoint(shard_id: str, worker_id: str, last_user_id: Optional[str], processed: int,
+                      failed: List[str], done: bool = False) -> bool:
+    """Persist progress. Returns False if the shard lease was taken over by another worker."""
+    async with _sessions() as session:
+        result = await session.execute(
+            update(DBSweepShard)
+            .where(DBSweepShard.id == shard_id, DBSweepShard.worker_id == worker_id)
+            .values(
+                checkpoint=last_user_id,
+                processed=processed,
+                failed=json.dumps(failed) if failed else None,
+                heartbeat_at=datetime.utcnow().isoformat(),
+                status="done" if done else "claimed"
+            )
+        )
+        await session.commit()
+        return result.rowcount == 1
+
+
+async def _heartbeat(shard_id: str, worker_id: str, lost: asyncio.Event):
+    """Renew the lease while a batch is running; sets `lost` if another worker took the shard."""
+    while True:
+        await asyncio.sleep(SWEEP_HEARTBEAT_SECONDS)
+        try:
+            async with _sessions() as session:
+                result = await session.execute(
+                    update(DBSweepShard)
+                    .where(
+                        DBSweepShard.id == shard_id,
+                        DBSweepShard.worker_id == worker_id,
+                        DBSweepShard.status == "claimed"
+                    )
+                    .values(heartbeat_at=datetime.utcnow().isoformat())
+                )
+                await session.commit()
+        except Exception as e:
+            print(f"⚠️ Sweep heartbeat failed: {e}")
+            continue
+        if result.rowcount != 1:
+            lost.set()
+            return
+
+
+def _retry_delay(resp: httpx.Response, attempt: int) -> float:
+    try:
+        delay = float(resp.headers.get("retry-after", ""))
+    except ValueError:
+        delay = 2.0 ** attempt
+    return min(max(delay, 1.0), SWEEP_MAX_RETRY_AFTER)
+
+
+async def check_user_and_call(client: httpx.AsyncClient, user_id: str) -> bool:
+    """Ask the API to check one user. Returns False if the call failed and should be retried."""
+    domain = os.getenv("DOMAIN", "https://sabi-health.onrender.com/").rstrip("/")
+    try:
+        for attempt in range(1, SWEEP_MAX_ATTEMPTS + 1):
+            # Signed as the sweep service, so REQUIRE_AUTH deployments accept it
+            resp = await client.put(f"{domain}/call-user/{user_id}", headers=auth.service_headers("sweep"))
+            if resp.status_code in (429, 503) and attempt < SWEEP_MAX_ATTEMPTS:
+                delay = _retry_delay(resp, attempt)
+                print(f"⏳ API busy ({resp.status_code}) for user {user_id} – retrying in {delay:.0f}s")
+                await asyncio.sleep(delay)
+                continue
+            resp.raise_for_status()
+            print(f"Scheduled call for user {user_id}: {resp.json()}")
+            return True
+    except Exception as e:
+        print(f"Failed scheduled call for user {user_id}: {e}")
+    return False
+
+
+async def process_shard(shard: DBSweepShard, worker_id: str, client: httpx.AsyncClient):
+    """Walk a shard in id order, checkpointing after every batch, then retry the users that failed."""
+    cursor = shard.checkpoint
+    processed = shard.processed or 0
+    failed = json.loads(shard.failed) if shard.failed else []
+    semaphore = asyncio.Semaphore(SWEEP_CONCURRENCY)
+    lost = asyncio.Event()
+    heartbeat = asyncio.create_task(_heartbeat(shard.id, worker_id, lost))
+
+    async def dispatch(user_id: str) -> bool:
+        async with semaphore:
+            return await check_user_and_call(client, user_id)
+
+    async def dispatch_all(user_ids: List[str]) -> List[str]:
+        results = await asyncio.gather(*(dispatch(uid) for uid in user_ids))
+        return [uid for uid, ok in zip(user_ids, results) if not ok]
+
+    try:
+        while True:
+            stmt = select(DBUser.id).where(DBUser.id >= shard.lower_bound)
+            if shard.upper_bound is not None:
+                stmt = stmt.where(DBUser.id < shard.upper_bound)
+            if cursor:
+                stmt = stmt.where(DBUser.id > cursor)
+            stmt = stmt.order_by(DBUser.id).limit(SWEEP_BATCH_SIZE)
+
+            async with _sessions() as session:
+                result = await session.execute(stmt)
+                user_ids = result.scalars().all()
+
+            if not user_ids:
+                break
+
+            failed.extend(await dispatch_all(user_ids))
+            cursor = user_ids[-1]
+            processed += len(user_ids)
+            if lost.is_set() or not await _checkpoint(shard.id, worker_id, cursor, processed, failed):
+                print(f"⚠️ Lost lease on shard {shard.sweep_id}/{shard.shard_index} – stopping")
+                return
+
+        # One more attempt for users whose call failed; any still failing stay recorded on the shard
+        if failed:
+            failed = await dispatch_all(failed)
+            if lost.is_set():
+                print(f"⚠️ Lost lease on shard {shard.sweep_id}/{shard.shard_index} – stopping")
+                return
+        await _checkpoint(shard.id, worker_id, cursor, processed, failed, done=True)
+        note = f", {len(failed)} failed" if failed else ""
+        print(f"✅ Shard {shard.sweep_id}/{shard.shard_index} done ({processed} users{note})")
+    finally:
+        heartbeat.cancel()
+
+
+async def run_worker(worker_id: Optional[str] = None, forever: bool = False):
+    """Claim and process shards. With `forever`, keep polling for new sweeps."""
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    async with httpx.AsyncClient(timeout=60.0) as client:
+        while True:
+            shard = await claim_shard(worker_id)
+            if shard:
+                await process_shard(shard, worker_id, client)
+                continue
+            if not forever:
+                return
+            await asyncio.sleep(SWEEP_POLL_SECONDS)
+
+
+async def run_scheduled(local_worker: bool = True):
+    """
+    Publish (and optionally work) the current sweep from a thread with its own
+    event loop, such as the API's scheduler. The API's pooled engine is tied to
+    the main loop, so this uses a NullPool engine created on this loop.
+    """
+    global _sessions
+    engine = make_engine(DATABASE_URL, pooled=False)
+    _sessions = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    try:
+        await publish_sweep()
+        if local_worker:
+            await run_worker()
+    finally:
+        _sessions = AsyncSessionLocal
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "worker"
+    if command == "publish":
+        asyncio.run(publish_sweep())
+    elif command == "worker":
+        asyncio.run(run_worker(forever=True))
+    else:
+        print(f"Unknown command: {command}")
+        sys.exit(1)
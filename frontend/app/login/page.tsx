@@ -4,7 +4,7 @@ import { Button } from "@/components/ui/button";
 import { Card, CardContent, CardHeader, CardTitle, CardDescription } from "@/components/ui/card";
 import { Input } from "@/components/ui/input";
 import { Label } from "@/components/ui/label";
-import { api } from "@/lib/api";
+import { api, clearTokens, setTokens } from "@/lib/api";
 import { useState } from "react";
 import { useRouter } from "next/navigation";
 import { HeartPulse, Loader2 } from "lucide-react";
@@ -27,8 +27,15 @@ export default function LoginPage() {
         phone: parseInt(formData.phone),
         password: formData.password,
       });
+      const { access_token, refresh_token, token_type, ...user } = data;
+      // Tokens are null when the server has signing disabled
+      if (access_token) {
+        setTokens({ access_token, refresh_token, token_type });
+      } else {
+        clearTokens();
+      }
       // Store user info in localStorage for this demo
-      localStorage.setItem("sabi_user", JSON.stringify(data));
+      localStorage.setItem("sabi_user", JSON.stringify(user));
       toast.success("Welcome back!");
       router.push("/dashboard");
     } catch (error: any) {
@@ -6,7 +6,7 @@ import { Card, CardContent, CardHeader, CardTitle } from "@/components/ui/card";
 import { Input } from "@/components/ui/input";
 import { MessageCircle, X, Send, Sparkles } from "lucide-react";
 import { useMe } from "@/lib/hooks";
-import { api } from "@/lib/api";
+import { api, API_BASE_URL, authHeaders } from "@/lib/api";
 import { cn } from "@/lib/utils";
 
 export function MiniChat() {
@@ -33,19 +33,72 @@ export function MiniChat() {
     setMessages((prev) => [...prev, { role: "user", text: userMsg }]);
     setIsLoading(true);
 
+    const payload = { message: userMsg, user_id: me?.user?.id };
     try {
-      const { data } = await api.post("/chat", { 
-        message: userMsg, 
-        user_id: me?.user?.id 
-      });
-      setMessages((prev) => [...prev, { role: "ai", text: data.response }]);
+      await streamReply(payload);
     } catch (error) {
-      setMessages((prev) => [...prev, { role: "ai", text: "I'm sorry, my network is a bit shaky. Try again soon!" }]);
+      try {
+        const { data } = await api.post("/chat", payload);
+        setMessages((prev) => [...prev, { role: "ai", text: data.response }]);
+      } catch {
+        setMessages((prev) => [...prev, { role: "ai", text: "I'm sorry, my network is a bit shaky. Try again soon!" }]);
+      }
     } finally {
       setIsLoading(false);
     }
   };
 
+  // Reads /chat/stream (Server-Sent Events over a POST) and grows the last AI bubble token by token
+  const streamReply = async (payload: { message: string; user_id?: string }) => {
+    const res = await fetch(`${API_BASE_URL}/chat/stream`, {
+      method: "POST",
+      headers: { "Content-Type": "application/json", ...authHeaders() },
+      body: JSON.stringify(payload),
+    });
+    if (!res.ok || !res.body) throw new Error(`Chat stream failed: ${res.status}`);
+
+    const reader = res.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+    let started = false;
+
+    while (true) {
+      let chunk: ReadableStreamReadResult<Uint8Array>;
+      try {
+        chunk = await reader.read();
+      } catch (error) {
+        if (started) break; // keep the partial reply rather than asking twice
+        throw error;
+      }
+      const { value, done } = chunk;
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+
+      const frames = buffer.split("\n\n");
+      buffer = frames.pop() ?? "";
+      for (const frame of frames) {
+        const event = frame.match(/^event: (.*)$/m)?.[1];
+        const data = frame.match(/^data: (.*)$/m)?.[1];
+        if (event !== "token" || !data) continue;
+
+        const { text } = JSON.parse(data);
+        if (!started) {
+          started = true;
+          setIsLoading(false);
+          setMessages((prev) => [...prev, { role: "ai", text }]);
+        } else {
+          setMessages((prev) => {
+            const next = [...prev];
+            const last = next[next.length - 1];
+            next[next.length - 1] = { ...last, text: last.text + text };
+            return next;
+          });
+        }
+      }
+    }
+    if (!started) throw new Error("Chat stream ended without a reply");
+  };
+
   return (
     <>
       {/* Floating Button */}
@@ -6,7 +6,8 @@ import { cn } from "@/lib/utils";
 import * as NextNavigation from "next/navigation";
 import { useEffect, useState } from "react";
 import { HeartPulse, Activity } from "lucide-react";
-import { useMe } from "@/lib/hooks";
+import { useMe, useEventStream } from "@/lib/hooks";
+import { clearTokens } from "@/lib/api";
 import { Badge } from "./ui/badge";
 
 export function Navigation() {
@@ -14,6 +15,7 @@ export function Navigation() {
   const router = NextNavigation.useRouter();
   const [user, setUser] = useState<any>(null);
   const { data: me } = useMe();
+  useEventStream(me?.user?.id);
 
   useEffect(() => {
     const storedUser = localStorage.getItem("sabi_user");
@@ -24,6 +26,7 @@ export function Navigation() {
 
   const handleLogout = () => {
     localStorage.removeItem("sabi_user");
+    clearTokens();
     setUser(null);
     router.push("/login");
   };
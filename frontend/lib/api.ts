@@ -1,6 +1,6 @@
 import axios from "axios";
 
-const API_BASE_URL = process.env.NEXT_PUBLIC_API_URL || "http://127.0.0.1:8000";
+export const API_BASE_URL = process.env.NEXT_PUBLIC_API_URL || "http://127.0.0.1:8000";
 
 export const api = axios.create({
   baseURL: API_BASE_URL,
@@ -9,11 +9,85 @@ export const api = axios.create({
   },
 });
 
+export interface AuthTokens {
+  access_token: string;
+  refresh_token: string;
+  token_type: string;
+}
+
+const TOKENS_KEY = "sabi_tokens";
+
+export const getTokens = (): AuthTokens | null => {
+  if (typeof window === "undefined") return null;
+  const stored = localStorage.getItem(TOKENS_KEY);
+  return stored ? JSON.parse(stored) : null;
+};
+
+export const setTokens = (tokens: AuthTokens) => {
+  localStorage.setItem(TOKENS_KEY, JSON.stringify(tokens));
+};
+
+export const clearTokens = () => {
+  localStorage.removeItem(TOKENS_KEY);
+};
+
+export const authHeaders = (): Record<string, string> => {
+  const tokens = getTokens();
+  return tokens ? { Authorization: `Bearer ${tokens.access_token}` } : {};
+};
+
+// Concurrent 401s share one refresh request
+let refreshing: Promise<string | null> | null = null;
+
+export const refreshAccessToken = (): Promise<string | null> => {
+  const tokens = getTokens();
+  if (!tokens) return Promise.resolve(null);
+  refreshing ??= axios
+    .post<AuthTokens>(`${API_BASE_URL}/token/refresh`, { refresh_token: tokens.refresh_token })
+    .then(({ data }) => {
+      setTokens(data);
+      return data.access_token;
+    })
+    .catch(() => {
+      clearTokens();
+      return null;
+    })
+    .finally(() => {
+      refreshing = null;
+    });
+  return refreshing;
+};
+
+api.interceptors.request.use((config) => {
+  const tokens = getTokens();
+  if (tokens) {
+    config.headers.Authorization = `Bearer ${tokens.access_token}`;
+  }
+  return config;
+});
+
+api.interceptors.response.use(
+  (response) => response,
+  async (error) => {
+    const original = error.config;
+    if (error.response?.status === 401 && original && !original._retried && getTokens()) {
+      original._retried = true;
+      const accessToken = await refreshAccessToken();
+      if (accessToken) {
+        original.headers.Authorization = `Bearer ${accessToken}`;
+        return api(original);
+      }
+    }
+    return Promise.reject(error);
+  }
+);
+
 export interface User {
   id: string;
   name: string;
   phone: number;
   lga: string;
+  lga_id?: string | null;
   ai_personality: string;
 }
 
@@ -1,7 +1,9 @@
 "use client";
 
+import { useEffect } from "react";
 import { useMutation, useQuery, useQueryClient } from "@tanstack/react-query";
-import { api, User, Log, RiskCheckResponse, MeResponse, Message } from "./api";
+import { api, API_BASE_URL, getTokens, refreshAccessToken, User, Log, RiskCheckResponse, MeResponse, Message } from "./api";
+import { queueSymptomReport } from "./offline-queue";
 import { toast } from "sonner";
 
 
@@ -28,6 +30,62 @@ export const useMe = () => {
   });
 };
 
+// Server-push channel: refresh cached data when the API announces a change instead of polling
+export const useEventStream = (userId: string | undefined) => {
+  const queryClient = useQueryClient();
+
+  useEffect(() => {
+    if (!userId || typeof EventSource === "undefined") return;
+    let source: EventSource | null = null;
+    let retryTimer: ReturnType<typeof setTimeout> | undefined;
+    let retryDelay = 1000;
+    let stopped = false;
+
+    const connect = () => {
+      // EventSource can't send headers, so the token rides in the query string
+      const accessToken = getTokens()?.access_token;
+      const query = accessToken ? `?access_token=${encodeURIComponent(accessToken)}` : "";
+      source = new EventSource(`${API_BASE_URL}/events/${userId}${query}`);
+
+      source.addEventListener("ready", () => {
+        retryDelay = 1000;
+      });
+      source.addEventListener("message", (event) => {
+        const data = JSON.parse((event as MessageEvent).data);
+        queryClient.invalidateQueries({ queryKey: ["messages"] });
+        toast.info(data.title);
+      });
+      source.addEventListener("risk", () => {
+        queryClient.invalidateQueries({ queryKey: ["me"] });
+        queryClient.invalidateQueries({ queryKey: ["risk"] });
+      });
+      source.addEventListener("call_status", () => {
+        queryClient.invalidateQueries({ queryKey: ["logs"] });
+        queryClient.invalidateQueries({ queryKey: ["me"] });
+      });
+
+      // The token in the URL may have expired (a 401 closes EventSource for good):
+      // refresh it and reopen the stream with the new one, backing off between attempts
+      source.onerror = () => {
+        source?.close();
+        if (stopped) return;
+        retryTimer = setTimeout(async () => {
+          if (getTokens()) await refreshAccessToken();
+          if (!stopped) connect();
+        }, retryDelay);
+        retryDelay = Math.min(retryDelay * 2, 30000);
+      };
+    };
+
+    connect();
+    return () => {
+      stopped = true;
+      clearTimeout(retryTimer);
+      source?.close();
+    };
+  }, [userId, queryClient]);
+};
+
 export const useLogSymptoms = () => {
   const queryClient = useQueryClient();
   return useMutation({
@@ -49,13 +107,28 @@ export const useLogSymptoms = () => {
         console.warn("Geolocation denied or failed, falling back to registered LGA");
       }
       
-      return api.post("/symptoms", { 
-        ...data, 
-        user_id: user.id,
-        ...coords
-      });
+      // No network: keep the report and send it with the rest of the queue on reconnect
+      if (!navigator.onLine) {
+        queueSymptomReport(user.id, { ...data, ...coords });
+        return { queued: true };
+      }
+      try {
+        return await api.post("/symptoms", { 
+          ...data, 
+          user_id: user.id,
+          ...coords
+        });
+      } catch (error: any) {
+        if (error.response) throw error;
+        queueSymptomReport(user.id, { ...data, ...coords });
+        return { queued: true };
+      }
     },
-    onSuccess: () => {
+    onSuccess: (result: any) => {
+      if (result?.queued) {
+        toast.info("You're offline. We'll send your health update when you reconnect.");
+        return;
+      }
       queryClient.invalidateQueries({ queryKey: ["me"] });
       toast.success("Health status updated!");
     },
@@ -0,0 +1,105 @@
+import { api } from "./api";
+
+// Symptom reports made while offline, sent in one /symptoms/bulk request once the network is back.
+// Each report keeps the idempotency key it was given when queued, so re-sending a batch
+// whose response was lost never double-counts it.
+
+const QUEUE_KEY = "sabi_symptom_queue";
+const MAX_BATCH = 200;
+
+export interface QueuedSymptomReport {
+  idempotency_key: string;
+  timestamp: string;
+  fever: number;
+  cough: number;
+  headache: number;
+  fatigue: number;
+  diarrhea: number;
+  vomiting: number;
+  notes?: string;
+  lat?: number;
+  lon?: number;
+}
+
+interface QueueState {
+  user_id: string;
+  reports: QueuedSymptomReport[];
+}
+
+const readQueue = (): QueueState | null => {
+  if (typeof window === "undefined") return null;
+  const stored = localStorage.getItem(QUEUE_KEY);
+  return stored ? JSON.parse(stored) : null;
+};
+
+const writeQueue = (queue: QueueState | null) => {
+  if (!queue || queue.reports.length === 0) {
+    localStorage.removeItem(QUEUE_KEY);
+  } else {
+    localStorage.setItem(QUEUE_KEY, JSON.stringify(queue));
+  }
+};
+
+const newKey = () =>
+  typeof crypto !== "undefined" && "randomUUID" in crypto
+    ? crypto.randomUUID()
+    : `${Date.now()}-${Math.random().toString(36).slice(2)}`;
+
+export const pendingSymptomReports = (): number => readQueue()?.reports.length ?? 0;
+
+export const queueSymptomReport = (
+  userId: string,
+  report: Omit<QueuedSymptomReport, "idempotency_key" | "timestamp">
+) => {
+  const queue = readQueue();
+  // Reports left behind by another account on this device can't be sent as this user
+  const reports = queue && queue.user_id === userId ? queue.reports : [];
+  reports.push({ ...report, idempotency_key: newKey(), timestamp: new Date().toISOString() });
+  writeQueue({ user_id: userId, reports });
+};
+
+let flushing: Promise<number> | null = null;
+
+/** Send queued reports; resolves to how many the server now has. Safe to call repeatedly. */
+export const flushSymptomQueue = (): Promise<number> => {
+  if (flushing) return flushing;
+  flushing = (async () => {
+    let sent = 0;
+    let queue = readQueue();
+    while (queue && queue.reports.length > 0 && navigator.onLine) {
+      const batch = queue.reports.slice(0, MAX_BATCH);
+      const { data } = await api.post("/symptoms/bulk", { user_id: queue.user_id, reports: batch });
+      const done = new Set<string>([...data.accepted, ...data.duplicates]);
+      sent += done.size;
+      // Re-read: reports may have been queued while the request was in flight
+      queue = readQueue();
+      if (!queue) break;
+      queue.reports = queue.reports.filter((report) => !done.has(report.idempotency_key));
+      writeQueue(queue);
+      if (done.size === 0) break;
+    }
+    return sent;
+  })().finally(() => {
+    flushing = null;
+  });
+  return flushing;
+};
+
+let started = false;
+
+/** Flush now and whenever the browser comes back online. Returns a cleanup function. */
+export const startSymptomQueue = (onFlushed?: (sent: number) => void) => {
+  if (typeof window === "undefined" || started) return () => {};
+  started = true;
+  const flush = () => {
+    flushSymptomQueue()
+      .then((sent) => sent > 0 && onFlushed?.(sent))
+      .catch((error) => console.warn("Symptom queue flush failed, will retry when online", error));
+  };
+  window.addEventListener("online", flush);
+  flush();
+  return () => {
+    window.removeEventListener("online", flush);
+    started = false;
+  };
+};
@@ -1,7 +1,9 @@
 "use client";
 
 import { QueryClient, QueryClientProvider } from "@tanstack/react-query";
-import { useState } from "react";
+import { useEffect, useState } from "react";
+import { toast } from "sonner";
+import { startSymptomQueue } from "./offline-queue";
 
 export default function Providers({ children }: { children: React.ReactNode }) {
   const [queryClient] = useState(() => new QueryClient({
@@ -13,6 +15,13 @@ export default function Providers({ children }: { children: React.ReactNode }) {
     },
   }));
 
+  useEffect(() => {
+    return startSymptomQueue((sent) => {
+      queryClient.invalidateQueries({ queryKey: ["me"] });
+      toast.success(`Sent ${sent} health update${sent === 1 ? "" : "s"} saved while offline.`);
+    });
+  }, [queryClient]);
+
   return (
     <QueryClientProvider client={queryClient}>
       {children}